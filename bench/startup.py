@@ -0,0 +1,84 @@
+# Startup benchmark for `safe-pm --version`.
+#
+# Shell completion and wrapper scripts call the CLI constantly, so its cold start has a budget:
+# the median wall time of `bin/main.py --version` must stay below STARTUP_BUDGET_MS, and none of
+# the heavy dependencies may be imported before a command actually runs. The slowest imports
+# reported by `python -X importtime` are printed to help find what regressed.
+#
+# Usage: python bench/startup.py [--runs N] [--budget-ms MS]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+STARTUP_BUDGET_MS = 100
+HEAVY_MODULES = ("cryptography", "bcrypt", "pyperclip", "numpy", "argon2")
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+main_script = os.path.join(project_root, "bin", "main.py")
+
+
+def time_startup(runs: int) -> float:
+    """
+    Returns the median wall time in milliseconds of `bin/main.py --version`.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, main_script, "--version"], check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def read_import_times():
+    """
+    Runs `bin/main.py --version` under `python -X importtime`.
+
+    Returns:
+        list[tuple[str, int]]: Every imported module with its cumulative import time in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", main_script, "--version"],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    import_times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        import_times.append((module.strip(), int(cumulative)))
+    return import_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the startup time of safe-pm against its budget.")
+    parser.add_argument("--runs", type=int, default=20, help="number of timed runs (default 20)")
+    parser.add_argument("--budget-ms", type=int, default=STARTUP_BUDGET_MS, help=f"budget in milliseconds (default {STARTUP_BUDGET_MS})")
+    args = parser.parse_args()
+
+    import_times = read_import_times()
+    print("Slowest imports (cumulative):")
+    for module, cumulative in sorted(import_times, key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    heavy_imports = sorted({
+        module.split(".")[0] for module, _ in import_times if module.split(".")[0] in HEAVY_MODULES
+    })
+    median_ms = time_startup(args.runs)
+    print(f"Median startup time: {median_ms:.1f} ms (budget {args.budget_ms} ms)")
+
+    failed = False
+    if heavy_imports:
+        print(f"Heavy modules imported at startup: {', '.join(heavy_imports)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("Startup time is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
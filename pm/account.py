@@ -1,13 +1,20 @@
 import getpass
-import os
 import sqlite3
 import pyperclip
 
+from pm.context import get_vault_context
 from pm.setup import DatabaseException
-from pm.util.console_util import display_table_in_less_with_ansi
-from pm.util.crypto_util import verify_password, get_deterministic_hash, encrypt, derive_encryption_key, decrypt
+from pm.util.bloom_util import load_bloom_filter
+from pm.util.console_util import display_rows
+from pm.util.crypto_util import get_deterministic_hash
 from pm.util.password_util import generate_random_password, calculate_password_strength, find_most_similar_password
-from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name, get_rainbow_table_path
+from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name, get_rainbow_table_path, \
+    get_rainbow_index_path, get_breach_filter_path
+from pm.util.rainbow_util import load_rainbow_table
+from pm.vault import Page
+
+
+RAINBOW_SIMILARITY_THRESHOLD = 5  # Passwords closer than this to a rainbow table entry are reported
 
 
 class AccountException(Exception):
@@ -22,6 +29,9 @@ def list_accounts(args):
         args (Any): Command-line arguments containing:
             - `args.db`: Name of the database.
             - `args.store`: Name of the store whose accounts are to be listed.
+            - `args.format`: Output format, one of `table`, `json`, `jsonl` or `tsv`.
+            - `args.limit`, `args.offset`: Optional page of the rows to show.
+            - `args.since`, `args.until`: Optional range of creation dates of the rows to show.
 
     Raises:
         AccountException: If encountered errors, such as:
@@ -38,46 +48,33 @@ def list_accounts(args):
         db_name = args.db
         db_file_name = get_db_file_name(db_name)
         store = args.store
+        output_format = args.format
+        page = Page(args.limit, args.offset, args.since, args.until)
 
         # Verify account credentials
-        password = getpass.getpass("Enter password:")
-        if not verify_password(password, db_name):
-            raise AccountException("Error: [Account] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise AccountException(f"Error: [Account] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise AccountException("Error: [Account] - Entered password is incorrect")
 
         # Listing accounts
         store_hid = get_deterministic_hash(store)
-        encryption_key = derive_encryption_key(password)
-        with sqlite3.connect(os.path.join(db_path, db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store id from db
-                db_result = cursor.execute(f"SELECT id FROM store WHERE hid='{store_hid}'")
-                store_id_record = db_result.fetchone()
-                if store_id_record is None:
-                    raise DatabaseException("Error: [Database] - Store does not exists.")
-                store_id = store_id_record[0]
-
-                # Fetch account records from db
-                account_db_result = cursor.execute(f"SELECT * FROM account WHERE store_id='{store_id}'")
-                account_records = account_db_result.fetchall()
-                output = []
-                for r in account_records:
-                    output.append(
-                        (
-                            decrypt(r[2], encryption_key), decrypt(r[3], encryption_key), decrypt(r[4], encryption_key),
-                            r[6]
-                        )
-                    )
-
-                # Display in Less
-                display_table_in_less_with_ansi(header=("Name", "Username", "Email", "Created At"), rows=output)
-            except Exception as e:
-                raise DatabaseException(f"Error: [Database] - {str(e)}")
-            finally:
-                if cursor is not None:
-                    cursor.close()
+        vault = context.vault
+        try:
+            # Get store id from db
+            store_id = vault.get_store_id(store_hid)
+            if store_id is None:
+                raise DatabaseException("Error: [Database] - Store does not exists.")
+
+            # Fetch account records from db, decrypting them in batches as they are displayed
+            account_records = vault.list_accounts(store_id, page)
+            output = context.decrypt_rows(account_records, (0, 1, 2))
+
+            # Display in Less or write to standard output
+            display_rows(header=("Name", "Username", "Email", "Created At"), rows=output, output_format=output_format)
+        except Exception as e:
+            raise DatabaseException(f"Error: [Database] - {str(e)}")
     except AccountException as e:
         raise e
     except Exception as e:
@@ -136,18 +133,21 @@ def create_account(args):
             # Get password from user
             selected_password = getpass.getpass("Enter password to save for this account:")
 
-            # Generate a rainbow table
-            rainbow_table = []
-            with open(get_rainbow_table_path(), "r") as file:
-                for line in file:
-                    rainbow_table.append(line.strip())
+            # Load the rainbow table and the breach filter
+            rainbow_table = load_rainbow_table(get_rainbow_table_path(), get_rainbow_index_path())
+            breach_filter = load_bloom_filter(get_breach_filter_path())
 
             # Compute password strength
             strength = calculate_password_strength(selected_password)
-            rainbow_match, distance = find_most_similar_password(selected_password, rainbow_table)
             print(f"You have chosen a password with strength: {strength}")
-            if rainbow_match is not None and distance < 5:
-                print(f"Your chosen password is very similar to a dictionary password '{rainbow_match}'")
+            if breach_filter is not None and selected_password in breach_filter:
+                print("Your chosen password appears in a known password breach")
+            else:
+                rainbow_match, distance = find_most_similar_password(
+                    selected_password, rainbow_table, max_distance=RAINBOW_SIMILARITY_THRESHOLD
+                )
+                if rainbow_match is not None:
+                    print(f"Your chosen password is very similar to a dictionary password '{rainbow_match}'")
         elif set_auto_gen_password:
             # Auto generate password
             selected_password = generate_random_password(
@@ -157,59 +157,42 @@ def create_account(args):
             raise AccountException("Error: [Account] - Password to set cannot be empty.")
 
         # Verify account credentials
-        password = getpass.getpass("Enter password:")
-        if not verify_password(password, db_name):
-            raise AccountException("Error: [Account] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise AccountException(f"Error: [Account] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise AccountException("Error: [Account] - Entered password is incorrect")
 
         # Create account
-        encryption_key = derive_encryption_key(password)
         store_hid = get_deterministic_hash(store)
         account_hid = get_deterministic_hash(account)
-        encrypted_account_name = encrypt(account, encryption_key)
-        encrypted_password_to_save = encrypt(selected_password, encryption_key)
-        encrypted_username = encrypt(username, encryption_key) if username is not None else encrypt("", encryption_key)
-        encrypted_email = encrypt(email, encryption_key) if email is not None else encrypt("", encryption_key)
-        with sqlite3.connect(os.path.join(db_path, db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store id from db
-                db_result = cursor.execute(f"SELECT id FROM store WHERE hid='{store_hid}'")
-                store_id_record = db_result.fetchone()
-                if store_id_record is None:
-                    raise DatabaseException("Error: [Database] - Store does not exists.")
-                store_id = store_id_record[0]
-
-                # Save account and password
-                cursor.execute("BEGIN TRANSACTION")
-                cursor.execute(
-                    f"INSERT INTO account (hid, name, username, email, store_id) "
-                    f"VALUES ("
-                    f"  '{account_hid}', '{encrypted_account_name}', '{encrypted_username}', '{encrypted_email}', "
-                    f"  '{store_id}'"
-                    f")"
-                )
-                account_id = cursor.lastrowid
-                cursor.execute(
-                    f"INSERT INTO password (account_id, password) VALUES ("
-                    f"  '{account_id}', '{encrypted_password_to_save}'"
-                    f")"
-                )
-                connection.commit()
-
-                # Print message on standard output
-                print("Account created successfully!")
-            except sqlite3.IntegrityError as e:
-                raise AccountException(
-                    "Error: [Account] - Could not create new account in store. "
-                    "Please ensure that the account name is not previously set."
+        encrypted_account_name = context.encrypt(account)
+        encrypted_password_to_save = context.encrypt(selected_password)
+        encrypted_username = context.encrypt(username) if username is not None else context.encrypt("")
+        encrypted_email = context.encrypt(email) if email is not None else context.encrypt("")
+        vault = context.vault
+        try:
+            # Get store id from db
+            store_id = vault.get_store_id(store_hid)
+            if store_id is None:
+                raise DatabaseException("Error: [Database] - Store does not exists.")
+
+            # Save account and password
+            with vault.transaction():
+                account_id = vault.insert_account(
+                    store_id, account_hid, encrypted_account_name, encrypted_username, encrypted_email
                 )
-            except Exception as e:
-                raise DatabaseException(f"Error: [Database] - {str(e)}")
-            finally:
-                if cursor is not None:
-                    cursor.close()
+                vault.insert_password(account_id, encrypted_password_to_save)
+
+            # Print message on standard output
+            print("Account created successfully!")
+        except sqlite3.IntegrityError as e:
+            raise AccountException(
+                "Error: [Account] - Could not create new account in store. "
+                "Please ensure that the account name is not previously set."
+            )
+        except Exception as e:
+            raise DatabaseException(f"Error: [Database] - {str(e)}")
     except AccountException as e:
         raise e
     except Exception as e:
@@ -225,6 +208,7 @@ def view_account_credentials(args):
             - `args.db`: Name of the database.
             - `args.store`: Name of the store containing the account.
             - `args.account`: Name of the account whose credentials are to be viewed.
+            - `args.format`: Output format, one of `table`, `json`, `jsonl` or `tsv`.
 
     Raises:
         AccountException: If encountered errors, such as:
@@ -242,52 +226,44 @@ def view_account_credentials(args):
         db_file_name = get_db_file_name(db_name)
         store = args.store
         account = args.account
+        output_format = args.format
 
         # Verify account credentials
-        password = getpass.getpass("Enter password:")
-        if not verify_password(password, db_name):
-            raise AccountException("Error: [Account] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise AccountException(f"Error: [Account] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise AccountException("Error: [Account] - Entered password is incorrect")
 
         # View account credentials
-        encryption_key = derive_encryption_key(password)
         store_hid = get_deterministic_hash(store)
         account_hid = get_deterministic_hash(account)
-        with sqlite3.connect(os.path.join(db_path, db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store id from db
-                db_result = cursor.execute(f"SELECT id FROM store WHERE hid='{store_hid}'")
-                store_id_record = db_result.fetchone()
-                if store_id_record is None:
-                    raise DatabaseException("Error: [Database] - Store does not exists.")
-                store_id = store_id_record[0]
-
-                # Get account credentials from db
-                account_db_result = cursor.execute(
-                    f"SELECT * FROM account "
-                    f"  JOIN password ON account.id=password.account_id "
-                    f"WHERE account.store_id='{store_id}' "
-                    f"  AND account.hid='{account_hid}' "
-                    f"ORDER BY password.id DESC LIMIT 1"
-                )
-                account_records = account_db_result.fetchall()
-                output = []
-                for r in account_records:
-                    output.append(
-                        (
-                            decrypt(r[2], encryption_key), decrypt(r[3], encryption_key), decrypt(r[4], encryption_key),
-                            decrypt(r[9], encryption_key), r[10]
-                        )
+        vault = context.vault
+        try:
+            # Get store id from db
+            store_id = vault.get_store_id(store_hid)
+            if store_id is None:
+                raise DatabaseException("Error: [Database] - Store does not exists.")
+
+            # Get account credentials from db
+            account_record = vault.latest_password(store_id, account_hid)
+            output = []
+            if account_record is not None:
+                r = account_record
+                output.append(
+                    (
+                        context.decrypt(r[0]), context.decrypt(r[1]), context.decrypt(r[2]),
+                        context.decrypt(r[3]), r[4]
                     )
-
-                # Display in Less
-                display_table_in_less_with_ansi(
-                    header=("Name", "Username", "Email", "Password", "Created At"), rows=output
                 )
-            except Exception as e:
-                raise DatabaseException("Error: [Database] - Could not get account in the store.")
+
+            # Display in Less or write to standard output
+            display_rows(
+                header=("Name", "Username", "Email", "Password", "Created At"), rows=output,
+                output_format=output_format
+            )
+        except Exception as e:
+            raise DatabaseException("Error: [Database] - Could not get account in the store.")
     except AccountException as e:
         raise e
     except Exception as e:
@@ -323,43 +299,35 @@ def copy_account_credentials(args):
         field = args.field
 
         # Verify account credentials
-        password = getpass.getpass("Enter password:")
-        if not verify_password(password, db_name):
-            raise AccountException("Error: [Account] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise AccountException(f"Error: [Account] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise AccountException("Error: [Account] - Entered password is incorrect")
 
         # View account credentials
-        encryption_key = derive_encryption_key(password)
         store_hid = get_deterministic_hash(store)
         account_hid = get_deterministic_hash(account)
-        with sqlite3.connect(os.path.join(db_path, db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store id from db
-                db_result = cursor.execute(f"SELECT id FROM store WHERE hid='{store_hid}'")
-                store_id_record = db_result.fetchone()
-                if store_id_record is None:
-                    raise DatabaseException("Error: [Database] - Store does not exists.")
-                store_id = store_id_record[0]
-
-                # Get account credentials from db
-                account_db_result = cursor.execute(
-                    f"SELECT {field} FROM account "
-                    f"  LEFT JOIN password ON account.id=password.id "
-                    f"WHERE account.id='{store_id}' "
-                    f"  AND account.hid='{account_hid}'"
-                )
-                account_records = account_db_result.fetchone()
-                value = account_records[0]
-
-                # Copy to clipboard
-                pyperclip.copy(decrypt(value, encryption_key))
-
-                # Print message on standard output
-                print("Value copied to the clipboard.")
-            except Exception as e:
-                raise DatabaseException("Error: [Database] - Could not get account in the store.")
+        vault = context.vault
+        try:
+            # Get store id from db
+            store_id = vault.get_store_id(store_hid)
+            if store_id is None:
+                raise DatabaseException("Error: [Database] - Store does not exists.")
+
+            # Get account credentials from db
+            account_record = vault.latest_password(store_id, account_hid)
+            if account_record is None:
+                raise DatabaseException("Error: [Database] - Account does not exist in the store.")
+            value = account_record[("username", "email", "password").index(field) + 1]
+
+            # Copy to clipboard
+            pyperclip.copy(context.decrypt(value))
+
+            # Print message on standard output
+            print("Value copied to the clipboard.")
+        except Exception as e:
+            raise DatabaseException("Error: [Database] - Could not get account in the store.")
     except AccountException as e:
         raise e
     except Exception as e:
@@ -409,18 +377,21 @@ def update_account(args):
             # Get password from user
             selected_password = getpass.getpass("Enter password to save for this account:")
 
-            # Generate a rainbow table
-            rainbow_table = []
-            with open(get_rainbow_table_path(), "r") as file:
-                for line in file:
-                    rainbow_table.append(line.strip())
+            # Load the rainbow table and the breach filter
+            rainbow_table = load_rainbow_table(get_rainbow_table_path(), get_rainbow_index_path())
+            breach_filter = load_bloom_filter(get_breach_filter_path())
 
             # Compute password strength
             strength = calculate_password_strength(selected_password)
-            rainbow_match, distance = find_most_similar_password(selected_password, rainbow_table)
             print(f"You have chosen a password with strength: {strength}")
-            if rainbow_match is not None and distance < 5:
-                print(f"Your chosen password is very similar to a dictionary password '{rainbow_match}'")
+            if breach_filter is not None and selected_password in breach_filter:
+                print("Your chosen password appears in a known password breach")
+            else:
+                rainbow_match, distance = find_most_similar_password(
+                    selected_password, rainbow_table, max_distance=RAINBOW_SIMILARITY_THRESHOLD
+                )
+                if rainbow_match is not None:
+                    print(f"Your chosen password is very similar to a dictionary password '{rainbow_match}'")
         elif set_auto_gen_password:
             # Auto generate password
             selected_password = generate_random_password(
@@ -430,56 +401,41 @@ def update_account(args):
             raise AccountException("Error: [Account] - Password to set cannot be empty.")
 
         # Verify account credentials
-        password = getpass.getpass("Enter password:")
-        if not verify_password(password, db_name):
-            raise AccountException("Error: [Account] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise AccountException(f"Error: [Account] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise AccountException("Error: [Account] - Entered password is incorrect")
 
         # Create account
-        encryption_key = derive_encryption_key(password)
         store_hid = get_deterministic_hash(store)
         account_hid = get_deterministic_hash(account)
-        encrypted_password_to_save = encrypt(selected_password, encryption_key)
-        with sqlite3.connect(os.path.join(db_path, db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store id from db
-                db_result = cursor.execute(f"SELECT id FROM store WHERE hid='{store_hid}'")
-                store_id_record = db_result.fetchone()
-                if store_id_record is None:
-                    raise DatabaseException("Error: [Database] - Store does not exists.")
-                store_id = store_id_record[0]
-
-                # Get account id from db
-                account_db_result = cursor.execute(
-                    f"SELECT id FROM account WHERE hid='{account_hid}' AND store_id='{store_id}'"
-                )
-                account_id_record = account_db_result.fetchone()
-                if account_id_record is None:
-                    raise DatabaseException("Erorr: [Database] - Account does not exist in the store.")
-                account_id = account_id_record[0]
-
-                # Save new password
-                cursor.execute(
-                    f"INSERT INTO password (account_id, password) VALUES ("
-                    f"  '{account_id}', '{encrypted_password_to_save}'"
-                    f")"
-                )
-                connection.commit()
-
-                # Print message on standard output
-                print("Account updated successfully!")
-            except sqlite3.IntegrityError as e:
-                raise AccountException(
-                    "Error: [Account] - Could not update account in store. "
-                    "Please ensure that the account exists."
-                )
-            except Exception as e:
-                raise DatabaseException(f"Error: [Database] - {str(e)}")
-            finally:
-                if cursor is not None:
-                    cursor.close()
+        encrypted_password_to_save = context.encrypt(selected_password)
+        vault = context.vault
+        try:
+            # Get store id from db
+            store_id = vault.get_store_id(store_hid)
+            if store_id is None:
+                raise DatabaseException("Error: [Database] - Store does not exists.")
+
+            # Get account id from db
+            account_id = vault.get_account_id(store_id, account_hid)
+            if account_id is None:
+                raise DatabaseException("Erorr: [Database] - Account does not exist in the store.")
+
+            # Save new password
+            with vault.transaction():
+                vault.insert_password(account_id, encrypted_password_to_save)
+
+            # Print message on standard output
+            print("Account updated successfully!")
+        except sqlite3.IntegrityError as e:
+            raise AccountException(
+                "Error: [Account] - Could not update account in store. "
+                "Please ensure that the account exists."
+            )
+        except Exception as e:
+            raise DatabaseException(f"Error: [Database] - {str(e)}")
     except AccountException as e:
         raise e
     except Exception as e:
@@ -513,49 +469,40 @@ def delete_account(args):
         account = args.account
 
         # Verify account credentials
-        password = getpass.getpass("Enter password:")
-        if not verify_password(password, db_name):
-            raise AccountException("Error: [Account] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise AccountException(f"Error: [Account] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise AccountException("Error: [Account] - Entered password is incorrect")
 
         # Delete account
-        encryption_key = derive_encryption_key(password)
         store_hid = get_deterministic_hash(store)
         account_hid = get_deterministic_hash(account)
-        with sqlite3.connect(os.path.join(db_path, db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store id from db
-                db_result = cursor.execute(f"SELECT id FROM store WHERE hid='{store_hid}'")
-                store_id_record = db_result.fetchone()
-                if store_id_record is None:
-                    raise DatabaseException("Error: [Database] - Store does not exists.")
-                store_id = store_id_record[0]
-
-                # Get account id from db
-                account_db_result = cursor.execute(f"SELECT * FROM account WHERE store_id='{store_id}' AND hid='{account_hid}'")
-                account_record = account_db_result.fetchone()
-                account_id = account_record[0]
-
-                # Delete passwords and account from db
-                cursor.execute("BEGIN TRANSACTION")
-                cursor.execute(f"DELETE FROM password WHERE account_id='{account_id}'")
-                cursor.execute(f"DELETE FROM account WHERE store_id='{store_id}' AND hid='{account_hid}'")
-                connection.commit()
-
-                # Print message on standard output
-                print("Account deleted successfully!")
-            except sqlite3.IntegrityError as e:
-                raise AccountException(
-                    "Error: [Account] - Could not update account in store. "
-                    "Please ensure that the account exists."
-                )
-            except Exception as e:
-                raise DatabaseException(f"Error: [Database] - {str(e)}")
-            finally:
-                if cursor is not None:
-                    cursor.close()
+        vault = context.vault
+        try:
+            # Get store id from db
+            store_id = vault.get_store_id(store_hid)
+            if store_id is None:
+                raise DatabaseException("Error: [Database] - Store does not exists.")
+
+            # Get account id from db
+            account_id = vault.get_account_id(store_id, account_hid)
+            if account_id is None:
+                raise DatabaseException("Error: [Database] - Account does not exist in the store.")
+
+            # Delete passwords and account from db
+            with vault.transaction():
+                vault.delete_account(account_id)
+
+            # Print message on standard output
+            print("Account deleted successfully!")
+        except sqlite3.IntegrityError as e:
+            raise AccountException(
+                "Error: [Account] - Could not update account in store. "
+                "Please ensure that the account exists."
+            )
+        except Exception as e:
+            raise DatabaseException(f"Error: [Database] - {str(e)}")
     except AccountException as e:
         raise e
     except Exception as e:
@@ -571,6 +518,9 @@ def view_account_history(args):
             - `args.db`: Name of the database.
             - `args.store`: Name of the store containing the account.
             - `args.account`: Name of the account whose password history is to be viewed.
+            - `args.format`: Output format, one of `table`, `json`, `jsonl` or `tsv`.
+            - `args.limit`, `args.offset`: Optional page of the rows to show.
+            - `args.since`, `args.until`: Optional range of creation dates of the rows to show.
 
     Raises:
         AccountException: If encountered errors, such as:
@@ -587,56 +537,46 @@ def view_account_history(args):
         db_file_name = get_db_file_name(db_name)
         store = args.store
         account = args.account
+        output_format = args.format
+        page = Page(args.limit, args.offset, args.since, args.until)
 
         # Verify account credentials
-        password = getpass.getpass("Enter password:")
-        if not verify_password(password, db_name):
-            raise AccountException("Error: [Account] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise AccountException(f"Error: [Account] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise AccountException("Error: [Account] - Entered password is incorrect")
 
         # Delete account
-        encryption_key = derive_encryption_key(password)
         store_hid = get_deterministic_hash(store)
         account_hid = get_deterministic_hash(account)
-        with sqlite3.connect(os.path.join(db_path, db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store id from db
-                db_result = cursor.execute(f"SELECT id FROM store WHERE hid='{store_hid}'")
-                store_id_record = db_result.fetchone()
-                if store_id_record is None:
-                    raise DatabaseException("Error: [Database] - Store does not exists.")
-                store_id = store_id_record[0]
-
-                # Get account id from db
-                account_db_result = cursor.execute(f"SELECT * FROM account WHERE store_id='{store_id}' AND hid='{account_hid}'")
-                account_record = account_db_result.fetchone()
-                account_id = account_record[0]
-
-                # Get passwords from db
-                password_db_result = cursor.execute(f"SELECT * from password WHERE account_id='{account_id}' ORDER BY id DESC")
-                password_records = password_db_result.fetchall()
-                output = []
-                for r in password_records:
-                    output.append(
-                        (decrypt(r[2], encryption_key), r[3])
-                    )
-                
-                # Display in less
-                display_table_in_less_with_ansi(
-                    header=("Password", "Created At"), rows=output
-                )
-            except sqlite3.IntegrityError as e:
-                raise AccountException(
-                    "Error: [Account] - Could not get account in store. "
-                    "Please ensure that the account exists."
-                )
-            except Exception as e:
-                raise DatabaseException(f"Error: [Database] - {str(e)}")
-            finally:
-                if cursor is not None:
-                    cursor.close()
+        vault = context.vault
+        try:
+            # Get store id from db
+            store_id = vault.get_store_id(store_hid)
+            if store_id is None:
+                raise DatabaseException("Error: [Database] - Store does not exists.")
+
+            # Get account id from db
+            account_id = vault.get_account_id(store_id, account_hid)
+            if account_id is None:
+                raise DatabaseException("Error: [Database] - Account does not exist in the store.")
+
+            # Get passwords from db, decrypting them in batches as they are displayed
+            password_records = vault.password_history(account_id, page)
+            output = context.decrypt_rows(password_records, (0,))
+
+            # Display in less or write to standard output
+            display_rows(
+                header=("Password", "Created At"), rows=output, output_format=output_format
+            )
+        except sqlite3.IntegrityError as e:
+            raise AccountException(
+                "Error: [Account] - Could not get account in store. "
+                "Please ensure that the account exists."
+            )
+        except Exception as e:
+            raise DatabaseException(f"Error: [Database] - {str(e)}")
     except AccountException as e:
         raise e
     except Exception as e:
@@ -0,0 +1,296 @@
+import getpass
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import time
+from typing import Any, Dict, Tuple
+
+from pm.context import derive_verified_encryption_key, forget_vault_context
+from pm.util.agent_util import send_agent_request
+from pm.util.path_util import file_exists_in_path, file_exists, get_db_path, get_db_file_name, \
+    get_agent_socket_path, remove_file
+
+
+DEFAULT_AGENT_TTL = 900  # Seconds an unlocked db may stay idle before the agent forgets its key
+
+
+class AgentException(Exception):
+    """Exception raised for errors while talking to or running the unlock agent."""
+    pass
+
+
+def start_agent(args: Any):
+    """
+    Starts the unlock agent which keeps derived encryption keys in memory and serves them over a unix socket.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.ttl`: Default idle time (in seconds) after which an unlocked db is locked again.
+            - `args.foreground`: Flag to keep the agent attached to the terminal instead of daemonizing.
+
+    Raises:
+        AgentException: If encountered errors, such as:
+            - An agent is already running.
+            - The agent socket could not be created.
+    """
+    try:
+        # Read input params
+        socket_path = get_agent_socket_path()
+        ttl = args.ttl if args.ttl is not None else DEFAULT_AGENT_TTL
+        foreground = args.foreground
+
+        # Ensure only one agent is running
+        if send_agent_request({"command": "ping"}) is not None:
+            raise AgentException("Error: [Agent] - An agent is already running.")
+        if file_exists(socket_path):
+            remove_file(socket_path)
+
+        if not foreground:
+            if os.fork() != 0:
+                # Wait for the daemon to start listening
+                for _ in range(50):
+                    if send_agent_request({"command": "ping"}) is not None:
+                        print("Agent started successfully!")
+                        return
+                    time.sleep(0.1)
+                raise AgentException("Error: [Agent] - Agent did not start in time.")
+            _detach_from_terminal()
+
+        # Serve requests until asked to stop
+        previous_umask = os.umask(0o177)
+        try:
+            server = _AgentServer(socket_path, ttl)
+        finally:
+            os.umask(previous_umask)
+        try:
+            if foreground:
+                print(f"Agent listening on {socket_path}")
+            while not server.stopping:
+                server.handle_request()
+                server.service_actions()
+        finally:
+            server.server_close()
+            if file_exists(socket_path):
+                remove_file(socket_path)
+            if not foreground:
+                os._exit(0)
+    except AgentException as e:
+        raise e
+    except Exception as e:
+        raise AgentException("Error: [Agent] - Could not start agent.") from e
+
+
+def stop_agent(args: Any):
+    """
+    Stops the running unlock agent. All keys held by the agent are discarded.
+
+    Args:
+        args (Any): Command-line arguments. No arguments are used.
+
+    Raises:
+        AgentException: If the agent is not running or could not be stopped.
+    """
+    try:
+        if send_agent_request({"command": "stop"}) is None:
+            raise AgentException("Error: [Agent] - Agent is not running.")
+
+        # Print message on standard output
+        print("Agent stopped successfully!")
+    except AgentException as e:
+        raise e
+    except Exception as e:
+        raise AgentException("Error: [Agent] - Could not stop agent.") from e
+
+
+def unlock_db_in_agent(args: Any):
+    """
+    Verifies the master password of a db and hands its derived encryption key to the running agent.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.ttl`: Optional idle time (in seconds) after which the db is locked again.
+
+    Raises:
+        AgentException: If encountered errors, such as:
+            - The agent is not running.
+            - The entered password is incorrect.
+            - The database does not exist.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        ttl = args.ttl
+
+        # Verify account credentials
+        if send_agent_request({"command": "ping"}) is None:
+            raise AgentException("Error: [Agent] - Agent is not running. Start it with `safe-pm agent start`.")
+        if not file_exists_in_path(db_path, db_file_name):
+            raise AgentException(f"Error: [Agent] - The requested db with name {db_name} does not exist")
+        password = getpass.getpass("Enter password:")
+        encryption_key = derive_verified_encryption_key(db_name, password)
+        if encryption_key is None:
+            raise AgentException("Error: [Agent] - Entered password is incorrect")
+
+        # Hand the derived key over to the agent
+        response = send_agent_request(
+            {"command": "add", "db": db_name, "key": encryption_key.decode("utf-8"), "ttl": ttl}
+        )
+        if response is None or response.get("status") != "ok":
+            raise AgentException("Error: [Agent] - Agent refused to unlock the db.")
+
+        # Print message on standard output
+        print("Database unlocked in agent successfully!")
+    except AgentException as e:
+        raise e
+    except Exception as e:
+        raise AgentException("Error: [Agent] - Could not unlock the db in agent.") from e
+
+
+def lock_db_in_agent(args: Any):
+    """
+    Makes the running agent forget the key of one db, or of all dbs if no db is given. The key is
+    forgotten by this process as well, e.g. when locking from a shell.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Optional name of the database to lock.
+
+    Raises:
+        AgentException: If the agent is not running or the db could not be locked.
+    """
+    try:
+        if send_agent_request({"command": "remove", "db": args.db}) is None:
+            raise AgentException("Error: [Agent] - Agent is not running.")
+        forget_vault_context(args.db)
+
+        # Print message on standard output
+        print("Database locked successfully!" if args.db else "All databases locked successfully!")
+    except AgentException as e:
+        raise e
+    except Exception as e:
+        raise AgentException("Error: [Agent] - Could not lock the db in agent.") from e
+
+
+def show_agent_status(args: Any):
+    """
+    Prints whether the agent is running and which dbs it currently holds unlocked.
+
+    Args:
+        args (Any): Command-line arguments. No arguments are used.
+
+    Raises:
+        AgentException: If the agent status could not be read.
+    """
+    try:
+        response = send_agent_request({"command": "status"})
+        if response is None:
+            print("Agent is not running.")
+            return
+
+        print("Agent is running.")
+        for db_name, expires_in in sorted(response.get("dbs", {}).items()):
+            print(f"  {db_name}: locks in {expires_in}s if idle")
+    except Exception as e:
+        raise AgentException("Error: [Agent] - Could not get agent status.") from e
+
+
+# Private methods
+
+
+class _AgentServer(socketserver.UnixStreamServer):
+    """
+    Unix socket server holding derived keys of unlocked dbs in memory.
+
+    Keys are kept in `keys` as a mapping of db name to a tuple of key, idle ttl and the time
+    the key was last used. Expired keys are dropped after every request and at least once a second.
+    """
+
+    def __init__(self, socket_path: str, ttl: int):
+        super().__init__(socket_path, _AgentRequestHandler)
+        self.timeout = 1
+        self.ttl = ttl
+        self.stopping = False
+        self.keys: Dict[str, Tuple[str, int, float]] = {}
+
+    def service_actions(self):
+        now = time.monotonic()
+        for db_name in [k for k, (_, ttl, last_used) in self.keys.items() if now - last_used > ttl]:
+            del self.keys[db_name]
+
+    def handle_agent_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        command = request.get("command")
+        db_name = request.get("db")
+        self.service_actions()
+
+        if command == "ping":
+            return {"status": "ok"}
+        if command == "add" and db_name and request.get("key"):
+            ttl = request.get("ttl") or self.ttl
+            self.keys[db_name] = (request["key"], int(ttl), time.monotonic())
+            return {"status": "ok"}
+        if command == "get" and db_name in self.keys:
+            key, ttl, _ = self.keys[db_name]
+            self.keys[db_name] = (key, ttl, time.monotonic())
+            return {"status": "ok", "key": key}
+        if command == "remove":
+            if db_name:
+                self.keys.pop(db_name, None)
+            else:
+                self.keys.clear()
+            return {"status": "ok"}
+        if command == "status":
+            now = time.monotonic()
+            return {
+                "status": "ok",
+                "dbs": {k: int(ttl - (now - last_used)) for k, (_, ttl, last_used) in self.keys.items()}
+            }
+        if command == "stop":
+            self.keys.clear()
+            self.stopping = True
+            return {"status": "ok"}
+        return {"status": "error"}
+
+
+class _AgentRequestHandler(socketserver.StreamRequestHandler):
+    """Handles a single newline delimited JSON request on the agent socket."""
+
+    def handle(self):
+        if not _is_same_user(self.request):
+            return
+        line = self.rfile.readline()
+        try:
+            response = self.server.handle_agent_request(json.loads(line))
+        except ValueError:
+            response = {"status": "error"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+def _is_same_user(connection: socket.socket) -> bool:
+    """
+    Checks that the peer of a unix socket connection runs as the same user as the agent.
+
+    Args:
+        connection (socket.socket): The accepted connection.
+
+    Returns:
+        bool: True if the peer is the same user or peer credentials are unavailable on this platform.
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid == os.getuid()
+
+
+def _detach_from_terminal():
+    """Detaches the forked agent process from the controlling terminal and standard streams."""
+    os.setsid()
+    with open(os.devnull, "r+b") as devnull:
+        for stream in (sys.stdin, sys.stdout, sys.stderr):
+            os.dup2(devnull.fileno(), stream.fileno())
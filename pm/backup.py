@@ -0,0 +1,184 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any
+
+from pm.context import forget_vault_context
+from pm.util.agent_util import send_agent_request
+from pm.util.backup_util import BACKUP_CHUNK_BYTES, BackupUtilException, ChunkStore
+from pm.util.path_util import file_exists_in_path, get_backup_path, get_db_path, get_db_file_name
+from pm.vault import close_vault
+
+
+class BackupException(Exception):
+    """Exception raised for errors while backing up or restoring a database."""
+    pass
+
+
+def backup_db(args: Any):
+    """
+    Backs up a database as a new version in its backup directory, or lists the versions.
+
+    A consistent snapshot is taken with the sqlite online backup API, so the database stays usable
+    while it is copied. The snapshot is split into page-aligned chunks that are stored by the
+    hash of their content: chunks already stored by an earlier version are not written again, so
+    a version costs about the size of the pages changed since the last one. The database is backed
+    up as stored, encrypted, and does not need to be unlocked.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.dir`: Optional backup directory, `backups/<db>` next to the db directory if not given.
+            - `args.list`: Whether to list the versions instead of creating one.
+
+    Raises:
+        BackupException: If encountered errors, such as:
+            - The database does not exist.
+            - The snapshot or the chunks cannot be written.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        chunk_store = ChunkStore(args.dir if args.dir is not None else get_backup_path(db_name))
+
+        if args.list:
+            _list_versions(chunk_store)
+            return
+
+        if not file_exists_in_path(db_path, db_file_name):
+            raise BackupException(f"Error: [Backup] - The requested db with name {db_name} does not exist")
+
+        # Take a consistent snapshot
+        os.makedirs(chunk_store.root, exist_ok=True)
+        snapshot_path = os.path.join(chunk_store.root, f".snapshot-{os.getpid()}.tmp")
+        try:
+            with closing(sqlite3.connect(os.path.join(db_path, db_file_name))) as source, \
+                    closing(sqlite3.connect(snapshot_path)) as target:
+                source.backup(target)
+                page_size = target.execute("PRAGMA page_size").fetchone()[0]
+
+            # Store the chunks that changed and the manifest of the version
+            chunk_bytes = max(BACKUP_CHUNK_BYTES, page_size)
+            stored = chunk_store.put_file(snapshot_path, chunk_bytes)
+            version = chunk_store.write_manifest({
+                "db": db_name,
+                "date_created": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "page_size": page_size,
+                "chunk_bytes": chunk_bytes,
+                "size": stored["size"],
+                "new_bytes": stored["new_bytes"],
+                "chunks": stored["chunks"],
+            })
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+
+        # Print message on standard output
+        print(
+            f"Backed up {db_name} as version {version}: {stored['size']} bytes in {len(stored['chunks'])} chunks, "
+            f"{stored['new_bytes']} bytes new."
+        )
+    except BackupException as e:
+        raise e
+    except BackupUtilException as e:
+        raise BackupException(str(e)) from e
+    except Exception as e:
+        raise BackupException(f"Error: [Backup] - Could not back up the database: {str(e)}") from e
+
+
+def restore_db(args: Any):
+    """
+    Restores a database from a version of its backups.
+
+    The database file is rebuilt from the chunks of the version, each verified against its hash,
+    and checked by sqlite before it replaces the database. Replacing an existing database
+    requires `args.force`; its key is removed from the agent and from this process, since the
+    restored version may have a different one.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database whose backups to restore from.
+            - `args.backup_version`: The version to restore.
+            - `args.dir`: Optional backup directory, `backups/<db>` next to the db directory if not given.
+            - `args.to`: Optional name of the database to restore to, `args.db` if not given.
+            - `args.force`: Whether to replace the database if it exists.
+
+    Raises:
+        BackupException: If encountered errors, such as:
+            - The version does not exist, or a chunk of it is missing or damaged.
+            - The database exists and `args.force` is not given.
+            - The rebuilt database fails the integrity check.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        version = args.backup_version
+        target_name = args.to if args.to is not None else db_name
+        target_file_name = get_db_file_name(target_name)
+        target_path = os.path.join(db_path, target_file_name)
+        chunk_store = ChunkStore(args.dir if args.dir is not None else get_backup_path(db_name))
+
+        manifest = chunk_store.read_manifest(version)
+        if manifest is None:
+            raise BackupException(f"Error: [Backup] - Version {version} of {db_name} does not exist")
+        target_exists = file_exists_in_path(db_path, target_file_name)
+        if target_exists and not args.force:
+            raise BackupException(
+                f"Error: [Backup] - The db with name {target_name} exists. Pass --force to replace it."
+            )
+
+        # Rebuild and check the database
+        os.makedirs(db_path, exist_ok=True)
+        temp_path = target_path + ".restore.tmp"
+        try:
+            chunk_store.get_file(manifest, temp_path)
+            with closing(sqlite3.connect(temp_path)) as connection:
+                result = connection.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise BackupException(f"Error: [Backup] - The rebuilt database is damaged: {result}")
+
+            # Replace the database, with its write-ahead log folded in and removed first. The
+            # connection and key of this process, e.g. of a shell, would keep using the old file.
+            close_vault(target_name)
+            forget_vault_context(target_name)
+            if target_exists:
+                with closing(sqlite3.connect(target_path)) as connection:
+                    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            os.replace(temp_path, target_path)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(target_path + suffix):
+                    os.remove(target_path + suffix)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if target_exists:
+            send_agent_request({"command": "remove", "db": target_name})
+
+        # Print message on standard output
+        print(f"Restored version {version} of {db_name} ({manifest['date_created']} UTC) to {target_name}.")
+    except BackupException as e:
+        raise e
+    except BackupUtilException as e:
+        raise BackupException(str(e)) from e
+    except Exception as e:
+        raise BackupException(f"Error: [Backup] - Could not restore the database: {str(e)}") from e
+
+
+# Private methods
+
+
+def _list_versions(chunk_store: ChunkStore):
+    manifests = list(chunk_store.iter_manifests())
+    if not manifests:
+        print("No backups yet.")
+        return
+    for manifest in manifests:
+        print(
+            f"Version {manifest['version']}  {manifest['date_created']} UTC  {manifest['size']} bytes  "
+            f"{manifest['new_bytes']} bytes new"
+        )
@@ -0,0 +1,207 @@
+import itertools
+import json
+import sqlite3
+import sys
+from typing import Any, Dict, List, Tuple
+
+from pm.context import get_vault_context
+from pm.util.bloom_util import load_bloom_filter
+from pm.util.crypto_util import get_deterministic_hash
+from pm.util.password_util import generate_random_password
+from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name, get_breach_filter_path
+
+
+class BatchException(Exception):
+    """Exception raised for errors while applying a batch of operations."""
+    pass
+
+
+BATCH_OPERATIONS = ("create", "update", "delete")
+_PASSWORD_OPTIONS = ("pass_min_length", "pass_max_length", "pass_no_special", "pass_no_digits", "pass_exclude_chars")
+
+
+def apply_batch(args: Any):
+    """
+    Applies a batch of account operations read from a JSON lines file, all or nothing.
+
+    Each line is an object with an `op` of `create`, `update` or `delete` and the `store` and
+    `account` it applies to. `create` also takes an optional `username` and `email`. `create` and
+    `update` take either a `password` or `"auto_gen_password": true`, optionally with the same
+    `pass_*` options as the account commands. For example:
+
+        {"op": "create", "store": "ci", "account": "svc-1", "username": "svc-1", "auto_gen_password": true}
+
+    The database is unlocked once, consecutive operations of the same kind are encrypted together
+    with `encrypt_many`, on worker processes for large runs, and written with one prepared
+    statement each, and everything is committed in a single transaction. If any
+    operation fails, none are applied.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.file`: Optional path to the operations; standard input if not given.
+
+    Raises:
+        BatchException: If encountered errors, such as:
+            - The database does not exist.
+            - The entered password is incorrect.
+            - An operation is invalid, or refers to a store or account that does not exist.
+            - An account to create already exists.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        operations = _read_operations(args.file)
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise BatchException(f"Error: [Batch] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise BatchException("Error: [Batch] - Entered password is incorrect")
+
+        # Warn about passwords found in an imported breach corpus
+        breach_filter = load_bloom_filter(get_breach_filter_path())
+        if breach_filter is not None:
+            for line_number, operation in operations:
+                if "password" in operation and operation["password"] in breach_filter:
+                    print(f"Line {line_number}: the password appears in a known password breach")
+
+        # Apply operations
+        vault = context.vault
+        counts = {operation: 0 for operation in BATCH_OPERATIONS}
+        store_ids: Dict[str, int] = {}
+        with vault.transaction():
+            for kind, group in itertools.groupby(operations, key=lambda item: item[1]["op"]):
+                group = list(group)
+                resolved = [
+                    (line_number, operation, _get_store_id(vault, store_ids, line_number, operation["store"]))
+                    for line_number, operation in group
+                ]
+                if kind == "create":
+                    _create_accounts(context, resolved)
+                elif kind == "update":
+                    _update_accounts(context, resolved)
+                else:
+                    _delete_accounts(context, resolved)
+                counts[kind] += len(group)
+
+        # Print message on standard output
+        print(
+            f"Batch applied successfully: {counts['create']} created, {counts['update']} updated, "
+            f"{counts['delete']} deleted."
+        )
+    except BatchException as e:
+        raise e
+    except Exception as e:
+        raise BatchException(f"Error: [Batch] - Could not apply the batch, no changes were made: {str(e)}") from e
+
+
+# Private methods
+
+
+def _read_operations(file_path) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Reads and validates every operation before anything is applied.
+
+    Returns:
+        List[Tuple[int, Dict[str, Any]]]: The line number and the operation, in order.
+    """
+    stream = open(file_path, "r") if file_path is not None else sys.stdin
+    try:
+        operations = []
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                operation = json.loads(line)
+            except ValueError as e:
+                raise BatchException(f"Error: [Batch] - Line {line_number} is not valid JSON: {str(e)}")
+            if not isinstance(operation, dict) or operation.get("op") not in BATCH_OPERATIONS:
+                raise BatchException(f"Error: [Batch] - Line {line_number} needs an 'op' of {', '.join(BATCH_OPERATIONS)}")
+            for field in ("store", "account"):
+                if not isinstance(operation.get(field), str) or not operation[field]:
+                    raise BatchException(f"Error: [Batch] - Line {line_number} needs a '{field}'")
+            if operation["op"] != "delete" and "password" not in operation and not operation.get("auto_gen_password"):
+                raise BatchException(f"Error: [Batch] - Line {line_number} needs a 'password' or 'auto_gen_password'")
+            operations.append((line_number, operation))
+        return operations
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _get_store_id(vault, store_ids: Dict[str, int], line_number: int, store: str) -> int:
+    if store not in store_ids:
+        store_id = vault.get_store_id(get_deterministic_hash(store))
+        if store_id is None:
+            raise BatchException(f"Error: [Batch] - Line {line_number}: store '{store}' does not exist")
+        store_ids[store] = store_id
+    return store_ids[store]
+
+
+def _get_account_id(vault, line_number: int, store_id: int, operation: Dict[str, Any]) -> int:
+    account_id = vault.get_account_id(store_id, get_deterministic_hash(operation["account"]))
+    if account_id is None:
+        raise BatchException(
+            f"Error: [Batch] - Line {line_number}: account '{operation['account']}' does not exist "
+            f"in store '{operation['store']}'"
+        )
+    return account_id
+
+
+def _password_of(operation: Dict[str, Any]) -> str:
+    if "password" in operation:
+        return operation["password"]
+    return generate_random_password(*(operation.get(option) for option in _PASSWORD_OPTIONS))
+
+
+def _create_accounts(context, operations: List[Tuple[int, Dict[str, Any], int]]):
+    vault = context.vault
+    for line_number, operation, store_id in operations:
+        if vault.get_account_id(store_id, get_deterministic_hash(operation["account"])) is not None:
+            raise BatchException(
+                f"Error: [Batch] - Line {line_number}: account '{operation['account']}' already exists "
+                f"in store '{operation['store']}'"
+            )
+
+    # Encrypt the name, username, email and password of every account at once
+    encrypted = context.encrypt_many([
+        value
+        for _, operation, _ in operations
+        for value in (
+            operation["account"], operation.get("username") or "", operation.get("email") or "", _password_of(operation)
+        )
+    ])
+    try:
+        vault.insert_accounts(
+            (store_id, get_deterministic_hash(operation["account"]), *encrypted[i * 4:i * 4 + 3])
+            for i, (_, operation, store_id) in enumerate(operations)
+        )
+    except sqlite3.IntegrityError:
+        raise BatchException("Error: [Batch] - An account to create is listed twice or its name is already taken")
+
+    vault.insert_passwords(
+        (_get_account_id(vault, line_number, store_id, operation), encrypted[i * 4 + 3])
+        for i, (line_number, operation, store_id) in enumerate(operations)
+    )
+
+
+def _update_accounts(context, operations: List[Tuple[int, Dict[str, Any], int]]):
+    vault = context.vault
+    account_ids = [
+        _get_account_id(vault, line_number, store_id, operation)
+        for line_number, operation, store_id in operations
+    ]
+    passwords = context.encrypt_many([_password_of(operation) for _, operation, _ in operations])
+    vault.insert_passwords(zip(account_ids, passwords))
+
+
+def _delete_accounts(context, operations: List[Tuple[int, Dict[str, Any], int]]):
+    vault = context.vault
+    vault.delete_accounts([
+        _get_account_id(vault, line_number, store_id, operation)
+        for line_number, operation, store_id in operations
+    ])
@@ -1,10 +1,12 @@
 import argparse
+import importlib
 
-from pm.account import delete_account, view_account_history, update_account, \
-    copy_account_credentials, view_account_credentials, create_account, \
-    list_accounts
-from pm.setup import setup_safe
-from pm.store import create_store_password, rename_store, delete_store, list_stores
+from pm.util.cipher_util import CIPHERS
+from pm.util.console_util import OUTPUT_FORMATS
+from pm.util.import_util import IMPORT_FORMATS
+from pm.util.kdf_util import KDF_BACKENDS
+from pm.util.profile_util import JOURNAL_MODES, SYNCHRONOUS_MODES
+from pm.util.time_util import parse_timestamp
 
 
 def cli_start():
@@ -30,6 +32,26 @@ def cli_start():
             print(f"Encountered error: {catch_all_exception}")
 
 
+def lazy_command(module_name, function_name):
+    """
+    Returns a command function that imports the module implementing the command only when the
+    command is run, so that building the parser, `--help` and `--version` do not pay for the
+    imports of every command.
+
+    Args:
+        module_name (str): The module implementing the command, e.g. `pm.account`.
+        function_name (str): The name of the command function in the module.
+
+    Returns:
+        Callable[[Any], None]: The command function.
+    """
+    def command(args):
+        return getattr(importlib.import_module(module_name), function_name)(args)
+
+    command.__name__ = function_name
+    return command
+
+
 def create_parser():
     parser = argparse.ArgumentParser(prog="safe-pm", description="SafePM: A secure, simple, open-source password manager.")
     parser.add_argument("-v", "--version", action="store_true", help="Print version")
@@ -39,6 +61,15 @@ def create_parser():
     attach_setup_subparser(program_subparser)
     attach_store_subparser(program_subparser)
     attach_account_subparser(program_subparser)
+    attach_agent_subparser(program_subparser)
+    attach_db_subparser(program_subparser)
+    attach_rainbow_subparser(program_subparser)
+    attach_shell_subparser(program_subparser)
+    attach_batch_subparser(program_subparser)
+    attach_import_subparser(program_subparser)
+    attach_export_subparser(program_subparser)
+    attach_backup_subparser(program_subparser)
+    attach_restore_subparser(program_subparser)
 
     return parser
 
@@ -47,7 +78,12 @@ def attach_setup_subparser(program_subparser):
     description = "Create a new database for storing passwords."
     setup_program_parser = program_subparser.add_parser("setup", description=description, help=description.lower())
     setup_program_parser.add_argument("--db", type=str, help="name of the database to create", required=True)
-    setup_program_parser.set_defaults(func=setup_safe)
+    setup_program_parser.add_argument("--kdf-target-ms", type=int, help="target unlock time in milliseconds (default 500)")
+    setup_program_parser.add_argument("--kdf-max-memory-mb", type=int, help="maximum memory in MiB used to unlock (default 256)")
+    setup_program_parser.add_argument("--kdf", choices=list(KDF_BACKENDS), help="key derivation function (default scrypt)")
+    setup_program_parser.add_argument("--cipher", choices=CIPHERS, help="format values are encrypted in (default aes-gcm)")
+    add_performance_profile_arguments(setup_program_parser)
+    setup_program_parser.set_defaults(func=lazy_command("pm.setup", "setup_safe"))
 
 
 def attach_store_subparser(program_subparser):
@@ -58,22 +94,24 @@ def attach_store_subparser(program_subparser):
     create_store_password_parser = store_command_parser.add_parser("create", help="Create a new store")
     create_store_password_parser.add_argument("--db", required=True, help="Name of the database")
     create_store_password_parser.add_argument("--store", required=True, help="Name of the store")
-    create_store_password_parser.set_defaults(func=create_store_password)
+    create_store_password_parser.set_defaults(func=lazy_command("pm.store", "create_store_password"))
 
     rename_store_parser = store_command_parser.add_parser("rename", help="Rename a store")
     rename_store_parser.add_argument("--db", required=True, help="Name of the database")
     rename_store_parser.add_argument("--store", required=True, help="Store to rename")
     rename_store_parser.add_argument("--new-name", required=True, help="New name of the store")
-    rename_store_parser.set_defaults(func=rename_store)
+    rename_store_parser.set_defaults(func=lazy_command("pm.store", "rename_store"))
 
     delete_store_parser = store_command_parser.add_parser("delete", help="Delete a store")
     delete_store_parser.add_argument("--db", required=True, help="Name of the database")
     delete_store_parser.add_argument("--store", required=True, help="Name of the store")
-    delete_store_parser.set_defaults(func=delete_store)
+    delete_store_parser.set_defaults(func=lazy_command("pm.store", "delete_store"))
 
     list_stores_parser = store_command_parser.add_parser("list", help="List all stores")
     list_stores_parser.add_argument("--db", required=True, help="Name of the database")
-    list_stores_parser.set_defaults(func=list_stores)
+    list_stores_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table", help="Output format (default table)")
+    add_page_arguments(list_stores_parser)
+    list_stores_parser.set_defaults(func=lazy_command("pm.store", "list_stores"))
 
 
 def attach_account_subparser(program_subparser):
@@ -84,7 +122,9 @@ def attach_account_subparser(program_subparser):
     list_accounts_parser = account_command_subparser.add_parser("list", help="List accounts")
     list_accounts_parser.add_argument("--db", required=True, help="Database name")
     list_accounts_parser.add_argument("--store", required=True, help="Store name")
-    list_accounts_parser.set_defaults(func=list_accounts)
+    list_accounts_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table", help="Output format (default table)")
+    add_page_arguments(list_accounts_parser)
+    list_accounts_parser.set_defaults(func=lazy_command("pm.account", "list_accounts"))
 
     create_account_parser = account_command_subparser.add_parser("create", help="Create an account")
     create_account_parser.add_argument("--db", required=True, help="Database name")
@@ -100,20 +140,21 @@ def attach_account_subparser(program_subparser):
     create_account_parser.add_argument("--pass-no-special", action="store_true", help="Exclude special characters")
     create_account_parser.add_argument("--pass-no-digits", action="store_true", help="Exclude digits")
     create_account_parser.add_argument("--pass-exclude-chars", help="Characters to exclude from password")
-    create_account_parser.set_defaults(func=create_account)
+    create_account_parser.set_defaults(func=lazy_command("pm.account", "create_account"))
 
     view_account_parser = account_command_subparser.add_parser("view", help="View an account")
     view_account_parser.add_argument("--db", required=True, help="Database name")
     view_account_parser.add_argument("--store", required=True, help="Store name")
     view_account_parser.add_argument("--account", required=True, help="Account name")
-    view_account_parser.set_defaults(func=view_account_credentials)
+    view_account_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table", help="Output format (default table)")
+    view_account_parser.set_defaults(func=lazy_command("pm.account", "view_account_credentials"))
 
     copy_account_parser = account_command_subparser.add_parser("copy", help="Copy an account")
     copy_account_parser.add_argument("--db", required=True, help="Database name")
     copy_account_parser.add_argument("--store", required=True, help="Store name")
     copy_account_parser.add_argument("--account", required=True, help="Account name")
     copy_account_parser.add_argument("--field", choices=["username", "email", "password"], required=True, help="Choose what to copy: username, email or password")
-    copy_account_parser.set_defaults(func=copy_account_credentials)
+    copy_account_parser.set_defaults(func=lazy_command("pm.account", "copy_account_credentials"))
 
     update_account_parser = account_command_subparser.add_parser("update", help="Update an account")
     update_account_parser.add_argument("--db", required=True, help="Database name")
@@ -127,16 +168,162 @@ def attach_account_subparser(program_subparser):
     update_account_parser.add_argument("--pass-no-special", action="store_true", help="Exclude special characters")
     update_account_parser.add_argument("--pass-no-digits", action="store_true", help="Exclude digits")
     update_account_parser.add_argument("--pass-exclude-chars", help="Characters to exclude from password")
-    update_account_parser.set_defaults(func=update_account)
+    update_account_parser.set_defaults(func=lazy_command("pm.account", "update_account"))
 
     delete_account_parser = account_command_subparser.add_parser("delete", help="Delete an account")
     delete_account_parser.add_argument("--db", required=True, help="Database name")
     delete_account_parser.add_argument("--store", required=True, help="Store name")
     delete_account_parser.add_argument("--account", required=True, help="Account name")
-    delete_account_parser.set_defaults(func=delete_account)
+    delete_account_parser.set_defaults(func=lazy_command("pm.account", "delete_account"))
 
     history_account_parser = account_command_subparser.add_parser("history", help="View account history")
     history_account_parser.add_argument("--db", required=True, help="Database name")
     history_account_parser.add_argument("--store", required=True, help="Store name")
     history_account_parser.add_argument("--account", required=True, help="Account name")
-    history_account_parser.set_defaults(func=view_account_history)
+    history_account_parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table", help="Output format (default table)")
+    add_page_arguments(history_account_parser)
+    history_account_parser.set_defaults(func=lazy_command("pm.account", "view_account_history"))
+
+
+def attach_agent_subparser(program_subparser):
+    description = "Keep unlocked databases in memory across commands."
+    agent_program_parser = program_subparser.add_parser("agent", description=description, help=description.lower())
+    agent_command_subparser = agent_program_parser.add_subparsers(dest="command", title="command", metavar="<command>", required=True)
+
+    start_agent_parser = agent_command_subparser.add_parser("start", help="Start the agent")
+    start_agent_parser.add_argument("--ttl", type=int, help="Seconds an unlocked database may stay idle (default 900)")
+    start_agent_parser.add_argument("--foreground", action="store_true", help="Do not detach from the terminal")
+    start_agent_parser.set_defaults(func=lazy_command("pm.agent", "start_agent"))
+
+    stop_agent_parser = agent_command_subparser.add_parser("stop", help="Stop the agent")
+    stop_agent_parser.set_defaults(func=lazy_command("pm.agent", "stop_agent"))
+
+    unlock_agent_parser = agent_command_subparser.add_parser("unlock", help="Unlock a database in the agent")
+    unlock_agent_parser.add_argument("--db", required=True, help="Database name")
+    unlock_agent_parser.add_argument("--ttl", type=int, help="Seconds the database may stay idle")
+    unlock_agent_parser.set_defaults(func=lazy_command("pm.agent", "unlock_db_in_agent"))
+
+    lock_agent_parser = agent_command_subparser.add_parser("lock", help="Lock a database, or all databases, in the agent")
+    lock_agent_parser.add_argument("--db", help="Database name")
+    lock_agent_parser.set_defaults(func=lazy_command("pm.agent", "lock_db_in_agent"))
+
+    status_agent_parser = agent_command_subparser.add_parser("status", help="Show agent status")
+    status_agent_parser.set_defaults(func=lazy_command("pm.agent", "show_agent_status"))
+
+
+def attach_db_subparser(program_subparser):
+    description = "Maintain an existing database."
+    db_program_parser = program_subparser.add_parser("db", description=description, help=description.lower())
+    db_command_subparser = db_program_parser.add_subparsers(dest="command", title="command", metavar="<command>", required=True)
+
+    rekdf_db_parser = db_command_subparser.add_parser("rekdf", help="Change or recalibrate the key derivation function")
+    rekdf_db_parser.add_argument("--db", required=True, help="Database name")
+    rekdf_db_parser.add_argument("--kdf", choices=list(KDF_BACKENDS), required=True, help="Key derivation function")
+    rekdf_db_parser.add_argument("--kdf-target-ms", type=int, help="Target unlock time in milliseconds (default 500)")
+    rekdf_db_parser.add_argument("--kdf-max-memory-mb", type=int, help="Maximum memory in MiB used to unlock (default 256)")
+    rekdf_db_parser.set_defaults(func=lazy_command("pm.db", "rekdf_db"))
+
+    passwd_db_parser = db_command_subparser.add_parser("passwd", help="Change the master password of a database")
+    passwd_db_parser.add_argument("--db", required=True, help="Database name")
+    passwd_db_parser.set_defaults(func=lazy_command("pm.db", "passwd_db"))
+
+    tune_db_parser = db_command_subparser.add_parser("tune", help="Change the performance profile of a database")
+    tune_db_parser.add_argument("--db", required=True, help="Database name")
+    add_performance_profile_arguments(tune_db_parser)
+    tune_db_parser.set_defaults(func=lazy_command("pm.db", "tune_db"))
+
+    migrate_cipher_db_parser = db_command_subparser.add_parser("migrate-cipher", help="Re-encrypt every value in another format")
+    migrate_cipher_db_parser.add_argument("--db", required=True, help="Database name")
+    migrate_cipher_db_parser.add_argument("--cipher", choices=CIPHERS, help="Format to encrypt values in (default aes-gcm)")
+    migrate_cipher_db_parser.set_defaults(func=lazy_command("pm.db", "migrate_cipher_db"))
+
+
+def attach_rainbow_subparser(program_subparser):
+    description = "Manage the dictionary that new passwords are checked against."
+    rainbow_program_parser = program_subparser.add_parser("rainbow", description=description, help=description.lower())
+    rainbow_command_subparser = rainbow_program_parser.add_subparsers(dest="command", title="command", metavar="<command>", required=True)
+
+    compile_rainbow_parser = rainbow_command_subparser.add_parser("compile", help="Compile the rainbow table into a fast index")
+    compile_rainbow_parser.set_defaults(func=lazy_command("pm.rainbow", "compile_rainbow"))
+
+    import_rainbow_parser = rainbow_command_subparser.add_parser("import", help="Import a breach corpus that new passwords must not appear in")
+    import_rainbow_parser.add_argument("file", help="Path to the breach corpus, one password per line")
+    import_rainbow_parser.add_argument("--false-positive-rate", type=float, help="Probability of flagging a password not in the corpus (default 0.001)")
+    import_rainbow_parser.set_defaults(func=lazy_command("pm.rainbow", "import_rainbow"))
+
+
+def attach_shell_subparser(program_subparser):
+    description = "Unlock a database once and run many commands on it."
+    shell_program_parser = program_subparser.add_parser("shell", description=description, help=description.lower())
+    shell_program_parser.add_argument("--db", required=True, help="Database name")
+    shell_program_parser.set_defaults(func=lazy_command("pm.shell", "start_shell"))
+
+
+def attach_batch_subparser(program_subparser):
+    description = "Apply account operations from a JSON lines file in one transaction."
+    batch_program_parser = program_subparser.add_parser("batch", description=description, help=description.lower())
+    batch_program_parser.add_argument("--db", required=True, help="Database name")
+    batch_program_parser.add_argument("--file", help="Path to the operations, one JSON object per line (default standard input)")
+    batch_program_parser.set_defaults(func=lazy_command("pm.batch", "apply_batch"))
+
+
+def attach_import_subparser(program_subparser):
+    description = "Import the accounts of another password manager into a store."
+    import_program_parser = program_subparser.add_parser("import", description=description, help=description.lower())
+    import_program_parser.add_argument("file", help="Path to the export, or to the archive to restore")
+    import_program_parser.add_argument("--db", required=True, help="Database name")
+    import_program_parser.add_argument("--store", help="Store name, required unless restoring")
+    import_program_parser.add_argument("--from", dest="source_format", choices=IMPORT_FORMATS, help="Format of the export, required unless restoring; csv and keepass-xml are streamed, json and bitwarden are loaded whole")
+    import_program_parser.add_argument("--restore", action="store_true", help="Restore an archive written by export")
+    import_program_parser.add_argument("--workers", type=int, default=1, help="Number of processes encrypting the accounts (default 1)")
+    import_program_parser.set_defaults(func=lazy_command("pm.importer", "import_accounts"))
+
+
+def attach_export_subparser(program_subparser):
+    description = "Export a database to an encrypted archive that import --restore reads back."
+    export_program_parser = program_subparser.add_parser("export", description=description, help=description.lower())
+    export_program_parser.add_argument("--db", required=True, help="Database name")
+    export_program_parser.add_argument("--out", required=True, help="Path to write the archive to")
+    export_program_parser.set_defaults(func=lazy_command("pm.export", "export_db"))
+
+
+def attach_backup_subparser(program_subparser):
+    description = "Back up a database as a new version, storing only the chunks that changed."
+    backup_program_parser = program_subparser.add_parser("backup", description=description, help=description.lower())
+    backup_program_parser.add_argument("--db", required=True, help="Database name")
+    backup_program_parser.add_argument("--dir", help="Backup directory (default backups/<db> next to the db directory)")
+    backup_program_parser.add_argument("--list", action="store_true", help="List the backed up versions")
+    backup_program_parser.set_defaults(func=lazy_command("pm.backup", "backup_db"))
+
+
+def attach_restore_subparser(program_subparser):
+    description = "Restore a database from a backed up version."
+    restore_program_parser = program_subparser.add_parser("restore", description=description, help=description.lower())
+    restore_program_parser.add_argument("--db", required=True, help="Database name")
+    restore_program_parser.add_argument("--version", dest="backup_version", type=int, required=True, help="Version to restore, see backup --list")
+    restore_program_parser.add_argument("--dir", help="Backup directory (default backups/<db> next to the db directory)")
+    restore_program_parser.add_argument("--to", help="Name of the database to restore to (default --db)")
+    restore_program_parser.add_argument("--force", action="store_true", help="Replace the database if it exists")
+    restore_program_parser.set_defaults(func=lazy_command("pm.backup", "restore_db"))
+
+
+def add_performance_profile_arguments(parser):
+    parser.add_argument("--journal-mode", choices=JOURNAL_MODES, help="sqlite journal mode (default wal)")
+    parser.add_argument("--synchronous", choices=SYNCHRONOUS_MODES, help="sqlite synchronous mode (default normal)")
+    parser.add_argument("--mmap-size-mb", type=int, help="size in MiB of the memory-mapped part of the db (default 64)")
+    parser.add_argument("--cache-size-mb", type=int, help="page cache size in MiB (default 16)")
+    parser.add_argument("--busy-timeout-ms", type=int, help="milliseconds to wait for a locked db (default 5000)")
+
+
+def add_page_arguments(parser):
+    parser.add_argument("--limit", type=non_negative_int, help="maximum number of rows to show")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="number of rows to skip (default 0)")
+    parser.add_argument("--since", type=parse_timestamp, help="only rows created at or after this ISO 8601 date, in UTC unless a zone is given")
+    parser.add_argument("--until", type=parse_timestamp, help="only rows created before this ISO 8601 date, in UTC unless a zone is given")
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value}")
+    return number
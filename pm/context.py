@@ -0,0 +1,245 @@
+import getpass
+import itertools
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pm.util.agent_util import get_encryption_key_from_agent
+from pm.util.crypto_util import ValueCipher, verify_password, derive_encryption_key, decrypt_many, encrypt_many, \
+    create_key_check, verify_key_check, unwrap_data_key, shutdown_cipher_pool
+from pm.util.cipher_util import CIPHER_FERNET
+from pm.util.header_util import CIPHER, DATA_KEY, KEY_CHECK, KDF, get_header_value, set_header_values
+from pm.util.path_util import get_db_path, get_db_file_name
+from pm.vault import Vault, get_vault
+
+
+# Rows of a listing decrypted together; large enough for a batch of one column to reach the
+# parallel threshold of `decrypt_many`, small enough to keep output streaming
+DECRYPT_BATCH_ROWS = 4096
+
+
+class VaultContext:
+    """
+    Holds the unlocked state of a database for the lifetime of the process.
+
+    The master password is asked for at most once and the encryption key is derived at most
+    once. A single cipher is kept for every value encrypted or decrypted afterwards, and the
+    database is accessed through a single `Vault`. Use
+    `get_vault_context` to obtain the shared instance of a database.
+
+    Attributes:
+        db_name (str): Name of the database.
+    """
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        self._encryption_key: Optional[bytes] = None
+        self._cipher: Optional[ValueCipher] = None
+
+    def unlock(self) -> bool:
+        """
+        Ensures the encryption key of the database is available.
+
+        The key is taken from the agent if it holds the db unlocked. Otherwise the user is
+        prompted for the master password, which is verified by the key derivation itself.
+
+        Returns:
+            bool: True if the database is unlocked, False if the entered password is incorrect.
+        """
+        if self._cipher is not None:
+            return True
+
+        encryption_key = get_encryption_key_from_agent(self.db_name)
+        if encryption_key is None:
+            password = getpass.getpass("Enter password:")
+            encryption_key = derive_verified_encryption_key(self.db_name, password)
+            if encryption_key is None:
+                return False
+
+        self._encryption_key = encryption_key
+        self._cipher = ValueCipher(encryption_key, self.vault.get_header_value(CIPHER) or CIPHER_FERNET)
+        return True
+
+    @property
+    def vault(self) -> Vault:
+        """The data access layer of the database, sharing one connection for the process."""
+        return get_vault(self.db_name)
+
+    @property
+    def encryption_key(self) -> bytes:
+        """The derived encryption key. The context must be unlocked."""
+        self._ensure_unlocked()
+        return self._encryption_key
+
+    def encrypt(self, data: str) -> Union[str, bytes]:
+        """
+        Encrypts the given data with the cached cipher of the database, in the format the database
+        stores new values in.
+
+        Args:
+            data (str): The plaintext data to be encrypted.
+
+        Returns:
+            Union[str, bytes]: The encrypted value to store.
+        """
+        self._ensure_unlocked()
+        return self._cipher.encrypt(data)
+
+    def encrypt_many(self, values: Sequence[str], workers: Optional[int] = None) -> List[Union[str, bytes]]:
+        """
+        Encrypts many values with `encrypt_many`, in the format the database stores new values in.
+
+        Args:
+            values (Sequence[str]): The plaintext values.
+            workers (Optional[int]): Number of worker processes, the number of cores if not given.
+
+        Returns:
+            List[Union[str, bytes]]: The encrypted values to store, in order.
+        """
+        self._ensure_unlocked()
+        return encrypt_many(values, self._encryption_key, self._cipher.cipher_name, workers)
+
+    def decrypt(self, data: Union[str, bytes]) -> str:
+        """
+        Decrypts the given data with the cached cipher of the database.
+
+        Args:
+            data (Union[str, bytes]): The encrypted value as stored, in either format.
+
+        Returns:
+            str: The decrypted plaintext data.
+        """
+        self._ensure_unlocked()
+        return self._cipher.decrypt(data)
+
+    def decrypt_rows(self, rows: Iterable[Sequence], columns: Sequence[int]) -> Iterator[Tuple]:
+        """
+        Decrypts columns of a stream of rows, `DECRYPT_BATCH_ROWS` rows at a time with
+        `decrypt_many`, so long listings are decrypted in parallel while still being streamed.
+
+        Args:
+            rows (Iterable[Sequence]): The rows as read from the vault.
+            columns (Sequence[int]): The indexes of the encrypted columns.
+
+        Returns:
+            Iterator[Tuple]: The rows with the columns decrypted, in order.
+        """
+        self._ensure_unlocked()
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, DECRYPT_BATCH_ROWS))
+            if not batch:
+                return
+            plaintexts = iter(decrypt_many([row[column] for row in batch for column in columns], self._encryption_key))
+            for row in batch:
+                row = list(row)
+                for column in columns:
+                    row[column] = next(plaintexts)
+                yield tuple(row)
+
+    def _ensure_unlocked(self):
+        if self._cipher is None and not self.unlock():
+            raise ValueError(f"Database '{self.db_name}' is not unlocked.")
+
+
+_vault_contexts: Dict[str, VaultContext] = {}
+
+
+def get_vault_context(db_name: str) -> VaultContext:
+    """
+    Returns the vault context of a database, creating it on first use in this process.
+
+    Args:
+        db_name (str): Name of the database.
+
+    Returns:
+        VaultContext: The context shared by every command run against the database in this process.
+    """
+    if db_name not in _vault_contexts:
+        _vault_contexts[db_name] = VaultContext(db_name)
+    return _vault_contexts[db_name]
+
+
+def forget_vault_context(db_name: Optional[str] = None) -> None:
+    """
+    Drops the vault context of a database, e.g. after its key changed or it was locked, and stops
+    the worker processes holding its key. The next command run against the database in this
+    process unlocks it again.
+
+    Args:
+        db_name (Optional[str]): Name of the database, or None to drop the contexts of every database.
+    """
+    for name in list(_vault_contexts) if db_name is None else [db_name]:
+        context = _vault_contexts.pop(name, None)
+        if context is not None and context._encryption_key is not None:
+            shutdown_cipher_pool(context._encryption_key)
+
+
+def derive_verified_encryption_key(db_name: str, password: str) -> Optional[bytes]:
+    """
+    Derives the master key of a database from the master password, verifies it, and returns the
+    key the values of the database are encrypted with.
+
+    Args:
+        db_name (str): Name of the database. The database file must exist.
+        password (str): The master password entered by the user.
+
+    Returns:
+        Optional[bytes]: The encryption key of the values, or None if the password is incorrect.
+    """
+    master_key = derive_verified_master_key(db_name, password)
+    if master_key is None:
+        return None
+    return get_data_key(os.path.join(get_db_path(), get_db_file_name(db_name)), master_key)
+
+
+def derive_verified_master_key(db_name: str, password: str) -> Optional[bytes]:
+    """
+    Derives the master key of a database and verifies it against the stored key-check value.
+
+    The key derivation parameters are read from the database header; databases without stored
+    parameters use the legacy ones. Databases created before key-check values were introduced
+    have none. For those the password is verified once against the bcrypt hash in the config
+    file, and the key-check value is then written so that later unlocks only run the key
+    derivation.
+
+    Args:
+        db_name (str): Name of the database. The database file must exist.
+        password (str): The master password entered by the user.
+
+    Returns:
+        Optional[bytes]: The derived master key, or None if the password is incorrect.
+    """
+    db_file_path = os.path.join(get_db_path(), get_db_file_name(db_name))
+    key_check = get_header_value(db_file_path, KEY_CHECK)
+    kdf_params = get_header_value(db_file_path, KDF)
+    kdf_params = json.loads(kdf_params) if kdf_params is not None else None
+    if key_check is None:
+        if not verify_password(password, db_name):
+            return None
+        master_key = derive_encryption_key(password, kdf_params)
+        set_header_values(db_file_path, {KEY_CHECK: create_key_check(master_key)})
+        return master_key
+
+    master_key = derive_encryption_key(password, kdf_params)
+    return master_key if verify_key_check(master_key, key_check) else None
+
+
+def get_data_key(db_file_path: str, master_key: bytes) -> bytes:
+    """
+    Unwraps the data key of a database, the key its values are encrypted with.
+
+    Databases created before data keys were introduced have none and encrypt their values with
+    the master key itself; for those the master key is returned. They get a random data key, and
+    their values are re-encrypted with it, the first time the master password or key derivation
+    changes.
+
+    Args:
+        db_file_path (str): The absolute path to the database file.
+        master_key (bytes): The verified master key.
+
+    Returns:
+        bytes: The data key.
+    """
+    wrapped_data_key = get_header_value(db_file_path, DATA_KEY)
+    return unwrap_data_key(wrapped_data_key, master_key) if wrapped_data_key is not None else master_key
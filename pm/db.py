@@ -0,0 +1,358 @@
+import getpass
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import Any, Dict
+
+from pm.context import derive_verified_master_key, forget_vault_context, get_vault_context
+from pm.setup import DatabaseException, DEFAULT_KDF_TARGET_MS, DEFAULT_KDF_MAX_MEMORY_MB
+from pm.util.agent_util import send_agent_request
+from pm.util.crypto_util import ValueCipher, derive_encryption_key, generate_kdf_params, create_key_check, \
+    generate_data_key, wrap_data_key, unwrap_data_key
+from pm.util.cipher_util import CIPHER_FERNET, DEFAULT_CIPHER
+from pm.util.header_util import CIPHER, DATA_KEY, KEY_CHECK, KDF, PERFORMANCE, get_header_value, set_header_values
+from pm.util.kdf_util import generate_salt
+from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name
+from pm.util.profile_util import build_performance_profile, apply_performance_profile
+
+
+REENCRYPT_BATCH_ROWS = 1000
+
+
+def rekdf_db(args: Any):
+    """
+    Switches a database to another key derivation function, or recalibrates the current one.
+
+    New parameters are calibrated for the chosen backend and the data key of the database is
+    rewrapped with the newly derived master key. The values themselves are encrypted with the
+    data key and are not touched, so this takes as long as the key derivation whatever the size
+    of the database. Databases created without a data key get one here, see `_rewrap_data_key`.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.kdf`: Name of the key derivation function to switch to.
+            - `args.kdf_target_ms`: Optional target unlock time in milliseconds.
+            - `args.kdf_max_memory_mb`: Optional maximum memory in MiB a single unlock may use.
+
+    Raises:
+        DatabaseException: If encountered errors, such as:
+            - The database does not exist.
+            - The entered password is incorrect.
+            - The key derivation function is not available.
+            - There is an error while updating the header.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        kdf_name = args.kdf
+        kdf_target_ms = args.kdf_target_ms if args.kdf_target_ms is not None else DEFAULT_KDF_TARGET_MS
+        kdf_max_memory_mb = args.kdf_max_memory_mb if args.kdf_max_memory_mb is not None else DEFAULT_KDF_MAX_MEMORY_MB
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise DatabaseException(f"Error: [Database] - The requested db with name {db_name} does not exist")
+        password = getpass.getpass("Enter password:")
+        master_key = derive_verified_master_key(db_name, password)
+        if master_key is None:
+            raise DatabaseException("Error: [Database] - Entered password is incorrect")
+
+        # Rewrap the data key with the new master key
+        db_file_path = os.path.join(db_path, db_file_name)
+        kdf_params = generate_kdf_params(kdf_target_ms / 1000, kdf_max_memory_mb * 1024 * 1024, kdf_name)
+        reencrypted = _rewrap_data_key(db_file_path, master_key, password, kdf_params)
+        if reencrypted:
+            _forget_encryption_key(db_name)
+
+        # Print message on standard output
+        if reencrypted:
+            print("Values were re-encrypted with a new random data key.")
+        print(f"Database now uses {kdf_name} for key derivation.")
+    except DatabaseException as e:
+        raise e
+    except Exception as e:
+        raise DatabaseException(f"Error: [Database] - Could not change key derivation: {str(e)}") from e
+
+
+def passwd_db(args: Any):
+    """
+    Changes the master password of a database.
+
+    The data key of the database is rewrapped with the master key derived from the new password,
+    using the current key derivation function and cost with a new salt. The values are encrypted
+    with the data key and are not touched, so this takes as long as two key derivations whatever
+    the size of the database, and the agent keeps the database unlocked, since the data key it
+    holds does not change. Databases created without a data key get one here, see
+    `_rewrap_data_key`.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+
+    Raises:
+        DatabaseException: If encountered errors, such as:
+            - The database does not exist.
+            - The entered password is incorrect.
+            - The new password is empty or not confirmed.
+            - There is an error while updating the header.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise DatabaseException(f"Error: [Database] - The requested db with name {db_name} does not exist")
+        password = getpass.getpass("Enter current password:")
+        master_key = derive_verified_master_key(db_name, password)
+        if master_key is None:
+            raise DatabaseException("Error: [Database] - Entered password is incorrect")
+
+        new_password = getpass.getpass("Enter new master password:")
+        if not new_password:
+            raise DatabaseException("Error: [Database] - Master password cannot be empty.")
+        if getpass.getpass("Confirm new master password:") != new_password:
+            raise DatabaseException("Error: [Database] - Passwords do not match.")
+
+        # Rewrap the data key with the master key of the new password
+        db_file_path = os.path.join(db_path, db_file_name)
+        kdf_params = get_header_value(db_file_path, KDF)
+        if kdf_params is not None:
+            kdf_params = dict(json.loads(kdf_params), salt=generate_salt())
+        else:
+            kdf_params = generate_kdf_params(DEFAULT_KDF_TARGET_MS / 1000, DEFAULT_KDF_MAX_MEMORY_MB * 1024 * 1024)
+        reencrypted = _rewrap_data_key(db_file_path, master_key, new_password, kdf_params)
+        if reencrypted:
+            _forget_encryption_key(db_name)
+
+        # Print message on standard output
+        if reencrypted:
+            print("Values were re-encrypted with a new random data key.")
+        print("Master password changed successfully!")
+    except DatabaseException as e:
+        raise e
+    except Exception as e:
+        raise DatabaseException(f"Error: [Database] - Could not change the master password: {str(e)}") from e
+
+
+def tune_db(args: Any):
+    """
+    Changes the performance profile of a database.
+
+    Only the given settings are changed; the others keep their stored values, or the defaults if
+    the database has no profile yet. The profile is stored in the header and applied right away,
+    so a change of journal mode takes effect immediately. No password is needed since the profile
+    is not secret.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.journal_mode`, `args.synchronous`, `args.mmap_size_mb`, `args.cache_size_mb`,
+              `args.busy_timeout_ms`: Optional settings of the performance profile.
+
+    Raises:
+        DatabaseException: If encountered errors, such as:
+            - The database does not exist.
+            - A setting has an invalid value.
+            - The profile could not be applied.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        db_file_path = os.path.join(db_path, db_file_name)
+        if not file_exists_in_path(db_path, db_file_name):
+            raise DatabaseException(f"Error: [Database] - The requested db with name {db_name} does not exist")
+
+        # Update the stored profile
+        stored_profile = get_header_value(db_file_path, PERFORMANCE)
+        profile = build_performance_profile(
+            json.loads(stored_profile) if stored_profile is not None else None,
+            journal_mode=args.journal_mode,
+            synchronous=args.synchronous,
+            mmap_size_mb=args.mmap_size_mb,
+            cache_size_mb=args.cache_size_mb,
+            busy_timeout_ms=args.busy_timeout_ms
+        )
+        set_header_values(db_file_path, {PERFORMANCE: json.dumps(profile)})
+
+        # Apply the profile
+        connection = sqlite3.connect(db_file_path)
+        try:
+            apply_performance_profile(connection, profile)
+        finally:
+            connection.close()
+
+        # Print message on standard output
+        print("Database performance profile updated:")
+        for name, value in profile.items():
+            print(f"  {name}: {value}")
+    except DatabaseException as e:
+        raise e
+    except Exception as e:
+        raise DatabaseException(f"Error: [Database] - Could not tune the database: {str(e)}") from e
+
+
+def migrate_cipher_db(args: Any):
+    """
+    Re-encrypts every value of a database in another format and makes it the format new values
+    are written in.
+
+    Moving from Fernet text to binary AES-GCM values shrinks the stored values by about a third
+    and makes decrypting them cheaper. The values are rewritten in a single transaction, after
+    which the database is vacuumed so that the freed space is returned.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.cipher`: Optional format to switch to, `aes-gcm` by default.
+
+    Raises:
+        DatabaseException: If encountered errors, such as:
+            - The database does not exist.
+            - The entered password is incorrect.
+            - There is an error while re-encrypting the database.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        db_file_path = os.path.join(db_path, db_file_name)
+        cipher_name = args.cipher if args.cipher is not None else DEFAULT_CIPHER
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise DatabaseException(f"Error: [Database] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise DatabaseException("Error: [Database] - Entered password is incorrect")
+
+        # Re-encrypt the database
+        old_size = os.path.getsize(db_file_path)
+        encryption_key = context.encryption_key
+        with closing(sqlite3.connect(db_file_path)) as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                _reencrypt_rows(cursor, ValueCipher(encryption_key), ValueCipher(encryption_key, cipher_name))
+                cursor.execute("INSERT OR REPLACE INTO header (key, value) VALUES (?, ?)", (CIPHER, cipher_name))
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                raise DatabaseException(f"Error: [Database] - {str(e)}")
+            finally:
+                cursor.close()
+
+            # Return the space freed by the smaller values
+            connection.execute("VACUUM")
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        # Forget the cipher of this process, which writes the old format
+        forget_vault_context(db_name)
+
+        # Print message on standard output
+        print(
+            f"Database values are now encrypted with {cipher_name}. "
+            f"Size: {old_size} bytes before, {os.path.getsize(db_file_path)} bytes after."
+        )
+    except DatabaseException as e:
+        raise e
+    except Exception as e:
+        raise DatabaseException(f"Error: [Database] - Could not migrate the cipher: {str(e)}") from e
+
+
+# Private methods
+
+
+def _rewrap_data_key(db_file_path: str, master_key: bytes, password: str, kdf_params: Dict[str, Any]) -> bool:
+    """
+    Wraps the data key with the master key derived from a password, and stores it together with
+    the key derivation parameters and key-check value of that master key in one transaction.
+
+    Databases created without a data key encrypt their values with the master key, which anyone
+    knowing the old password can derive again; legacy databases even derive their salt from the
+    password. They get a random data key instead, and their values are re-encrypted with it in
+    the same transaction.
+
+    Args:
+        db_file_path (str): The absolute path to the database file.
+        master_key (bytes): The verified master key of the current password.
+        password (str): The password to derive the new master key from.
+        kdf_params (Dict[str, Any]): The key derivation parameters of the new master key.
+
+    Returns:
+        bool: True if the values were re-encrypted with a new data key.
+    """
+    new_master_key = derive_encryption_key(password, kdf_params)
+    with closing(sqlite3.connect(db_file_path)) as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE TRANSACTION")
+            headers = dict(cursor.execute("SELECT key, value FROM header WHERE key IN (?, ?)", (DATA_KEY, CIPHER)))
+            reencrypt = DATA_KEY not in headers
+            if reencrypt:
+                data_key = generate_data_key()
+                cipher_name = headers.get(CIPHER) or CIPHER_FERNET
+                _reencrypt_rows(cursor, ValueCipher(master_key), ValueCipher(data_key, cipher_name))
+            else:
+                data_key = unwrap_data_key(headers[DATA_KEY], master_key)
+            cursor.executemany(
+                "INSERT OR REPLACE INTO header (key, value) VALUES (?, ?)",
+                [
+                    (KEY_CHECK, create_key_check(new_master_key)),
+                    (KDF, json.dumps(kdf_params)),
+                    (DATA_KEY, wrap_data_key(data_key, new_master_key))
+                ]
+            )
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            raise DatabaseException(f"Error: [Database] - {str(e)}")
+        finally:
+            cursor.close()
+    return reencrypt
+
+
+def _forget_encryption_key(db_name: str):
+    """
+    Makes the agent and this process forget the encryption key of a database whose values were
+    re-encrypted with another key.
+    """
+    send_agent_request({"command": "remove", "db": db_name})
+    forget_vault_context(db_name)
+
+
+def _reencrypt_rows(cursor: sqlite3.Cursor, old_cipher: ValueCipher, new_cipher: ValueCipher):
+    """
+    Re-encrypts every encrypted column of the database from one cipher to another, in batches of
+    `REENCRYPT_BATCH_ROWS` rows so memory use does not depend on the size of the database.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open transaction.
+        old_cipher (ValueCipher): The cipher the values are currently encrypted with.
+        new_cipher (ValueCipher): The cipher to encrypt the values with, in its format.
+    """
+    for table, columns in (("store", ("name",)), ("account", ("name", "username", "email")), ("password", ("password",))):
+        select = f"SELECT id, {', '.join(columns)} FROM {table} WHERE id>? ORDER BY id LIMIT ?"
+        update = f"UPDATE {table} SET {', '.join(f'{column}=?' for column in columns)} WHERE id=?"
+        last_id = 0
+        while True:
+            # Walk the table by id rather than with an open cursor, since it is updated as it is read
+            rows = cursor.execute(select, (last_id, REENCRYPT_BATCH_ROWS)).fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                update,
+                [
+                    (*(new_cipher.encrypt(old_cipher.decrypt(value)) for value in row[1:]), row[0])
+                    for row in rows
+                ]
+            )
+            last_id = rows[-1][0]
@@ -0,0 +1,112 @@
+import getpass
+from typing import Any, Iterator, Tuple
+
+from pm.context import get_vault_context
+from pm.setup import DEFAULT_KDF_TARGET_MS, DEFAULT_KDF_MAX_MEMORY_MB
+from pm.util.archive_util import ArchiveWriter
+from pm.util.crypto_util import derive_encryption_key, generate_kdf_params
+from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name
+
+
+class ExportException(Exception):
+    """Exception raised for errors while exporting a database."""
+    pass
+
+
+# Record types of an archive, written in this order so that restoring never refers ahead
+STORE_RECORD = "store"
+ACCOUNT_RECORD = "account"
+PASSWORD_RECORD = "password"
+
+EXPORT_FETCH_SIZE = 500
+
+
+def export_db(args: Any):
+    """
+    Exports the stores, accounts and password history of a database to an encrypted archive.
+
+    The archive is protected by its own password, so it can be restored into any database with
+    `import --restore`. Rows are read with `fetchmany` and written as a stream of encrypted
+    chunks, so memory use stays flat however large the history is. The rows are read in a single
+    transaction and form a consistent snapshot.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.out`: Path to write the archive to.
+
+    Raises:
+        ExportException: If encountered errors, such as:
+            - The database does not exist.
+            - The entered password is incorrect.
+            - The archive passwords are empty or do not match.
+            - The archive cannot be written.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        out_path = args.out
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise ExportException(f"Error: [Export] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise ExportException("Error: [Export] - Entered password is incorrect")
+
+        # Derive the archive key
+        archive_password = getpass.getpass("Enter archive password:")
+        if not archive_password:
+            raise ExportException("Error: [Export] - Archive password cannot be empty.")
+        if getpass.getpass("Confirm archive password:") != archive_password:
+            raise ExportException("Error: [Export] - Archive passwords do not match.")
+        kdf_params = generate_kdf_params(DEFAULT_KDF_TARGET_MS / 1000, DEFAULT_KDF_MAX_MEMORY_MB * 1024 * 1024)
+        archive_key = derive_encryption_key(archive_password, kdf_params)
+
+        # Write the archive
+        vault = context.vault
+        counts = {STORE_RECORD: 0, ACCOUNT_RECORD: 0, PASSWORD_RECORD: 0}
+        writer = ArchiveWriter(out_path, archive_key, kdf_params)
+        try:
+            with vault.transaction():
+                for name, date_created in context.decrypt_rows(_fetch_rows(vault.list_stores()), (0,)):
+                    writer.write([STORE_RECORD, name, date_created])
+                    counts[STORE_RECORD] += 1
+                accounts = context.decrypt_rows(_fetch_rows(vault.export_accounts()), (1, 2, 3))
+                for store_hid, name, username, email, date_created in accounts:
+                    writer.write([ACCOUNT_RECORD, store_hid, name, username, email, date_created])
+                    counts[ACCOUNT_RECORD] += 1
+                passwords = context.decrypt_rows(_fetch_rows(vault.export_passwords()), (1,))
+                for account_hid, password, date_created in passwords:
+                    writer.write([PASSWORD_RECORD, account_hid, password, date_created])
+                    counts[PASSWORD_RECORD] += 1
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+
+        # Print message on standard output
+        print(
+            f"Exported {counts[STORE_RECORD]} stores, {counts[ACCOUNT_RECORD]} accounts and "
+            f"{counts[PASSWORD_RECORD]} passwords to {out_path}."
+        )
+    except ExportException as e:
+        raise e
+    except Exception as e:
+        raise ExportException(f"Error: [Export] - Could not export the database: {str(e)}") from e
+
+
+# Private methods
+
+
+def _fetch_rows(cursor) -> Iterator[Tuple]:
+    """
+    Yields the rows of a cursor, reading `EXPORT_FETCH_SIZE` of them from sqlite at a time.
+    """
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
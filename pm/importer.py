@@ -0,0 +1,251 @@
+import getpass
+import itertools
+import os
+import sqlite3
+from typing import Any, Iterable, Iterator, List
+
+from pm.context import get_vault_context
+from pm.export import ACCOUNT_RECORD, PASSWORD_RECORD, STORE_RECORD
+from pm.util.archive_util import ArchiveException, ArchiveReader
+from pm.util.bloom_util import load_bloom_filter
+from pm.util.crypto_util import derive_encryption_key, get_deterministic_hash
+from pm.util.import_util import IMPORT_FORMATS, Entry, ImportUtilException, read_entries
+from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name, get_breach_filter_path
+
+
+class ImportException(Exception):
+    """Exception raised for errors while importing accounts."""
+    pass
+
+
+# Four values are encrypted per account, so a chunk reaches the parallel threshold of `encrypt_many`
+IMPORT_CHUNK_SIZE = 1024
+MAX_REPORTED_DUPLICATES = 20
+
+
+def import_accounts(args: Any):
+    """
+    Imports the accounts of another password manager into a store.
+
+    The input is written in chunks of `IMPORT_CHUNK_SIZE` accounts, each encrypted, optionally on
+    a pool of worker processes, and inserted with one prepared statement, all in a single
+    transaction. Supported formats:
+        - `csv`: A header row with `name` (or `title`), `username`, `email` and `password` columns.
+        - `json`: A list of objects with the same keys.
+        - `bitwarden`: An unencrypted Bitwarden JSON export; login items are imported.
+        - `keepass-xml`: A KeePass 2 XML export; history entries are left out.
+    CSV and KeePass exports are read as a stream; JSON and Bitwarden exports are loaded whole.
+
+    Account names are unique, so entries named like an existing account or an earlier entry are
+    skipped and reported at the end, as are entries without a name or password. With
+    `args.restore`, the input is an archive written by `export` instead, see `restore_archive`.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.restore`: Whether the input is an archive to restore.
+            - `args.store`: Name of the store to import into.
+            - `args.source_format`: Format of the input, one of `IMPORT_FORMATS`.
+            - `args.file`: Path to the input.
+            - `args.workers`: Number of processes encrypting the accounts.
+
+    Raises:
+        ImportException: If encountered errors, such as:
+            - The database, the store or the input file does not exist.
+            - The entered password is incorrect.
+            - The input cannot be parsed.
+    """
+    if args.restore:
+        restore_archive(args)
+        return
+
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        store = args.store
+        source_format = args.source_format
+        file_path = args.file
+        workers = args.workers if args.workers is not None else 1
+        db_file_name = get_db_file_name(db_name)
+
+        if store is None or source_format is None:
+            raise ImportException("Error: [Import] - --store and --from are required unless restoring an archive.")
+        if source_format not in IMPORT_FORMATS:
+            raise ImportException(f"Error: [Import] - Unknown format '{source_format}'.")
+        if not os.path.isfile(file_path):
+            raise ImportException(f"Error: [Import] - The file {file_path} does not exist.")
+        if workers < 1:
+            raise ImportException("Error: [Import] - The number of workers must be at least 1.")
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise ImportException(f"Error: [Import] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise ImportException("Error: [Import] - Entered password is incorrect")
+
+        vault = context.vault
+        store_id = vault.get_store_id(get_deterministic_hash(store))
+        if store_id is None:
+            raise ImportException(f"Error: [Import] - Store '{store}' does not exist")
+
+        # Import accounts
+        breach_filter = load_bloom_filter(get_breach_filter_path())
+        taken_hids = set(vault.list_account_hids())
+        duplicates: List[str] = []
+        imported = incomplete = breached = 0
+
+        with vault.transaction():
+            for chunk in _chunks(read_entries(source_format, file_path), IMPORT_CHUNK_SIZE):
+                accepted = []
+                for name, username, email, password in chunk:
+                    if not name or not password:
+                        incomplete += 1
+                        continue
+                    hid = get_deterministic_hash(name)
+                    if hid in taken_hids:
+                        duplicates.append(name)
+                        continue
+                    taken_hids.add(hid)
+                    if breach_filter is not None and password in breach_filter:
+                        breached += 1
+                    accepted.append((hid, name, username, email, password))
+
+                values = context.encrypt_many([value for entry in accepted for value in entry[1:]], workers)
+                encrypted = [(hid, *values[i * 4:i * 4 + 4]) for i, (hid, *_) in enumerate(accepted)]
+                vault.insert_accounts(
+                    (store_id, hid, name, username, email) for hid, name, username, email, _ in encrypted
+                )
+                vault.insert_passwords_by_hid((hid, password) for hid, _, _, _, password in encrypted)
+                imported += len(encrypted)
+
+        # Print message on standard output
+        print(f"Imported {imported} accounts into store '{store}'.")
+        if duplicates:
+            shown = ", ".join(duplicates[:MAX_REPORTED_DUPLICATES])
+            more = f" and {len(duplicates) - MAX_REPORTED_DUPLICATES} more" if len(duplicates) > MAX_REPORTED_DUPLICATES else ""
+            print(f"Skipped {len(duplicates)} accounts whose names are already taken: {shown}{more}")
+        if incomplete:
+            print(f"Skipped {incomplete} entries without a name or password.")
+        if breached:
+            print(f"{breached} imported passwords appear in a known password breach.")
+    except ImportException as e:
+        raise e
+    except ImportUtilException as e:
+        raise ImportException(str(e)) from e
+    except Exception as e:
+        raise ImportException(f"Error: [Import] - Could not import the accounts, no changes were made: {str(e)}") from e
+
+
+def restore_archive(args: Any):
+    """
+    Restores the stores, accounts and password history of an archive written by `export`.
+
+    The archive is read one chunk at a time and each chunk is re-encrypted with the key of the
+    database and inserted with one prepared statement per record type, all in a single
+    transaction, so memory use stays flat and a failed restore leaves the database unchanged.
+    Stores and accounts keep their creation dates, and passwords the dates they were set. Store
+    and account names must not be taken in the database, so restore into a new database. Accounts
+    and passwords that refer to a store or account missing from the archive are skipped, and
+    reported apart from the restored ones.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.file`: Path to the archive.
+
+    Raises:
+        ImportException: If encountered errors, such as:
+            - The database or the archive does not exist.
+            - The entered password or archive password is incorrect.
+            - The archive is damaged or truncated.
+            - A store or account of the archive already exists.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        file_path = args.file
+        db_file_name = get_db_file_name(db_name)
+
+        if not os.path.isfile(file_path):
+            raise ImportException(f"Error: [Import] - The file {file_path} does not exist.")
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise ImportException(f"Error: [Import] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise ImportException("Error: [Import] - Entered password is incorrect")
+
+        reader = ArchiveReader(file_path)
+        try:
+            archive_password = getpass.getpass("Enter archive password:")
+            if not reader.unlock(derive_encryption_key(archive_password, reader.kdf_params)):
+                raise ImportException("Error: [Import] - Entered archive password is incorrect")
+
+            # Restore records
+            vault = context.vault
+            counts = {STORE_RECORD: 0, ACCOUNT_RECORD: 0, PASSWORD_RECORD: 0}
+            skipped = 0
+            try:
+                with vault.transaction():
+                    for chunk in _chunks(reader.records(), IMPORT_CHUNK_SIZE):
+                        for record_type, records in itertools.groupby(chunk, key=lambda record: record[0]):
+                            records = list(records)
+                            if record_type == STORE_RECORD:
+                                restored = vault.restore_stores(
+                                    (get_deterministic_hash(name), context.encrypt(name), date_created)
+                                    for _, name, date_created in records
+                                )
+                            elif record_type == ACCOUNT_RECORD:
+                                restored = vault.restore_accounts(
+                                    (
+                                        store_hid, get_deterministic_hash(name), context.encrypt(name),
+                                        context.encrypt(username), context.encrypt(email), date_created
+                                    )
+                                    for _, store_hid, name, username, email, date_created in records
+                                )
+                            elif record_type == PASSWORD_RECORD:
+                                restored = vault.restore_passwords(
+                                    (account_hid, context.encrypt(password), date_created)
+                                    for _, account_hid, password, date_created in records
+                                )
+                            else:
+                                raise ImportException(f"Error: [Import] - Unknown record type '{record_type}' in the archive.")
+                            counts[record_type] += restored
+                            skipped += len(records) - restored
+            except sqlite3.IntegrityError:
+                raise ImportException(
+                    f"Error: [Import] - A store or account of the archive already exists in db {db_name}. "
+                    "Restore into a new database."
+                )
+        finally:
+            reader.close()
+
+        # Print message on standard output
+        print(
+            f"Restored {counts[STORE_RECORD]} stores, {counts[ACCOUNT_RECORD]} accounts and "
+            f"{counts[PASSWORD_RECORD]} passwords."
+        )
+        if skipped:
+            print(f"Skipped {skipped} accounts and passwords whose store or account is not in the archive.")
+    except ImportException as e:
+        raise e
+    except ArchiveException as e:
+        raise ImportException(str(e)) from e
+    except Exception as e:
+        raise ImportException(f"Error: [Import] - Could not restore the archive, no changes were made: {str(e)}") from e
+
+
+# Private methods
+
+
+def _chunks(entries: Iterable[Entry], size: int) -> Iterator[List[Entry]]:
+    iterator = iter(entries)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
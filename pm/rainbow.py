@@ -0,0 +1,63 @@
+from typing import Any
+
+from pm.util.bloom_util import BloomException, DEFAULT_FALSE_POSITIVE_RATE, build_bloom_filter
+from pm.util.path_util import get_rainbow_table_path, get_rainbow_index_path, get_breach_filter_path, file_exists
+from pm.util.rainbow_util import RainbowException, compile_rainbow_table
+
+
+def compile_rainbow(args: Any):
+    """
+    Compiles the rainbow table into the memory-mapped index used by the password similarity check.
+
+    Args:
+        args (Any): Command-line arguments. No arguments are used.
+
+    Raises:
+        RainbowException: If the rainbow table could not be read or the index could not be written.
+    """
+    try:
+        # Compile rainbow table
+        entry_count = compile_rainbow_table(get_rainbow_table_path(), get_rainbow_index_path())
+
+        # Print message on standard output
+        print(f"Rainbow table compiled successfully with {entry_count} entries!")
+    except RainbowException as e:
+        raise e
+    except Exception as e:
+        raise RainbowException("Error: [Rainbow] - Could not compile the rainbow table.") from e
+
+
+def import_rainbow(args: Any):
+    """
+    Imports a breach corpus into the Bloom filter that new passwords are checked against.
+
+    The corpus is streamed from disk and replaces any previously imported one. Memory use does not
+    depend on the size of the corpus.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.file`: Path to the corpus, one password per line.
+            - `args.false_positive_rate`: Optional probability of flagging a password that is not in the corpus.
+
+    Raises:
+        RainbowException: If the corpus does not exist or the filter could not be built.
+    """
+    try:
+        # Read input params
+        file_path = args.file
+        false_positive_rate = args.false_positive_rate if args.false_positive_rate is not None \
+            else DEFAULT_FALSE_POSITIVE_RATE
+
+        # Build breach filter
+        if not file_exists(file_path):
+            raise RainbowException(f"Error: [Rainbow] - The file {file_path} does not exist")
+        entry_count = build_bloom_filter(file_path, get_breach_filter_path(), false_positive_rate)
+
+        # Print message on standard output
+        print(f"Breach corpus imported successfully with {entry_count} entries!")
+    except RainbowException as e:
+        raise e
+    except BloomException as e:
+        raise RainbowException(f"Error: [Rainbow] - Could not import the breach corpus: {str(e.__cause__)}") from e
+    except Exception as e:
+        raise RainbowException("Error: [Rainbow] - Could not import the breach corpus.") from e
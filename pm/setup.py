@@ -1,19 +1,26 @@
 import getpass
-import sqlite3
+import json
 import os
 from typing import Any
 
-from pm.util.config_util import update_config
+from pm.util.kdf_util import DEFAULT_KDF
+from pm.util.cipher_util import DEFAULT_CIPHER
+from pm.util.header_util import CIPHER, DATA_KEY, KEY_CHECK, KDF, PERFORMANCE, set_header_values
 from pm.util.path_util import (
     ensure_path,
     file_exists_in_path,
     get_db_path,
     get_db_file_name,
-    create_file_if_not_exists,
-    get_config_file_path,
     remove_file_in_path
 )
-from pm.util.crypto_util import generate_password_hash
+from pm.util.crypto_util import derive_encryption_key, create_key_check, generate_kdf_params, generate_data_key, \
+    wrap_data_key
+from pm.util.profile_util import build_performance_profile
+from pm.util.schema_util import migrate_db
+
+
+DEFAULT_KDF_TARGET_MS = 500
+DEFAULT_KDF_MAX_MEMORY_MB = 256
 
 
 class SetupException(Exception):
@@ -29,27 +36,49 @@ class DatabaseException(Exception):
 def setup_safe(args: Any) -> None:
     """
     Sets up a secure database by validating inputs, creating a new SQLite database,
-    and storing the necessary configuration.
+    and storing the key-check value used to verify the master password.
+
+    The cost of the key derivation is calibrated on this machine against a target unlock time and
+    memory budget, and stored in the database header together with a random salt. Values are
+    encrypted with a random data key, stored wrapped with the key derived from the master password.
+    The performance profile applied whenever the database is opened, and the format values are
+    encrypted in, are stored in the header as well.
 
     Args:
-        args (Any): Command-line arguments containing the database name (`args.db`).
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.kdf_target_ms`: Optional target unlock time in milliseconds.
+            - `args.kdf_max_memory_mb`: Optional maximum memory in MiB a single unlock may use.
+            - `args.kdf`: Optional name of the key derivation function, `scrypt` by default.
+            - `args.cipher`: Optional format values are encrypted in, `aes-gcm` by default.
+            - `args.journal_mode`, `args.synchronous`, `args.mmap_size_mb`, `args.cache_size_mb`,
+              `args.busy_timeout_ms`: Optional settings of the performance profile.
 
     Raises:
         SetupException: If any step in the setup process fails, such as:
+            - The master password is empty.
             - The database already exists.
-            - Failed to create the database or its configuration file.
-            - Error in securely generating the password hash.
+            - Failed to create the database or its key-check value.
     """
     try:
         password = getpass.getpass("Enter master password for this db:")
-        password_hash, salt  = generate_password_hash(password)
-
-        if not salt or not password_hash:
-            raise SetupException("Error: [Setup] - Cannot create database. Could not securely create password hash or salt.")
+        if not password:
+            raise SetupException("Error: [Setup] - Cannot create database. Master password cannot be empty.")
 
         db_path = get_db_path()
         db_name = args.db
         db_file_name = get_db_file_name(db_name)
+        kdf_target_ms = args.kdf_target_ms if args.kdf_target_ms is not None else DEFAULT_KDF_TARGET_MS
+        kdf_max_memory_mb = args.kdf_max_memory_mb if args.kdf_max_memory_mb is not None else DEFAULT_KDF_MAX_MEMORY_MB
+        kdf_name = args.kdf if args.kdf is not None else DEFAULT_KDF
+        cipher_name = args.cipher if args.cipher is not None else DEFAULT_CIPHER
+        performance_profile = build_performance_profile(
+            journal_mode=args.journal_mode,
+            synchronous=args.synchronous,
+            mmap_size_mb=args.mmap_size_mb,
+            cache_size_mb=args.cache_size_mb,
+            busy_timeout_ms=args.busy_timeout_ms
+        )
         if file_exists_in_path(db_path, db_file_name):
             raise SetupException(f"Error: [Setup] - Cannot create database. A database with the name '{db_name}' already exists.")
 
@@ -59,12 +88,21 @@ def setup_safe(args: Any) -> None:
             raise SetupException("Error: [Setup] - Failed to create database.")
 
         try:
-            config_file = get_config_file_path()
-            create_file_if_not_exists(config_file)
-            update_config(config_file, db_name, password_hash, salt)
-        except IOError as e:
+            kdf_params = generate_kdf_params(kdf_target_ms / 1000, kdf_max_memory_mb * 1024 * 1024, kdf_name)
+            master_key = derive_encryption_key(password, kdf_params)
+            set_header_values(
+                os.path.join(db_path, db_file_name),
+                {
+                    KEY_CHECK: create_key_check(master_key),
+                    KDF: json.dumps(kdf_params),
+                    DATA_KEY: wrap_data_key(generate_data_key(), master_key),
+                    PERFORMANCE: json.dumps(performance_profile),
+                    CIPHER: cipher_name
+                }
+            )
+        except Exception as e:
             remove_file_in_path(db_path, db_file_name)
-            raise SetupException(f"Error: [Setup] - Failed to create database. Error creating config: {str(e)}")
+            raise SetupException(f"Error: [Setup] - Failed to create database. Error creating key check: {str(e)}")
 
         print("Database created successfully!")
     except SetupException as e:
@@ -75,7 +113,8 @@ def setup_safe(args: Any) -> None:
 
 def _create_db(path: str, db_file_name: str) -> None:
     """
-    Creates a new SQLite database with the necessary tables for storing credentials.
+    Creates a new SQLite database with the necessary tables for storing credentials by applying
+    every schema migration.
 
     Args:
         path (str): The directory where the database should be created.
@@ -89,47 +128,6 @@ def _create_db(path: str, db_file_name: str) -> None:
     try:
         ensure_path(path)
 
-        db_file_path = os.path.join(path, db_file_name)
-        create_db_sqls = [
-            '''
-                CREATE TABLE IF NOT EXISTS store (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    hid TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(name),
-                    UNIQUE(hid)
-                )
-            ''',
-            '''
-                CREATE TABLE IF NOT EXISTS account (
-                    id INTEGER PRIMARY KEY,
-                    hid TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    username TEXT DEFAULT NULL,
-                    email TEXT DEFAULT NULL,
-                    store_id INTEGER,
-                    date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (store_id) REFERENCES store(id),
-                    UNIQUE(name, store_id),
-                    UNIQUE(hid)
-                )
-            ''',
-            '''
-                CREATE TABLE IF NOT EXISTS password (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_id INTEGER,
-                    password TEXT NOT NULL,
-                    date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (account_id) REFERENCES account(id)
-                )
-            '''
-        ]
-
-        with sqlite3.connect(db_file_path) as connection:
-            cursor = connection.cursor()
-            for sql in create_db_sqls:
-                cursor.execute(sql)
-            connection.commit()
+        migrate_db(os.path.join(path, db_file_name))
     except Exception as e:
         raise DatabaseException(f"Error: [Database] - Could not create the database: {str(e)}.") from e
\ No newline at end of file
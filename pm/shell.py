@@ -0,0 +1,140 @@
+import argparse
+import shlex
+import traceback
+from typing import Any, List
+
+from pm.context import forget_vault_context, get_vault_context
+from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name
+
+
+class ShellException(Exception):
+    """Exception raised for errors in the interactive shell."""
+    pass
+
+
+def start_shell(args: Any):
+    """
+    Starts an interactive shell on a database.
+
+    The database is unlocked once, and every command entered afterwards reuses the derived key and
+    the open connection of this process. Commands are the regular safe-pm commands without the
+    program name, e.g. `account view --store web --account mail`; `--db` defaults to the database
+    of the shell for commands that require one. Enter `exit` or `quit`, or press Ctrl-D, to leave.
+
+    Args:
+        args (Any): Command-line arguments containing:
+            - `args.db`: Name of the database.
+            - `args.stacktrace`: Whether to print the stack trace of failed commands.
+
+    Raises:
+        ShellException: If encountered errors, such as:
+            - The database does not exist.
+            - The entered password is incorrect.
+    """
+    try:
+        # Read input params
+        db_path = get_db_path()
+        db_name = args.db
+        db_file_name = get_db_file_name(db_name)
+        print_stacktrace = args.stacktrace
+
+        # Verify account credentials
+        if not file_exists_in_path(db_path, db_file_name):
+            raise ShellException(f"Error: [Shell] - The requested db with name {db_name} does not exist")
+        if not get_vault_context(db_name).unlock():
+            raise ShellException("Error: [Shell] - Entered password is incorrect")
+
+        # Enable line editing and history when available
+        try:
+            import readline  # noqa: F401
+        except ImportError:
+            pass
+
+        # Run commands until the user leaves
+        from pm.cli import create_parser
+        parser = create_parser()
+        print(f"Unlocked {db_name}. Type a command, 'help' for the list of commands or 'exit' to leave.")
+        try:
+            while True:
+                try:
+                    line = input(f"safe-pm:{db_name}> ")
+                except EOFError:
+                    print()
+                    break
+                except KeyboardInterrupt:
+                    print()
+                    continue
+
+                try:
+                    tokens = shlex.split(line)
+                except ValueError as e:
+                    print(f"Encountered error: {e}")
+                    continue
+                if not tokens:
+                    continue
+                if tokens[0] in ("exit", "quit"):
+                    break
+                if tokens[0] == "help":
+                    parser.print_help()
+                    continue
+                if tokens[0] == "shell":
+                    print("Encountered error: Error: [Shell] - Already in a shell.")
+                    continue
+
+                _run_command(parser, tokens, db_name, print_stacktrace)
+        finally:
+            # Forget the key, and stop the worker processes holding it, before leaving
+            forget_vault_context()
+    except ShellException as e:
+        raise e
+    except Exception as e:
+        raise ShellException("Error: [Shell] - Could not run the shell.") from e
+
+
+# Private methods
+
+
+def _run_command(parser, tokens: List[str], db_name: str, print_stacktrace: bool):
+    """
+    Parses and runs a single shell command, reporting errors without leaving the shell.
+
+    The database of the shell is passed as `--db` to commands that require one and were entered
+    without it. Commands where `--db` is optional are left as entered, since leaving it out
+    means every database, e.g. `agent lock`.
+    """
+    try:
+        if "--db" not in tokens and _requires_db(parser, tokens):
+            tokens = tokens + ["--db", db_name]
+        args = parser.parse_args(tokens)
+    except SystemExit:
+        # argparse has already printed the usage or the help
+        return
+
+    if not hasattr(args, "func"):
+        parser.print_help()
+        return
+
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        print()
+    except Exception as e:
+        if print_stacktrace:
+            traceback.print_exc()
+        else:
+            print(f"Encountered error: {e}")
+
+
+def _requires_db(parser: argparse.ArgumentParser, tokens: List[str]) -> bool:
+    """
+    Follows the subcommands named in the tokens and tells whether the command reached has a
+    required `--db` argument.
+    """
+    for token in tokens:
+        subparsers = next(
+            (action for action in parser._actions if isinstance(action, argparse._SubParsersAction)), None
+        )
+        if subparsers is None or token not in subparsers.choices:
+            break
+        parser = subparsers.choices[token]
+    return any("--db" in action.option_strings and action.required for action in parser._actions)
@@ -1,13 +1,11 @@
-import getpass
-import os
-import sqlite3
 from typing import Any
 
+from pm.context import get_vault_context
 from pm.setup import DatabaseException
-from pm.util.console_util import display_table_in_less_with_ansi
-from pm.util.crypto_util import verify_password, get_deterministic_hash, \
-    derive_encryption_key, encrypt, decrypt
+from pm.util.console_util import display_rows
+from pm.util.crypto_util import get_deterministic_hash
 from pm.util.path_util import file_exists_in_path, get_db_path, get_db_file_name
+from pm.vault import Page
 
 
 class StoreException(Exception):
@@ -35,33 +33,26 @@ def create_store_password(args: Any):
         db_name = args.db
         db_file_name = get_db_file_name(db_name)
         store = args.store
-        password = getpass.getpass("Enter password:")
 
         # Verify account credentials
-        if not verify_password(password, db_name):
-            raise StoreException("Error: [Store] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise StoreException(f"Error: [Store] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise StoreException("Error: [Store] - Entered password is incorrect")
 
         # Create store
-        with sqlite3.connect(os.path.join(get_db_path(), db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Save store in db
-                hid = get_deterministic_hash(store)
-                encrypted_name = encrypt(store, derive_encryption_key(password))
-                connection = sqlite3.connect(os.path.join(db_path, db_file_name))
-                cursor = connection.cursor()
-                cursor.execute(f"INSERT INTO store (hid, name) VALUES ('{hid}', '{encrypted_name}')")
-                connection.commit()
-
-                # Print message on standard output
-                print("Store created successfully!")
-            except Exception as e:
-                raise DatabaseException(f"Error: [Store] - {str(e)}")
-            finally:
-                if cursor:
-                    cursor.close()
+        try:
+            # Save store in db
+            hid = get_deterministic_hash(store)
+            encrypted_name = context.encrypt(store)
+            with context.vault.transaction():
+                context.vault.insert_store(hid, encrypted_name)
+
+            # Print message on standard output
+            print("Store created successfully!")
+        except Exception as e:
+            raise DatabaseException(f"Error: [Store] - {str(e)}")
     except StoreException as e:
         raise e
     except Exception as e:
@@ -91,34 +82,27 @@ def rename_store(args: Any):
         db_file_name = get_db_file_name(db_name)
         store = args.store
         new_name = args.new_name
-        password = getpass.getpass("Enter password:")
 
         # Verify account credentials
-        if not verify_password(password, db_name):
-            raise StoreException("Error: [Store] - Entered password is incorrect.")
         if not file_exists_in_path(db_path, db_file_name):
             raise StoreException(f"Error: [Store] - The requested db with name {db_name} does not exist.")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise StoreException("Error: [Store] - Entered password is incorrect.")
 
         # Rename store
-        with sqlite3.connect(os.path.join(get_db_path(), db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Rename store in db
-                hid = get_deterministic_hash(store)
-                new_hid = get_deterministic_hash(new_name)
-                encrypted_newname = encrypt(new_name, derive_encryption_key(password))
-                connection = sqlite3.connect(os.path.join(db_path, db_file_name))
-                cursor = connection.cursor()
-                cursor.execute(f"UPDATE store SET hid='{new_hid}', name='{encrypted_newname}' WHERE hid='{hid}'")
-                connection.commit()
-
-                # Print message on standard output
-                print("Store renamed successfully!")
-            except Exception as e:
-                raise DatabaseException(f"Error: [Store] - {str(e)}")
-            finally:
-                if cursor:
-                    cursor.close()
+        try:
+            # Rename store in db
+            hid = get_deterministic_hash(store)
+            new_hid = get_deterministic_hash(new_name)
+            encrypted_newname = context.encrypt(new_name)
+            with context.vault.transaction():
+                context.vault.rename_store(hid, new_hid, encrypted_newname)
+
+            # Print message on standard output
+            print("Store renamed successfully!")
+        except Exception as e:
+            raise DatabaseException(f"Error: [Store] - {str(e)}")
     except StoreException as e:
         raise e
     except Exception as e:
@@ -146,32 +130,25 @@ def delete_store(args: Any):
         db_name = args.db
         db_file_name = get_db_file_name(db_name)
         store = args.store
-        password = getpass.getpass("Enter password:")
 
         # Verify account credentials
-        if not verify_password(password, db_name):
-            raise StoreException("Error: [Store] - Entered password is incorrect.")
         if not file_exists_in_path(db_path, db_file_name):
             raise StoreException(f"Error: [Store] - The requested db with name {db_name} does not exist.")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise StoreException("Error: [Store] - Entered password is incorrect.")
 
         # Delete store
-        with sqlite3.connect(os.path.join(get_db_path(), db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Delete store in db
-                hid = get_deterministic_hash(store)
-                connection = sqlite3.connect(os.path.join(db_path, db_file_name))
-                cursor = connection.cursor()
-                cursor.execute(f"DELETE from store where hid='{hid}'")
-                connection.commit()
-
-                # Print message on standard output
-                print("Store deleted successfully!")
-            except Exception as e:
-                raise DatabaseException(f"Error: [Store] - {str(e)}")
-            finally:
-                if cursor:
-                    cursor.close()
+        try:
+            # Delete store in db
+            hid = get_deterministic_hash(store)
+            with context.vault.transaction():
+                context.vault.delete_store(hid)
+
+            # Print message on standard output
+            print("Store deleted successfully!")
+        except Exception as e:
+            raise DatabaseException(f"Error: [Store] - {str(e)}")
     except StoreException as e:
         raise e
     except Exception as e:
@@ -185,6 +162,9 @@ def list_stores(args: Any):
     Args:
         args (Any): Command-line arguments containing:
             - `args.db`: Name of the database.
+            - `args.format`: Output format, one of `table`, `json`, `jsonl` or `tsv`.
+            - `args.limit`, `args.offset`: Optional page of the rows to show.
+            - `args.since`, `args.until`: Optional range of creation dates of the rows to show.
 
     Raises:
         StoreException: If encountered errors, such as:
@@ -197,32 +177,26 @@ def list_stores(args: Any):
         db_path = get_db_path()
         db_name = args.db
         db_file_name = get_db_file_name(db_name)
-        password = getpass.getpass("Enter password:")
+        output_format = args.format
+        page = Page(args.limit, args.offset, args.since, args.until)
 
         # Verify account credentials
-        if not verify_password(password, db_name):
-            raise StoreException("Error: [Store] - Entered password is incorrect")
         if not file_exists_in_path(db_path, db_file_name):
             raise StoreException(f"Error: [Store] - The requested db with name {db_name} does not exist")
+        context = get_vault_context(db_name)
+        if not context.unlock():
+            raise StoreException("Error: [Store] - Entered password is incorrect")
 
         # Listing stores
-        with sqlite3.connect(os.path.join(get_db_path(), db_file_name)) as connection:
-            cursor = connection.cursor()
-            try:
-                # Get store info from db
-                cursor.execute("SELECT name, date_created FROM store")
-                records = cursor.fetchall()
-
-                # Format and display store info
-                output = []
-                for r in records:
-                    output.append((decrypt(r[0], derive_encryption_key(password)), r[1]))
-                display_table_in_less_with_ansi(header=("Store", "Created At"), rows=output)
-            except Exception as e:
-                raise DatabaseException(f"Error: [Database] - {str(e)}")
-            finally:
-                if cursor is not None:
-                    cursor.close()
+        try:
+            # Get store info from db
+            records = context.vault.list_stores(page)
+
+            # Format and display store info, decrypting it in batches as it is displayed
+            output = context.decrypt_rows(records, (0,))
+            display_rows(header=("Store", "Created At"), rows=output, output_format=output_format)
+        except Exception as e:
+            raise DatabaseException(f"Error: [Database] - {str(e)}")
     except StoreException as e:
         raise e
     except Exception as e:
@@ -0,0 +1,51 @@
+import json
+import socket
+from typing import Any, Dict, Optional
+
+from pm.util.path_util import file_exists, get_agent_socket_path
+
+
+def send_agent_request(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Sends a request to the unlock agent and reads its response.
+
+    Args:
+        request (Dict[str, Any]): The request to send.
+
+    Returns:
+        Optional[Dict[str, Any]]: The decoded response, or None if the agent is not running.
+    """
+    socket_path = get_agent_socket_path()
+    if not file_exists(socket_path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(5)
+            connection.connect(socket_path)
+            connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with connection.makefile("rb") as stream:
+                line = stream.readline()
+        return json.loads(line) if line else None
+    except (ConnectionError, FileNotFoundError, socket.timeout):
+        return None
+
+
+def get_encryption_key_from_agent(db_name: str) -> Optional[bytes]:
+    """
+    Asks the running agent for the derived encryption key of a db.
+
+    Args:
+        db_name (str): Name of the database.
+
+    Returns:
+        Optional[bytes]: The derived encryption key, or None if the agent is not running or
+        does not hold the db unlocked.
+    """
+    try:
+        response = send_agent_request({"command": "get", "db": db_name})
+        if response is None or response.get("status") != "ok":
+            return None
+        return response["key"].encode("utf-8")
+    except Exception:
+        return None
@@ -0,0 +1,173 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from pm.util.crypto_util import create_cipher, create_key_check, verify_key_check
+
+
+class ArchiveException(Exception):
+    """Exception raised for errors while writing or reading an archive."""
+    pass
+
+
+# Layout of an archive, a text file with one item per line:
+#   magic:  SPMARC01
+#   header: JSON with the key derivation parameters of the archive key and a key-check value
+#   chunks: Fernet tokens, each encrypting the JSON {"seq": n, "last": bool, "records": [...]}
+# Every token is authenticated on its own; the sequence numbers and the flag on the last chunk
+# make a reordered, spliced or truncated archive fail as a whole. Records are JSON lists whose
+# first item is the record type.
+_MAGIC = "SPMARC01"
+ARCHIVE_CHUNK_BYTES = 64 * 1024
+
+
+class ArchiveWriter:
+    """
+    Writes records to an archive as a stream of encrypted chunks.
+
+    Records are buffered until about `ARCHIVE_CHUNK_BYTES` of them are pending, so memory use does
+    not depend on the size of the archive. The archive is written to a temporary file that `close`
+    moves into place; `abort` discards it.
+
+    Attributes:
+        archive_path (str): The path the archive is written to.
+    """
+
+    def __init__(self, archive_path: str, key: bytes, kdf_params: Dict[str, Any]):
+        """
+        Args:
+            archive_path (str): The path to write the archive to.
+            key (bytes): The archive key, derived from the archive password with `kdf_params`.
+            kdf_params (Dict[str, Any]): The key derivation parameters, stored in the header.
+        """
+        self.archive_path = archive_path
+        self._temp_path = archive_path + ".tmp"
+        self._cipher = create_cipher(key)
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._sequence = 0
+        self._file = open(self._temp_path, "w", encoding="utf-8")
+        self._file.write(_MAGIC + "\n")
+        self._file.write(json.dumps({"kdf": kdf_params, "key_check": create_key_check(key)}) + "\n")
+
+    def write(self, record: List[Any]) -> None:
+        """
+        Adds a record to the archive.
+
+        Args:
+            record (List[Any]): The record type followed by its JSON-serializable fields.
+        """
+        serialized = json.dumps(record, separators=(",", ":"))
+        self._pending.append(serialized)
+        self._pending_bytes += len(serialized)
+        if self._pending_bytes >= ARCHIVE_CHUNK_BYTES:
+            self._write_chunk(last=False)
+
+    def close(self) -> None:
+        """
+        Writes the last chunk and moves the archive into place.
+        """
+        self._write_chunk(last=True)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._temp_path, self.archive_path)
+
+    def abort(self) -> None:
+        """
+        Discards the partially written archive.
+        """
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    # Private methods
+
+    def _write_chunk(self, last: bool):
+        plaintext = (
+            f'{{"seq":{self._sequence},"last":{"true" if last else "false"},'
+            f'"records":[{",".join(self._pending)}]}}'
+        )
+        self._file.write(self._cipher.encrypt(plaintext.encode("utf-8")).decode("ascii") + "\n")
+        self._sequence += 1
+        self._pending = []
+        self._pending_bytes = 0
+
+
+class ArchiveReader:
+    """
+    Reads the records of an archive one chunk at a time.
+
+    Attributes:
+        kdf_params (Dict[str, Any]): The key derivation parameters of the archive key.
+    """
+
+    def __init__(self, archive_path: str):
+        """
+        Args:
+            archive_path (str): The path to the archive.
+
+        Raises:
+            ArchiveException: If the file is not an archive.
+        """
+        self._file = open(archive_path, "r", encoding="utf-8")
+        self._cipher = None
+        try:
+            if self._file.readline().rstrip("\n") != _MAGIC:
+                raise ArchiveException("Error: [Archive] - The file is not a safe-pm archive.")
+            header = json.loads(self._file.readline())
+            self.kdf_params: Dict[str, Any] = header["kdf"]
+            self._key_check: str = header["key_check"]
+        except ArchiveException:
+            self._file.close()
+            raise
+        except Exception as e:
+            self._file.close()
+            raise ArchiveException("Error: [Archive] - The header of the archive is damaged.") from e
+
+    def unlock(self, key: bytes) -> bool:
+        """
+        Verifies the archive key derived from the entered password.
+
+        Args:
+            key (bytes): The key derived with `kdf_params`.
+
+        Returns:
+            bool: True if the key is the one the archive was written with.
+        """
+        if not verify_key_check(key, self._key_check):
+            return False
+        self._cipher = create_cipher(key)
+        return True
+
+    def records(self) -> Iterator[List[Any]]:
+        """
+        Yields the records of the archive in the order they were written. The archive must be
+        unlocked.
+
+        Raises:
+            ArchiveException: If a chunk fails authentication, or the archive is truncated or its
+                chunks are out of order.
+        """
+        if self._cipher is None:
+            raise ArchiveException("Error: [Archive] - The archive is locked.")
+
+        expected_sequence = 0
+        last: Optional[bool] = None
+        for line in self._file:
+            if last:
+                raise ArchiveException("Error: [Archive] - The archive has data after its last chunk.")
+            try:
+                chunk = json.loads(self._cipher.decrypt(line.rstrip("\n").encode("ascii")))
+            except Exception as e:
+                raise ArchiveException(f"Error: [Archive] - Chunk {expected_sequence} is damaged.") from e
+            if chunk["seq"] != expected_sequence:
+                raise ArchiveException("Error: [Archive] - The chunks of the archive are out of order.")
+            last = chunk["last"]
+            yield from chunk["records"]
+            expected_sequence += 1
+        if not last:
+            raise ArchiveException("Error: [Archive] - The archive is truncated.")
+
+    def close(self) -> None:
+        self._file.close()
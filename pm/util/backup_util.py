@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class BackupUtilException(Exception):
+    """Exception raised for errors while reading or writing the backup chunk store."""
+    pass
+
+
+# Layout of a backup directory:
+#   chunks/<first 2 hex digits>/<sha256 hex>: a zlib-compressed chunk of a database snapshot
+#   manifests/<version>.json:                 the size of a snapshot and the hashes of its chunks
+# Chunks are addressed by the hash of their content, so a chunk shared by several versions is
+# stored once. Snapshots are cut at fixed offsets that are a multiple of the page size, so a
+# changed page only changes the chunk it falls in.
+BACKUP_CHUNK_BYTES = 64 * 1024
+_MANIFEST_SUFFIX = ".json"
+
+
+class ChunkStore:
+    """
+    Content-addressed store of the chunks and manifests of the backups of a database.
+
+    Attributes:
+        root (str): The backup directory.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._chunk_dir = os.path.join(root, "chunks")
+        self._manifest_dir = os.path.join(root, "manifests")
+
+    def put_file(self, file_path: str, chunk_bytes: int = BACKUP_CHUNK_BYTES) -> Dict[str, Any]:
+        """
+        Splits a file into chunks and stores those that are not in the store yet. The file is
+        read one chunk at a time.
+
+        Args:
+            file_path (str): The path to the file.
+            chunk_bytes (int): The size of the chunks.
+
+        Returns:
+            Dict[str, Any]: The `size` of the file, the hashes of its `chunks` in order, and the
+            number of bytes of chunks that were new, `new_bytes`.
+        """
+        os.makedirs(self._chunk_dir, exist_ok=True)
+        chunks: List[str] = []
+        size = new_bytes = 0
+        with open(file_path, "rb") as file:
+            while True:
+                data = file.read(chunk_bytes)
+                if not data:
+                    break
+                digest = hashlib.sha256(data).hexdigest()
+                chunk_path = self._chunk_path(digest)
+                if not os.path.exists(chunk_path):
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                    _write_atomically(chunk_path, zlib.compress(data, 1))
+                    new_bytes += len(data)
+                chunks.append(digest)
+                size += len(data)
+        return {"size": size, "chunks": chunks, "new_bytes": new_bytes}
+
+    def get_file(self, manifest: Dict[str, Any], file_path: str) -> None:
+        """
+        Rebuilds a file from the chunks listed in a manifest, verifying each chunk.
+
+        Args:
+            manifest (Dict[str, Any]): The manifest of the version to rebuild.
+            file_path (str): The path to write the file to.
+
+        Raises:
+            BackupUtilException: If a chunk is missing or damaged.
+        """
+        with open(file_path, "wb") as file:
+            for digest in manifest["chunks"]:
+                try:
+                    with open(self._chunk_path(digest), "rb") as chunk_file:
+                        data = zlib.decompress(chunk_file.read())
+                except FileNotFoundError:
+                    raise BackupUtilException(f"Error: [Backup] - Chunk {digest} is missing from the backup.")
+                except zlib.error:
+                    raise BackupUtilException(f"Error: [Backup] - Chunk {digest} is damaged.")
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise BackupUtilException(f"Error: [Backup] - Chunk {digest} is damaged.")
+                file.write(data)
+            if file.tell() != manifest["size"]:
+                raise BackupUtilException("Error: [Backup] - The rebuilt file does not match the size in the manifest.")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def list_versions(self) -> List[int]:
+        """
+        Returns:
+            List[int]: The versions that have a manifest, in ascending order.
+        """
+        if not os.path.isdir(self._manifest_dir):
+            return []
+        return sorted(
+            int(name[:-len(_MANIFEST_SUFFIX)]) for name in os.listdir(self._manifest_dir)
+            if name.endswith(_MANIFEST_SUFFIX) and name[:-len(_MANIFEST_SUFFIX)].isdigit()
+        )
+
+    def read_manifest(self, version: int) -> Optional[Dict[str, Any]]:
+        """
+        Args:
+            version (int): The version to read.
+
+        Returns:
+            Optional[Dict[str, Any]]: The manifest, or None if the version does not exist.
+        """
+        try:
+            with open(self._manifest_path(version), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> int:
+        """
+        Stores the manifest of a new version, numbered one above the latest version.
+
+        Args:
+            manifest (Dict[str, Any]): The manifest; its `version` is set here.
+
+        Returns:
+            int: The version of the manifest.
+        """
+        os.makedirs(self._manifest_dir, exist_ok=True)
+        versions = self.list_versions()
+        version = versions[-1] + 1 if versions else 1
+        manifest["version"] = version
+        _write_atomically(self._manifest_path(version), json.dumps(manifest).encode("utf-8"))
+        return version
+
+    def iter_manifests(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the manifests of every version in ascending order.
+        """
+        for version in self.list_versions():
+            manifest = self.read_manifest(version)
+            if manifest is not None:
+                yield manifest
+
+    # Private methods
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self._chunk_dir, digest[:2], digest)
+
+    def _manifest_path(self, version: int) -> str:
+        return os.path.join(self._manifest_dir, f"{version:06d}{_MANIFEST_SUFFIX}")
+
+
+# Private methods
+
+
+def _write_atomically(file_path: str, data: bytes):
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, file_path)
@@ -0,0 +1,151 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+from typing import Iterator, Optional
+
+
+class BloomException(Exception):
+    """Exception raised for errors while building or reading a Bloom filter."""
+    pass
+
+
+# Layout of a Bloom filter file (all integers little-endian):
+#   header: magic (8 bytes), bit count (uint64), hash count (uint32), entry count (uint64)
+#   data:   bit count bits, rounded up to whole bytes; bit i is bit (i % 8) of byte (i // 8)
+_MAGIC = b"SPMBLM01"
+_HEADER = struct.Struct("<8sQIQ")
+DEFAULT_FALSE_POSITIVE_RATE = 0.001
+
+
+def build_bloom_filter(source_path: str, filter_path: str,
+                       false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE) -> int:
+    """
+    Builds an on-disk Bloom filter of the lines of a file.
+
+    The source is streamed twice: once to count the entries, which sizes the filter for the
+    requested false positive rate, and once to set the bits. The bit array is written through a
+    memory map of the output file, so memory use does not depend on the size of the source. The
+    filter is written to a temporary file first and then moved into place.
+
+    Args:
+        source_path (str): The path to the source file, one entry per line. Entries are matched
+            exactly, byte for byte, without the line ending.
+        filter_path (str): The path to write the filter to.
+        false_positive_rate (float): The probability of reporting an absent entry as present.
+
+    Returns:
+        int: The number of entries added to the filter.
+
+    Raises:
+        BloomException: If the source could not be read or the filter could not be written.
+    """
+    try:
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("The false positive rate must be between 0 and 1.")
+
+        # Size the filter for the number of entries
+        entry_count = sum(1 for _ in _read_entries(source_path))
+        bit_count, hash_count = _optimal_size(entry_count, false_positive_rate)
+
+        # Set the bits of every entry through a memory map of the output file
+        temp_path = filter_path + ".tmp"
+        with open(temp_path, "w+b") as file:
+            file.write(_HEADER.pack(_MAGIC, bit_count, hash_count, entry_count))
+            file.truncate(_HEADER.size + (bit_count + 7) // 8)
+            with mmap.mmap(file.fileno(), 0) as buffer:
+                for entry in _read_entries(source_path):
+                    for position in _bit_positions(entry, bit_count, hash_count):
+                        buffer[_HEADER.size + (position >> 3)] |= 1 << (position & 7)
+                buffer.flush()
+        os.replace(temp_path, filter_path)
+        return entry_count
+    except Exception as e:
+        raise BloomException("Error: [Bloom] - Could not build the Bloom filter.") from e
+
+
+class BloomFilter:
+    """
+    Memory-mapped Bloom filter built by `build_bloom_filter`.
+
+    A membership probe hashes the entry once and reads a fixed number of bits, whatever the size
+    of the filter. Only the pages holding those bits are read from disk.
+
+    Attributes:
+        entry_count (int): The number of entries the filter was built from.
+    """
+
+    def __init__(self, filter_path: str):
+        try:
+            with open(filter_path, "rb") as file:
+                self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self._bit_count, self._hash_count, self.entry_count = _HEADER.unpack_from(self._buffer, 0)
+            if magic != _MAGIC:
+                raise ValueError("Unknown Bloom filter format.")
+        except Exception as e:
+            raise BloomException("Error: [Bloom] - Could not open the Bloom filter.") from e
+
+    def __contains__(self, entry) -> bool:
+        for position in _bit_positions(entry.encode("utf-8"), self._bit_count, self._hash_count):
+            if not self._buffer[_HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def close(self):
+        self._buffer.close()
+
+
+def load_bloom_filter(filter_path: str) -> Optional[BloomFilter]:
+    """
+    Opens a Bloom filter if it has been built.
+
+    Args:
+        filter_path (str): The path to the filter.
+
+    Returns:
+        Optional[BloomFilter]: The memory-mapped filter, or None if there is no filter at the path.
+
+    Raises:
+        BloomException: If the filter exists but could not be opened.
+    """
+    if not os.path.exists(filter_path):
+        return None
+    return BloomFilter(filter_path)
+
+
+# Private methods
+
+
+def _read_entries(source_path: str) -> Iterator[bytes]:
+    """
+    Streams the non-empty lines of a file as bytes, without their line endings.
+    """
+    with open(source_path, "rb") as file:
+        for line in file:
+            entry = line.rstrip(b"\r\n")
+            if entry:
+                yield entry
+
+
+def _optimal_size(entry_count: int, false_positive_rate: float):
+    """
+    Computes the number of bits and hash functions of a filter holding `entry_count` entries at
+    the given false positive rate.
+    """
+    entry_count = max(entry_count, 1)
+    bit_count = max(8, math.ceil(-entry_count * math.log(false_positive_rate) / math.log(2) ** 2))
+    hash_count = max(1, round(bit_count / entry_count * math.log(2)))
+    return bit_count, hash_count
+
+
+def _bit_positions(entry: bytes, bit_count: int, hash_count: int) -> Iterator[int]:
+    """
+    Yields the bit positions of an entry. A single BLAKE2b digest provides two independent 64-bit
+    hashes that are combined by double hashing into `hash_count` positions.
+    """
+    digest = hashlib.blake2b(entry, digest_size=16).digest()
+    first, second = struct.unpack("<QQ", digest)
+    second |= 1
+    for i in range(hash_count):
+        yield (first + i * second) % bit_count
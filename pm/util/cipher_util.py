@@ -0,0 +1,7 @@
+# Formats the values of a database can be encrypted in, stored in the header under
+# header_util.CIPHER; see crypto_util.ValueCipher. Databases without the key predate the choice
+# and use Fernet. Kept free of imports so that the CLI can list them without loading sqlite3.
+CIPHER_FERNET = "fernet"
+CIPHER_AES_GCM = "aes-gcm"
+CIPHERS = (CIPHER_FERNET, CIPHER_AES_GCM)
+DEFAULT_CIPHER = CIPHER_AES_GCM
@@ -1,7 +1,10 @@
-import subprocess
+import itertools
+import json
+import os
+import sys
 from enum import Enum
 
-from typing import Tuple, List, Optional, Callable
+from typing import Tuple, List, Optional, Callable, Iterable
 
 
 class TextStyle(Enum):
@@ -46,22 +49,111 @@ STYLE_MAP = {
 }
 
 
-def display_table_in_less_with_ansi(
+OUTPUT_FORMATS = ("table", "json", "jsonl", "tsv")
+
+
+def display_rows(
         header: Tuple[str, ...],
-        rows: List[Tuple[str, ...]],
+        rows: Iterable[Tuple[str, ...]],
+        output_format: str = "table",
         renderers: Optional[List[Optional[Callable[[str], List[TextStyle]]]]] = None
+) -> None:
+    """
+    Displays rows in the requested output format.
+
+    The `table` format is shown in 'less'. The machine-readable formats are written to standard
+    output one row at a time as the rows are produced, without a pager:
+        - `json`: An array of objects keyed by the snake cased column headers.
+        - `jsonl`: One such object per line.
+        - `tsv`: Tab separated values with a header line; tabs, newlines and backslashes in values
+          are escaped as `\\t`, `\\n` and `\\\\`.
+
+    Args:
+        header (Tuple[str, ...]): Column headers.
+        rows (Iterable[Tuple[str, ...]]): The rows, e.g. a generator decrypting them one by one.
+        output_format (str): One of `OUTPUT_FORMATS`.
+        renderers (Optional[List[Optional[Callable[[str], List[TextStyle]]]]]):
+            Optional list of rendering functions, only used by the `table` format.
+
+    Raises:
+        ValueError: If the output format is unknown.
+    """
+    if output_format == "table":
+        display_table_in_less_with_ansi(header=header, rows=rows, renderers=renderers)
+        return
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'.")
+
+    keys = [column.lower().replace(" ", "_") for column in header]
+    try:
+        if output_format == "json":
+            separator = "["
+            for row in rows:
+                sys.stdout.write(separator + json.dumps(dict(zip(keys, row))))
+                separator = ",\n"
+            sys.stdout.write("[]\n" if separator == "[" else "]\n")
+        elif output_format == "jsonl":
+            for row in rows:
+                sys.stdout.write(json.dumps(dict(zip(keys, row))) + "\n")
+        else:
+            sys.stdout.write("\t".join(header) + "\n")
+            for row in rows:
+                sys.stdout.write("\t".join(_escape_tsv(value) for value in row) + "\n")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader stopped early, e.g. `| head`; keep the flush at exit from failing again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+TABLE_SAMPLE_ROWS = 200  # Rows read ahead to size the columns when the widths are not known
+
+
+def display_table_in_less_with_ansi(
+        header: Tuple[str, ...],
+        rows: Iterable[Tuple[str, ...]],
+        renderers: Optional[List[Optional[Callable[[str], List[TextStyle]]]]] = None,
+        column_widths: Optional[List[int]] = None
 ) -> None:
     """
     Displays a formatted table in a paginated terminal view using 'less' with ANSI styles.
 
+    The table is streamed into the pager one row at a time, so the first screen shows while later
+    rows are still being produced, and memory use does not grow with the number of rows. Unless
+    the column widths are given, they are sized from the header and the first `TABLE_SAMPLE_ROWS`
+    rows; longer values in later rows are truncated. Rows stop being read once the pager is quit.
+
     Args:
         header (Tuple[str, ...]): Column headers for the table.
-        rows (List[Tuple[str, ...]]): List of row entries for the table.
+        rows (Iterable[Tuple[str, ...]]): Row entries for the table, e.g. a generator.
         renderers (Optional[List[Optional[Callable[[str], List[TextStyle]]]]]): 
             Optional list of rendering functions that apply text styles to individual cell content.
+        column_widths (Optional[List[int]]): Optional known width of each column.
     """
-    table = create_table(header=header, rows=rows, renderers=renderers)
-    subprocess.run(["less", "-S", "-R"], input=table.encode("utf-8"))
+    import subprocess  # Imported on use, the CLI imports this module for `OUTPUT_FORMATS`
+
+    rows = iter(rows)
+    sample = []
+    if column_widths is None:
+        sample = list(itertools.islice(rows, TABLE_SAMPLE_ROWS))
+        column_widths = [max(len(str(item)) for item in column) for column in zip(header, *sample)]
+
+    pager = subprocess.Popen(["less", "-S", "-R"], stdin=subprocess.PIPE, encoding="utf-8")
+    try:
+        pager.stdin.write(_border("┌", "┬", "┐", column_widths) + "\n")
+        pager.stdin.write(format_row(header, column_widths, renderers, True) + "\n")
+        pager.stdin.write(_border("├", "┼", "┤", column_widths) + "\n")
+        for row in sample:
+            pager.stdin.write(format_row(row, column_widths, renderers) + "\n")
+        pager.stdin.flush()
+        for row in rows:
+            row = [_truncate(str(item), width) for item, width in zip(row, column_widths)]
+            pager.stdin.write(format_row(row, column_widths, renderers) + "\n")
+        pager.stdin.write(_border("└", "┴", "┘", column_widths))
+        pager.stdin.close()
+    except BrokenPipeError:
+        # The pager was quit before the whole table was written
+        pass
+    pager.wait()
 
 
 def create_table(
@@ -83,9 +175,9 @@ def create_table(
     """
     column_widths = [max(len(str(item)) for item in column) for column in zip(header, *rows)]
 
-    top_border    = "┌" + "┬".join("─" * (width + 2) for width in column_widths) + "┐"
-    middle_border = "├" + "┼".join("─" * (width + 2) for width in column_widths) + "┤"
-    bottom_border = "└" + "┴".join("─" * (width + 2) for width in column_widths) + "┘"
+    top_border    = _border("┌", "┬", "┐", column_widths)
+    middle_border = _border("├", "┼", "┤", column_widths)
+    bottom_border = _border("└", "┴", "┘", column_widths)
 
     table_content = [top_border]
     table_content.append(format_row(header, column_widths, renderers, True))
@@ -154,3 +246,18 @@ def apply_styles(text: str, styles: List[TextStyle]) -> str:
     """
     style_sequence = ''.join(STYLE_MAP[style] for style in styles)
     return f"{style_sequence}{text}{STYLE_MAP[TextStyle.NORMAL]}"
+
+
+# Private methods
+
+
+def _escape_tsv(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _border(left: str, middle: str, right: str, column_widths: List[int]) -> str:
+    return left + middle.join("─" * (width + 2) for width in column_widths) + right
+
+
+def _truncate(text: str, width: int) -> str:
+    return text if len(text) <= width else text[:max(width - 1, 0)] + "…"
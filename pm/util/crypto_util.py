@@ -1,13 +1,18 @@
-from typing import Tuple
+from typing import Tuple, Dict, Any, List, Optional, Sequence, Union
 import bcrypt
 import base64
 import binascii
+import itertools
+import os
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from pm.util.config_util import get_password_hash_and_salt
+from pm.util.cipher_util import CIPHER_AES_GCM, CIPHER_FERNET, CIPHERS
+from pm.util.kdf_util import KdfException, ScryptBackend, DEFAULT_KDF, get_kdf_backend
 from pm.util.path_util import get_config_file_path
 
 
@@ -16,6 +21,24 @@ class CryptoException(Exception):
     pass
 
 
+KEY_CHECK_PLAINTEXT = "safe-pm key check"
+
+# Fernet values are base64 text; AES-GCM values are binary: a version byte, a 12-byte nonce, then
+# the ciphertext and 16-byte tag. Values of both formats can be read whichever one is written, as
+# the type of a stored value tells them apart.
+_AEAD_VERSION = b"\x01"
+_AEAD_NONCE_LENGTH = 12
+_AEAD_KEY_INFO = b"safe-pm value cipher aes-256-gcm"
+
+# Batches smaller than this are encrypted or decrypted in the calling process; starting and
+# feeding worker processes costs more than it saves for them
+CIPHER_PARALLEL_THRESHOLD = 4096
+CIPHER_TASK_SIZE = 1024
+
+_cipher_pool: Optional[Tuple[bytes, str, int, Any]] = None
+_worker_cipher: Optional["ValueCipher"] = None
+
+
 def generate_password_hash(password: str) -> Tuple[str, str]:
     """
     Generates a hashed password and salt for the provided plaintext password.
@@ -114,12 +137,17 @@ def get_deterministic_hash(text: str) -> str:
         raise CryptoException("Error: [Crypto] - Could not generate deterministic hash") from e
 
 
-def derive_encryption_key(password: str) -> bytes:
+def derive_encryption_key(password: str, kdf_params: Optional[Dict[str, Any]] = None) -> bytes:
     """
-    Derives a 256-bit encryption key from the given password using the Scrypt key derivation function.
+    Derives a 256-bit encryption key from the given password using the key derivation function
+    recorded in the parameters.
 
     Args:
         password (str): The password from which to derive the encryption key.
+        kdf_params (Optional[Dict[str, Any]]): The key derivation parameters stored for the
+            database, as returned by `generate_kdf_params`. Databases created before the parameters
+            were stored have none; for those Scrypt with the legacy cost and a salt derived from
+            the password is used.
 
     Returns:
         bytes: The derived encryption key encoded in base64.
@@ -128,30 +156,50 @@ def derive_encryption_key(password: str) -> bytes:
         CryptoException: If key derivation fails.
     """
     try:
-        hash_function = hashes.Hash(hashes.SHA256(), backend=default_backend())
-        hash_function.update(password.encode("utf-8"))
-        derived_salt = hash_function.finalize()
-
-        n = 2 ** 16  # 65,536 iterations
-        r = 8
-        p = 1
-        key_length = 32  # 256 bits for AES256
-
-        kdf = Scrypt(
-            salt=derived_salt,
-            length=key_length,
-            n=n,
-            r=r,
-            p=p,
-            backend=default_backend()
-        )
-
-        key = kdf.derive(password.encode("utf-8"))
+        if kdf_params is None:
+            hash_function = hashes.Hash(hashes.SHA256(), backend=default_backend())
+            hash_function.update(password.encode("utf-8"))
+            kdf_params = {
+                "name": ScryptBackend.name,
+                "n": ScryptBackend.LEGACY_N,
+                "r": ScryptBackend.R,
+                "p": ScryptBackend.P,
+                "salt": base64.urlsafe_b64encode(hash_function.finalize()).decode("utf-8")
+            }
+
+        key = get_kdf_backend(kdf_params["name"]).derive(password, kdf_params)
         return base64.urlsafe_b64encode(key)
+    except KdfException as e:
+        raise CryptoException(str(e)) from e
     except Exception as e:
         raise CryptoException("Error: [Crypto] - Could not derive encryption key") from e
 
 
+def generate_kdf_params(target_seconds: float, max_memory_bytes: int, kdf_name: str = DEFAULT_KDF) -> Dict[str, Any]:
+    """
+    Picks key derivation parameters for a new database by benchmarking the chosen backend on this
+    machine against a target unlock time and memory budget. A random salt is generated along with
+    the cost.
+
+    Args:
+        target_seconds (float): Target time for a single unlock.
+        max_memory_bytes (int): Maximum memory a single unlock may use.
+        kdf_name (str): Name of the key derivation backend, `scrypt` by default.
+
+    Returns:
+        Dict[str, Any]: The parameters to store in the database header.
+
+    Raises:
+        CryptoException: If the backend is unknown or the benchmark fails.
+    """
+    try:
+        return get_kdf_backend(kdf_name).calibrate(target_seconds, max_memory_bytes)
+    except KdfException as e:
+        raise CryptoException(str(e)) from e
+    except Exception as e:
+        raise CryptoException("Error: [Crypto] - Could not generate key derivation parameters") from e
+
+
 def encrypt(data: str, key: bytes) -> str:
     """
     Encrypts the given data using AES encryption with the provided key.
@@ -167,8 +215,7 @@ def encrypt(data: str, key: bytes) -> str:
         CryptoException: If encryption fails.
     """
     try:
-        fernet = Fernet(key)
-        return fernet.encrypt(data.encode("utf-8")).decode("utf-8")
+        return encrypt_with_cipher(data, create_cipher(key))
     except Exception as e:
         raise CryptoException("Error: [Crypto] - Could not encrypt data") from e
 
@@ -188,7 +235,360 @@ def decrypt(data: str, key: bytes) -> str:
         CryptoException: If decryption fails.
     """
     try:
-        fernet = Fernet(key)
-        return fernet.decrypt(data.encode("utf-8")).decode("utf-8")
+        return decrypt_with_cipher(data, create_cipher(key))
+    except Exception as e:
+        raise CryptoException("Error: [Crypto] - Could not decrypt data") from e
+
+
+def create_cipher(key: bytes) -> Fernet:
+    """
+    Creates a reusable cipher for the provided key.
+
+    Building the cipher validates and splits the key, so callers encrypting or decrypting many
+    values with the same key should create it once and pass it to the `*_with_cipher` functions.
+
+    Args:
+        key (bytes): The encryption key.
+
+    Returns:
+        Fernet: The cipher bound to the key.
+
+    Raises:
+        CryptoException: If the key is invalid.
+    """
+    try:
+        return Fernet(key)
+    except Exception as e:
+        raise CryptoException("Error: [Crypto] - Could not create cipher") from e
+
+
+def encrypt_with_cipher(data: str, cipher: Fernet) -> str:
+    """
+    Encrypts the given data using a cipher created by `create_cipher`.
+
+    Args:
+        data (str): The plaintext data to be encrypted.
+        cipher (Fernet): The cipher to encrypt with.
+
+    Returns:
+        str: The encrypted data encoded in base64.
+
+    Raises:
+        CryptoException: If encryption fails.
+    """
+    try:
+        return cipher.encrypt(data.encode("utf-8")).decode("utf-8")
+    except Exception as e:
+        raise CryptoException("Error: [Crypto] - Could not encrypt data") from e
+
+
+def decrypt_with_cipher(data: str, cipher: Fernet) -> str:
+    """
+    Decrypts the given encrypted data using a cipher created by `create_cipher`.
+
+    Args:
+        data (str): The base64-encoded encrypted data to be decrypted.
+        cipher (Fernet): The cipher to decrypt with.
+
+    Returns:
+        str: The decrypted plaintext data.
+
+    Raises:
+        CryptoException: If decryption fails.
+    """
+    try:
+        return cipher.decrypt(data.encode("utf-8")).decode("utf-8")
+    except Exception as e:
+        raise CryptoException("Error: [Crypto] - Could not decrypt data") from e
+
+
+class ValueCipher:
+    """
+    Encrypts and decrypts the values stored in a database.
+
+    New values are written in the format the cipher is created with; values in either format are
+    read. The AES-GCM key is derived from the encryption key with HKDF, so the same key is never
+    used by both formats.
+
+    Attributes:
+        cipher_name (str): The format new values are written in, one of `CIPHERS`.
+    """
+
+    def __init__(self, key: bytes, cipher_name: str = CIPHER_FERNET):
+        """
+        Args:
+            key (bytes): The encryption key of the database.
+            cipher_name (str): The format to write new values in.
+
+        Raises:
+            CryptoException: If the key or the format is invalid.
+        """
+        if cipher_name not in CIPHERS:
+            raise CryptoException(f"Error: [Crypto] - Unknown cipher '{cipher_name}'")
+        self.cipher_name = cipher_name
+        self._fernet = create_cipher(key)
+        try:
+            aead_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_AEAD_KEY_INFO).derive(
+                base64.urlsafe_b64decode(key)
+            )
+        except Exception as e:
+            raise CryptoException("Error: [Crypto] - Could not create cipher") from e
+        self._aead = AESGCM(aead_key)
+
+    def encrypt(self, data: str) -> Union[str, bytes]:
+        """
+        Encrypts a value for storage.
+
+        Args:
+            data (str): The plaintext value.
+
+        Returns:
+            Union[str, bytes]: A Fernet token, or the binary AES-GCM value.
+
+        Raises:
+            CryptoException: If encryption fails.
+        """
+        try:
+            if self.cipher_name == CIPHER_AES_GCM:
+                nonce = os.urandom(_AEAD_NONCE_LENGTH)
+                return _AEAD_VERSION + nonce + self._aead.encrypt(nonce, data.encode("utf-8"), _AEAD_VERSION)
+            return self._fernet.encrypt(data.encode("utf-8")).decode("utf-8")
+        except Exception as e:
+            raise CryptoException("Error: [Crypto] - Could not encrypt data") from e
+
+    def decrypt(self, value: Union[str, bytes]) -> str:
+        """
+        Decrypts a stored value of either format.
+
+        Args:
+            value (Union[str, bytes]): The value as stored.
+
+        Returns:
+            str: The plaintext value.
+
+        Raises:
+            CryptoException: If the value is damaged, in an unknown format, or was encrypted with
+                another key.
+        """
+        try:
+            if isinstance(value, bytes):
+                if value[:1] != _AEAD_VERSION:
+                    raise ValueError("Unknown value format")
+                nonce = value[1:1 + _AEAD_NONCE_LENGTH]
+                return self._aead.decrypt(nonce, value[1 + _AEAD_NONCE_LENGTH:], _AEAD_VERSION).decode("utf-8")
+            return self._fernet.decrypt(value.encode("utf-8")).decode("utf-8")
+        except Exception as e:
+            raise CryptoException("Error: [Crypto] - Could not decrypt data") from e
+
+
+def encrypt_many(
+        values: Sequence[str], key: bytes, cipher_name: str = CIPHER_FERNET, workers: Optional[int] = None
+) -> List[Union[str, bytes]]:
+    """
+    Encrypts many values with the same key, in order, in a format of `ValueCipher`.
+
+    The counterpart of `decrypt_many`: batches of at least `CIPHER_PARALLEL_THRESHOLD` values are
+    split into tasks for the same pool of worker processes.
+
+    Args:
+        values (Sequence[str]): The plaintext values.
+        key (bytes): The encryption key.
+        cipher_name (str): The format to write the values in.
+        workers (Optional[int]): Number of worker processes, the number of cores if not given.
+
+    Returns:
+        List[Union[str, bytes]]: The encrypted values, in the order of the plaintexts.
+
+    Raises:
+        CryptoException: If encryption of any value fails.
+    """
+    try:
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        if workers < 2 or len(values) < CIPHER_PARALLEL_THRESHOLD:
+            cipher = ValueCipher(key, cipher_name)
+            return [cipher.encrypt(value) for value in values]
+
+        tasks = [values[i:i + CIPHER_TASK_SIZE] for i in range(0, len(values), CIPHER_TASK_SIZE)]
+        pool = _get_cipher_pool(key, workers, cipher_name)
+        return list(itertools.chain.from_iterable(pool.map(_encrypt_task, tasks)))
+    except CryptoException as e:
+        raise e
+    except Exception as e:
+        raise CryptoException("Error: [Crypto] - Could not encrypt data") from e
+
+
+def decrypt_many(tokens: Sequence[Union[str, bytes]], key: bytes, workers: Optional[int] = None) -> List[str]:
+    """
+    Decrypts many stored values encrypted with the same key, in order, in either format of
+    `ValueCipher`.
+
+    One cipher is created for the whole batch. Batches of at least `CIPHER_PARALLEL_THRESHOLD`
+    tokens are split into tasks for a pool of worker processes, one per core by default; Fernet
+    does most of its work in Python and holds the GIL, so threads would not run in parallel. The
+    pool is started on first use and kept for later batches with the same key.
+
+    Args:
+        tokens (Sequence[Union[str, bytes]]): The encrypted values as stored.
+        key (bytes): The encryption key.
+        workers (Optional[int]): Number of worker processes, the number of cores if not given.
+
+    Returns:
+        List[str]: The decrypted values, in the order of the tokens.
+
+    Raises:
+        CryptoException: If decryption of any token fails.
+    """
+    try:
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        if workers < 2 or len(tokens) < CIPHER_PARALLEL_THRESHOLD:
+            cipher = ValueCipher(key)
+            return [cipher.decrypt(token) for token in tokens]
+
+        tasks = [tokens[i:i + CIPHER_TASK_SIZE] for i in range(0, len(tokens), CIPHER_TASK_SIZE)]
+        return list(itertools.chain.from_iterable(_get_cipher_pool(key, workers).map(_decrypt_task, tasks)))
+    except CryptoException as e:
+        raise e
     except Exception as e:
         raise CryptoException("Error: [Crypto] - Could not decrypt data") from e
+
+
+def shutdown_cipher_pool(key: Optional[bytes] = None) -> None:
+    """
+    Stops the worker processes of `encrypt_many` and `decrypt_many`, which hold a copy of the key
+    they were started with, e.g. when a database is locked.
+
+    Args:
+        key (Optional[bytes]): Only stop the pool if it was started with this key; any pool if None.
+    """
+    global _cipher_pool
+    if _cipher_pool is not None and (key is None or _cipher_pool[0] == key):
+        _cipher_pool[3].shutdown()
+        _cipher_pool = None
+
+
+def generate_data_key() -> bytes:
+    """
+    Generates a random data key, the key the values of a database are encrypted with. The data
+    key is stored wrapped with the master key derived from the master password, so changing the
+    master password only rewraps it.
+
+    Returns:
+        bytes: The data key encoded in base64.
+    """
+    return Fernet.generate_key()
+
+
+def wrap_data_key(data_key: bytes, master_key: bytes) -> str:
+    """
+    Encrypts a data key with a master key for storage in the database header.
+
+    Args:
+        data_key (bytes): The data key.
+        master_key (bytes): The key derived from the master password.
+
+    Returns:
+        str: The wrapped data key encoded in base64.
+
+    Raises:
+        CryptoException: If encryption fails.
+    """
+    return encrypt(data_key.decode("utf-8"), master_key)
+
+
+def unwrap_data_key(wrapped_data_key: str, master_key: bytes) -> bytes:
+    """
+    Decrypts a data key wrapped by `wrap_data_key`.
+
+    Args:
+        wrapped_data_key (str): The wrapped data key from the database header.
+        master_key (bytes): The key derived from the master password.
+
+    Returns:
+        bytes: The data key.
+
+    Raises:
+        CryptoException: If the master key is wrong or the wrapped key is damaged.
+    """
+    return decrypt(wrapped_data_key, master_key).encode("utf-8")
+
+
+def create_key_check(key: bytes) -> str:
+    """
+    Creates a key-check value, a known plaintext encrypted with the given key.
+
+    Storing the key-check value in a database allows verifying a derived key, and so the master
+    password it was derived from, without running a separate password hash.
+
+    Args:
+        key (bytes): The encryption key.
+
+    Returns:
+        str: The key-check value encoded in base64.
+
+    Raises:
+        CryptoException: If encryption fails.
+    """
+    return encrypt(KEY_CHECK_PLAINTEXT, key)
+
+
+def verify_key_check(key: bytes, key_check: str) -> bool:
+    """
+    Verifies that the given key is the one the key-check value was created with.
+
+    Args:
+        key (bytes): The derived encryption key to verify.
+        key_check (str): The key-check value stored in the database.
+
+    Returns:
+        bool: True if the key decrypts the key-check value, False otherwise.
+
+    Raises:
+        CryptoException: If verification fails for reasons other than a wrong key.
+    """
+    try:
+        return create_cipher(key).decrypt(key_check.encode("utf-8")).decode("utf-8") == KEY_CHECK_PLAINTEXT
+    except InvalidToken:
+        return False
+    except Exception as e:
+        raise CryptoException("Error: [Crypto] - Could not verify key check") from e
+
+
+# Private methods
+
+
+def _get_cipher_pool(key: bytes, workers: int, cipher_name: Optional[str] = None):
+    """
+    Returns the pool of `workers` processes holding a cipher for the key, restarting it if the
+    running pool was started for another key, format or number of workers. Decryption reads
+    either format, so any pool for the key serves it when `cipher_name` is None.
+    """
+    global _cipher_pool
+    from concurrent.futures import ProcessPoolExecutor
+
+    if _cipher_pool is not None and (
+            _cipher_pool[0] != key or cipher_name not in (None, _cipher_pool[1]) or _cipher_pool[2] != workers
+    ):
+        _cipher_pool[3].shutdown()
+        _cipher_pool = None
+    if _cipher_pool is None:
+        cipher_name = cipher_name or CIPHER_FERNET
+        _cipher_pool = (
+            key,
+            cipher_name,
+            workers,
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_cipher_worker, initargs=(key, cipher_name))
+        )
+    return _cipher_pool[3]
+
+
+def _init_cipher_worker(key: bytes, cipher_name: str):
+    global _worker_cipher
+    _worker_cipher = ValueCipher(key, cipher_name)
+
+
+def _encrypt_task(values: Sequence[str]) -> List[Union[str, bytes]]:
+    return [_worker_cipher.encrypt(value) for value in values]
+
+
+def _decrypt_task(tokens: Sequence[Union[str, bytes]]) -> List[str]:
+    return [_worker_cipher.decrypt(token) for token in tokens]
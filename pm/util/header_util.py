@@ -0,0 +1,67 @@
+import sqlite3
+from contextlib import closing
+from typing import Dict, Optional
+
+from pm.util.schema_util import migrate_db
+
+
+class HeaderException(Exception):
+    """Exception raised for errors while reading or writing the db header."""
+    pass
+
+
+KEY_CHECK = "key_check"
+KDF = "kdf"
+PERFORMANCE = "performance"
+CIPHER = "cipher"  # One of cipher_util.CIPHERS
+DATA_KEY = "data_key"
+
+# The header is a key/value table holding unencrypted metadata that is needed before the database
+# can be unlocked, such as the key-check value, the key derivation parameters, the data key wrapped
+# with the master key, the performance profile and the format new values are encrypted in. It is created by
+# the schema migrations.
+
+
+def get_header_value(db_file_path: str, key: str) -> Optional[str]:
+    """
+    Reads a single value from the header of a database.
+
+    Args:
+        db_file_path (str): The absolute path to the database file.
+        key (str): The header key to read.
+
+    Returns:
+        Optional[str]: The stored value, or None if the key is not set.
+
+    Raises:
+        HeaderException: If the header could not be read.
+    """
+    try:
+        migrate_db(db_file_path)
+        with closing(sqlite3.connect(db_file_path)) as connection:
+            record = connection.execute("SELECT value FROM header WHERE key=?", (key,)).fetchone()
+            return record[0] if record is not None else None
+    except Exception as e:
+        raise HeaderException("Error: [Header] - Could not read the header.") from e
+
+
+def set_header_values(db_file_path: str, values: Dict[str, str]) -> None:
+    """
+    Writes one or more values to the header of a database in a single transaction.
+
+    Args:
+        db_file_path (str): The absolute path to the database file.
+        values (Dict[str, str]): Mapping of header keys to values.
+
+    Raises:
+        HeaderException: If the header could not be written.
+    """
+    try:
+        migrate_db(db_file_path)
+        with closing(sqlite3.connect(db_file_path)) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO header (key, value) VALUES (?, ?)", list(values.items())
+            )
+            connection.commit()
+    except Exception as e:
+        raise HeaderException("Error: [Header] - Could not write the header.") from e
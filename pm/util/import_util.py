@@ -0,0 +1,109 @@
+import json
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class ImportUtilException(Exception):
+    """Exception raised for exports that cannot be read."""
+    pass
+
+
+IMPORT_FORMATS = ("csv", "json", "bitwarden", "keepass-xml")
+
+# Column or key names used for each field by common exports, in order of preference
+_FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "name": ("name", "title", "account"),
+    "username": ("username", "login_username", "login", "user"),
+    "email": ("email", "e-mail", "mail"),
+    "password": ("password", "login_password"),
+}
+
+Entry = Tuple[str, str, str, str]
+
+
+def read_entries(source_format: str, file_path: str) -> Iterator[Entry]:
+    """
+    Reads the entries of a password manager export one at a time.
+
+    CSV and KeePass XML exports are parsed as a stream. JSON and Bitwarden exports are loaded
+    whole first, as the json module has no incremental parser.
+
+    Args:
+        source_format (str): Format of the export, one of `IMPORT_FORMATS`.
+        file_path (str): Path to the export.
+
+    Returns:
+        Iterator[Entry]: The name, username, email and password of each entry; missing fields are
+            empty strings.
+
+    Raises:
+        ImportUtilException: If the export is not in the expected shape.
+    """
+    if source_format == "csv":
+        return _read_csv(file_path)
+    if source_format == "json":
+        return _read_json(file_path)
+    if source_format == "bitwarden":
+        return _read_bitwarden(file_path)
+    return _read_keepass_xml(file_path)
+
+
+# Private methods
+
+
+def _field(record: Dict[str, Any], field: str) -> str:
+    for key in _FIELD_ALIASES[field]:
+        value = record.get(key)
+        if value:
+            return str(value)
+    return ""
+
+
+def _read_csv(file_path: str) -> Iterator[Entry]:
+    import csv  # Imported on use, the CLI imports this module for `IMPORT_FORMATS`
+
+    with open(file_path, "r", newline="", encoding="utf-8-sig") as file:
+        for row in csv.DictReader(file):
+            record = {key.strip().lower(): value for key, value in row.items() if key is not None}
+            yield _field(record, "name"), _field(record, "username"), _field(record, "email"), _field(record, "password")
+
+
+def _read_json(file_path: str) -> Iterator[Entry]:
+    # The json module has no incremental parser, so the document is loaded whole
+    with open(file_path, "r", encoding="utf-8-sig") as file:
+        records = json.load(file)
+    if not isinstance(records, list):
+        raise ImportUtilException("Error: [Import] - A JSON import must be a list of objects.")
+    for record in records:
+        record = {str(key).lower(): value for key, value in record.items()}
+        yield _field(record, "name"), _field(record, "username"), _field(record, "email"), _field(record, "password")
+
+
+def _read_bitwarden(file_path: str) -> Iterator[Entry]:
+    with open(file_path, "r", encoding="utf-8-sig") as file:
+        export = json.load(file)  # no incremental parser, see _read_json
+    if export.get("encrypted"):
+        raise ImportUtilException("Error: [Import] - Encrypted Bitwarden exports are not supported.")
+    for item in export.get("items", []):
+        login = item.get("login")
+        if login is None:
+            continue
+        yield item.get("name") or "", login.get("username") or "", "", login.get("password") or ""
+
+
+def _read_keepass_xml(file_path: str) -> Iterator[Entry]:
+    from xml.etree import ElementTree  # Imported on use, see _read_csv
+
+    depth_in_history = 0
+    for event, element in ElementTree.iterparse(file_path, events=("start", "end")):
+        if element.tag == "History":
+            depth_in_history += 1 if event == "start" else -1
+        elif element.tag == "Entry" and event == "end":
+            if depth_in_history == 0:
+                strings: Dict[str, Optional[str]] = {
+                    string.findtext("Key"): string.findtext("Value") for string in element.findall("String")
+                }
+                yield (
+                    strings.get("Title") or "", strings.get("UserName") or "", strings.get("Email") or "",
+                    strings.get("Password") or ""
+                )
+            element.clear()
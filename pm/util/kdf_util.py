@@ -0,0 +1,205 @@
+import base64
+import os
+import time
+from typing import Any, Dict
+
+
+class KdfException(Exception):
+    """Exception raised for errors in key derivation backends."""
+    pass
+
+
+KEY_LENGTH = 32  # 256 bits for AES256
+SALT_LENGTH = 16
+
+
+class KdfBackend:
+    """
+    Interface of a password based key derivation function.
+
+    A backend derives raw key bytes from a password and a parameter dict, and picks parameters for
+    new databases by benchmarking itself. Parameters are stored per database in its header and
+    always contain the backend `name` and a base64-encoded `salt`.
+
+    Attributes:
+        name (str): Name the backend is registered and stored under.
+    """
+    name = ""
+
+    def derive(self, password: str, params: Dict[str, Any]) -> bytes:
+        """
+        Derives a key from the password.
+
+        Args:
+            password (str): The password from which to derive the key.
+            params (Dict[str, Any]): The parameters returned by `calibrate`.
+
+        Returns:
+            bytes: The raw derived key of `KEY_LENGTH` bytes.
+        """
+        raise NotImplementedError()
+
+    def calibrate(self, target_seconds: float, max_memory_bytes: int) -> Dict[str, Any]:
+        """
+        Picks the parameters for a new database by benchmarking the backend on this machine.
+
+        Args:
+            target_seconds (float): Target time for a single derivation.
+            max_memory_bytes (int): Maximum memory a single derivation may use.
+
+        Returns:
+            Dict[str, Any]: The parameters, including the backend `name` and a random `salt`.
+        """
+        raise NotImplementedError()
+
+
+class ScryptBackend(KdfBackend):
+    """
+    Scrypt backend. The cost `n` is calibrated; `r` and `p` are fixed.
+    """
+    name = "scrypt"
+
+    R = 8
+    P = 1
+    LEGACY_N = 2 ** 16  # Cost used by databases created before parameters were stored per db
+    MIN_N = 2 ** 15
+    MAX_N = 2 ** 22
+
+    def derive(self, password: str, params: Dict[str, Any]) -> bytes:
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+        kdf = Scrypt(
+            salt=base64.urlsafe_b64decode(params["salt"]),
+            length=KEY_LENGTH,
+            n=params["n"],
+            r=params["r"],
+            p=params["p"],
+            backend=default_backend()
+        )
+        return kdf.derive(password.encode("utf-8"))
+
+    def calibrate(self, target_seconds: float, max_memory_bytes: int) -> Dict[str, Any]:
+        # Time the smallest allowed cost; the derivation time grows linearly with n
+        elapsed = min(self._time_derivation(self.MIN_N) for _ in range(2))
+        n = self.MIN_N
+        while n < self.MAX_N \
+                and elapsed * (n * 2) / self.MIN_N <= target_seconds \
+                and 128 * self.R * (n * 2) <= max_memory_bytes:
+            n *= 2
+        return {"name": self.name, "n": n, "r": self.R, "p": self.P, "salt": generate_salt()}
+
+    def _time_derivation(self, n: int) -> float:
+        start = time.perf_counter()
+        self.derive("safe-pm benchmark", {"n": n, "r": self.R, "p": self.P, "salt": generate_salt()})
+        return time.perf_counter() - start
+
+
+class Argon2idBackend(KdfBackend):
+    """
+    Argon2id backend. Requires the optional `argon2-cffi` package.
+
+    One lane is used per available core, up to `MAX_LANES`, and the lanes are computed in
+    parallel. The memory cost is the memory budget, halved until a single pass fits the target
+    time; the number of passes is then raised as far as the target time allows. Below
+    `SINGLE_PASS_MIN_MEMORY_KIB` at least `MIN_ITERATIONS_LOW_MEMORY` passes are used, following
+    the OWASP minimums of 46 MiB with one pass and 19 MiB with two.
+    """
+    name = "argon2id"
+
+    MIN_MEMORY_KIB = 19 * 1024
+    SINGLE_PASS_MIN_MEMORY_KIB = 46 * 1024
+    MIN_ITERATIONS_LOW_MEMORY = 2
+    MAX_LANES = 8
+    MAX_ITERATIONS = 10
+
+    def derive(self, password: str, params: Dict[str, Any]) -> bytes:
+        low_level = _import_argon2()
+        return low_level.hash_secret_raw(
+            secret=password.encode("utf-8"),
+            salt=base64.urlsafe_b64decode(params["salt"]),
+            time_cost=params["iterations"],
+            memory_cost=params["memory_kib"],
+            parallelism=params["lanes"],
+            hash_len=KEY_LENGTH,
+            type=low_level.Type.ID
+        )
+
+    def calibrate(self, target_seconds: float, max_memory_bytes: int) -> Dict[str, Any]:
+        lanes = max(1, min(os.cpu_count() or 1, self.MAX_LANES))
+        memory_kib = max(self.MIN_MEMORY_KIB, max_memory_bytes // 1024)
+        elapsed = self._time_derivation(1, memory_kib, lanes)
+        while elapsed > target_seconds and memory_kib // 2 >= self.MIN_MEMORY_KIB:
+            memory_kib //= 2
+            elapsed /= 2
+
+        iterations = 1 if memory_kib >= self.SINGLE_PASS_MIN_MEMORY_KIB else self.MIN_ITERATIONS_LOW_MEMORY
+        while iterations < self.MAX_ITERATIONS and elapsed * (iterations + 1) <= target_seconds:
+            iterations += 1
+        return {
+            "name": self.name,
+            "iterations": iterations,
+            "memory_kib": memory_kib,
+            "lanes": lanes,
+            "salt": generate_salt()
+        }
+
+    def _time_derivation(self, iterations: int, memory_kib: int, lanes: int) -> float:
+        start = time.perf_counter()
+        self.derive(
+            "safe-pm benchmark",
+            {"iterations": iterations, "memory_kib": memory_kib, "lanes": lanes, "salt": generate_salt()}
+        )
+        return time.perf_counter() - start
+
+
+KDF_BACKENDS: Dict[str, KdfBackend] = {
+    ScryptBackend.name: ScryptBackend(),
+    Argon2idBackend.name: Argon2idBackend(),
+}
+DEFAULT_KDF = ScryptBackend.name
+
+
+def get_kdf_backend(name: str) -> KdfBackend:
+    """
+    Looks up a key derivation backend by name.
+
+    Args:
+        name (str): Name of the backend, e.g. `scrypt` or `argon2id`.
+
+    Returns:
+        KdfBackend: The registered backend.
+
+    Raises:
+        KdfException: If no backend with the name is registered.
+    """
+    if name not in KDF_BACKENDS:
+        raise KdfException(f"Error: [KDF] - Unknown key derivation function '{name}'.")
+    return KDF_BACKENDS[name]
+
+
+def generate_salt() -> str:
+    """
+    Returns:
+        str: A random base64-encoded salt of `SALT_LENGTH` bytes.
+    """
+    return base64.urlsafe_b64encode(os.urandom(SALT_LENGTH)).decode("utf-8")
+
+
+# Private methods
+
+
+def _import_argon2():
+    """
+    Imports the low level API of the optional `argon2-cffi` package.
+
+    Raises:
+        KdfException: If the package is not installed.
+    """
+    try:
+        from argon2 import low_level
+        return low_level
+    except ImportError as e:
+        raise KdfException(
+            "Error: [KDF] - Argon2id requires the 'argon2-cffi' package. Install it with `pip install argon2-cffi`."
+        ) from e
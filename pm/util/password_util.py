@@ -2,6 +2,10 @@ import math
 import random
 import re
 import string
+from collections import Counter
+
+numpy = None  # Optional, imported on first use by `_import_numpy` since it is slow to import
+_numpy_imported = False
 
 
 def generate_random_password(min_length, max_length, pass_no_special=False, pass_no_digits=False, pass_exclude_chars=""):
@@ -124,93 +128,282 @@ def calculate_password_strength(password):
     return math.ceil(final_strength * 100) / 100
 
 
-def edit_distance(str1, str2):
+def edit_distance(str1, str2, max_cost=float('inf')):
     """
     Calculates a custom edit distance between two strings using insertion, deletion,
     and substitution with special character mappings.
 
+    When a `max_cost` is given only the diagonal band of cells that a path within that cost can
+    cross is computed, and the calculation stops as soon as no cell of a row is within it. Only
+    two rows of the table are kept in memory.
+
     Args:
         str1 (str): The first string.
         str2 (str): The second string.
+        max_cost (float, optional): The largest distance the caller is interested in. Defaults to
+            no limit.
 
     Returns:
-        int: The calculated edit distance between the two strings.
+        int: The calculated edit distance between the two strings, or `max_cost + 1` if the
+        distance is larger than `max_cost`.
     """
     len_str1 = len(str1)
     len_str2 = len(str2)
-
-    # Create a 2D array to store edit distances
-    dp = [[0 for _ in range(len_str2 + 1)] for _ in range(len_str1 + 1)]
-
-    # Initialize the first row and column
-    for i in range(len_str1 + 1):
-        dp[i][0] = i
-    for j in range(len_str2 + 1):
-        dp[0][j] = j
-
-    # Define character replacements (e.g., 'a' or 'A' can be replaced by '@', 'o' or 'O' can be replaced by '0')
-    replacements = {
-        'a': '@',
-        'A': '@',
-        'e': '3',
-        'i': '1',
-        'I': '1',
-        'o': '0',
-        'O': '0',
-        'p': '9',
-        'P': '9',
-        's': '$',
-        'S': '$',
-        't': '7',
-        'T': '7',
-        'z': '2',
-        'Z': '2'
-    }
-
-    # Calculate edit distances
+    length_difference = len_str2 - len_str1
+
+    # Every insertion or deletion costs at least 1, so a path within max_cost stays within
+    # a band around the diagonals from the start and to the end of the table
+    if abs(length_difference) > max_cost:
+        return max_cost + 1
+    if max_cost == float('inf'):
+        band_min, band_max = -len_str1, len_str2
+    else:
+        slack = int(max_cost - abs(length_difference)) // 2
+        band_min, band_max = min(0, length_difference) - slack, max(0, length_difference) + slack
+
+    lower_str1 = str1.lower() if str1.isascii() else [c.lower() for c in str1]
+    lower_str2 = str2.lower() if str2.isascii() else [c.lower() for c in str2]
+
+    # Initialize the first row
+    previous_row = list(range(len_str2 + 1))
+    infinity = float('inf')
+
+    # Calculate edit distances row by row
     for i in range(1, len_str1 + 1):
-        for j in range(1, len_str2 + 1):
-            cost = 0
-
-            # Check if characters are different
-            if str1[i - 1] != str2[j - 1]:
-                # Check if characters can be replaced by similar-looking special chars or numbers
-                if str1[i - 1] in replacements and replacements[str1[i - 1]] == str2[j - 1]:
-                    cost = 1
-                if str1[i - 1].lower() == str2[j - 1].lower():
-                    cost = 0
-                else:
-                    cost = 3  # Default cost for other edits
-
-            dp[i][j] = min(
-                dp[i - 1][j] + 8,  # Deletion
-                dp[i][j - 1] + 4,  # Insertion
-                dp[i - 1][j - 1] + cost,  # Substitution
+        row_start = max(0, i + band_min)
+        row_end = min(len_str2, i + band_max)
+        current_row = [infinity] * (len_str2 + 1)
+        current_row[0] = i
+
+        char1 = str1[i - 1]
+        lower_char1 = lower_str1[i - 1]
+        for j in range(max(1, row_start), row_end + 1):
+            # Characters that only differ in case are free; any other substitution costs 3
+            if char1 == str2[j - 1] or lower_char1 == lower_str2[j - 1]:
+                cost = 0
+            else:
+                cost = 3
+
+            current_row[j] = min(
+                previous_row[j] + 8,  # Deletion
+                current_row[j - 1] + 4,  # Insertion
+                previous_row[j - 1] + cost,  # Substitution
             )
 
-    return dp[len_str1][len_str2]
+        # Stop once no path within max_cost can continue from this row
+        if row_start > row_end or min(current_row[row_start:row_end + 1]) > max_cost:
+            return max_cost + 1
+        previous_row = current_row
+
+    distance = previous_row[len_str2]
+    return distance if distance <= max_cost else max_cost + 1
 
 
-def find_most_similar_password(password, rainbow_table):
+def find_most_similar_password(password, rainbow_table, max_distance=float('inf')):
     """
     Finds the most similar password from a rainbow table using a custom edit distance.
 
+    Entries that cannot beat the best distance found so far, or `max_distance`, are pruned
+    without computing their edit distance. The pruning uses lower bounds derived from the entry
+    length and the characters shared with the password, which are cheap to compute. For compiled
+    rainbow tables whole length buckets are pruned at once.
+
+    If NumPy is installed and both the password and the table are plain ASCII, the distances to
+    all entries are computed at once with `batch_edit_distance` instead.
+
     Args:
         password (str): The input password to compare.
-        rainbow_table (list[str]): A list of known passwords to compare against.
+        rainbow_table (Iterable[str]): Known passwords to compare against, either a list or a
+            `CompiledRainbowTable`.
+        max_distance (float, optional): Only entries with a distance below this are considered.
+            Defaults to no limit.
 
     Returns:
         tuple[str, int]: A tuple containing:
-            - The most similar password from the table.
+            - The most similar password from the table, or None if no entry is below `max_distance`.
             - The edit distance between the input password and the most similar password.
     """
-    min_distance = float('inf')
+    if _import_numpy() is not None and password.isascii() and _is_ascii_table(rainbow_table):
+        return _find_most_similar_password_batched(password, rainbow_table, max_distance)
+
+    min_distance = max_distance
     most_similar_password = None
+    password_length = len(password)
+    password_chars = Counter(c.lower() for c in password)
+
+    for entry_length, entries in _length_buckets(rainbow_table):
+        if _length_lower_bound(password_length, entry_length) >= min_distance:
+            continue
+
+        for entry in entries:
+            if _shared_chars_lower_bound(password_length, password_chars, entry) >= min_distance:
+                continue
+            distance = edit_distance(password, entry, min_distance - 1)
+            if distance < min_distance:
+                min_distance = distance
+                most_similar_password = entry
+
+    if most_similar_password is None:
+        return None, float('inf')
+    return most_similar_password, min_distance
+
+
+def batch_edit_distance(password, entries, entry_lengths):
+    """
+    Calculates `edit_distance` from the password to many entries at once. Requires NumPy.
+
+    The entries are given as a matrix with one lower cased ASCII entry per row, padded to the
+    width of the longest entry. The table is filled one password character at a time for all
+    entries together: deletions and substitutions are plain vector operations on the previous
+    row, and insertions along the row are resolved with a running minimum.
+
+    Args:
+        password (str): The ASCII password to compare.
+        entries (numpy.ndarray): `uint8` matrix of shape (number of entries, max entry length).
+        entry_lengths (numpy.ndarray): Length of each entry.
+
+    Returns:
+        numpy.ndarray: The edit distance to each entry.
+    """
+    _import_numpy()
+    entry_count, width = entries.shape
+    columns = numpy.arange(width + 1, dtype=numpy.int32)
+    insertion_costs = 4 * columns
+
+    # Initialize the first row
+    previous_row = numpy.broadcast_to(columns, (entry_count, width + 1))
+    current_row = numpy.empty((entry_count, width + 1), dtype=numpy.int32)
+
+    for i, char in enumerate(password.lower().encode("ascii"), start=1):
+        # Characters that only differ in case are free; any other substitution costs 3
+        substitution = previous_row[:, :-1] + numpy.where(entries == char, 0, 3).astype(numpy.int32)
+        deletion = previous_row[:, 1:] + 8
+        current_row[:, 0] = i
+        numpy.minimum(substitution, deletion, out=current_row[:, 1:])
+
+        # Insertion: cell j may come from any cell k < j of the same row at 4 per step
+        current_row -= insertion_costs
+        numpy.minimum.accumulate(current_row, axis=1, out=current_row)
+        current_row += insertion_costs
+        previous_row, current_row = current_row, numpy.empty_like(current_row)
+
+    return previous_row[numpy.arange(entry_count), entry_lengths]
+
+
+# Private methods
+
+
+def _import_numpy():
+    """
+    Imports the optional NumPy package on first use.
+
+    Returns:
+        The `numpy` module, or None if it is not installed.
+    """
+    global numpy, _numpy_imported
+    if not _numpy_imported:
+        _numpy_imported = True
+        try:
+            import numpy as numpy_module
+            numpy = numpy_module
+        except ImportError:
+            numpy = None
+    return numpy
+
 
-    for entry in rainbow_table:
-        distance = edit_distance(password, entry)
-        if distance < min_distance:
-            min_distance = distance
-            most_similar_password = entry
+_BATCH_SIZE = 65536
 
+
+def _is_ascii_table(rainbow_table):
+    """Checks whether every entry of a rainbow table is plain ASCII."""
+    if hasattr(rainbow_table, "is_ascii"):
+        return rainbow_table.is_ascii
+    return all(entry.isascii() for entry in rainbow_table)
+
+
+def _find_most_similar_password_batched(password, rainbow_table, max_distance):
+    """
+    Variant of `find_most_similar_password` computing the distances with `batch_edit_distance`.
+
+    Compiled tables are mapped into matrices bucket by bucket without copying; lists are packed
+    in batches of `_BATCH_SIZE` entries. The result, including ties, is the same as the scan.
+    """
+    min_distance = max_distance
+    most_similar_password = None
+
+    for entries, lengths, candidates in _batches(rainbow_table):
+        if len(candidates) == 0:
+            continue
+        if int(numpy.abs(lengths - len(password)).min()) >= min_distance:
+            continue
+        distances = batch_edit_distance(password, entries, lengths)
+        best = int(numpy.argmin(distances))
+        if distances[best] < min_distance:
+            min_distance = int(distances[best])
+            most_similar_password = candidates[best]
+
+    if most_similar_password is None:
+        return None, float('inf')
     return most_similar_password, min_distance
+
+
+def _batches(rainbow_table):
+    """
+    Splits the rainbow table into entry matrices for `batch_edit_distance`.
+
+    Returns:
+        Iterator[tuple[numpy.ndarray, numpy.ndarray, Sequence[str]]]: The entry matrix, the entry
+        lengths and the entries themselves.
+    """
+    if hasattr(rainbow_table, "buckets"):
+        for bucket in rainbow_table.buckets():
+            entries = numpy.frombuffer(bucket.data(), dtype=numpy.uint8).reshape(len(bucket), bucket.length)
+            yield entries, numpy.full(len(bucket), bucket.length), bucket
+        return
+
+    for start in range(0, len(rainbow_table), _BATCH_SIZE):
+        candidates = rainbow_table[start:start + _BATCH_SIZE]
+        width = max((len(entry) for entry in candidates), default=0)
+        packed = b"".join(entry.lower().encode("ascii").ljust(width, b"\0") for entry in candidates)
+        entries = numpy.frombuffer(packed, dtype=numpy.uint8).reshape(len(candidates), width)
+        yield entries, numpy.array([len(entry) for entry in candidates]), candidates
+
+
+def _length_buckets(rainbow_table):
+    """
+    Groups the rainbow table by entry length, keeping the iteration order of the table.
+
+    Args:
+        rainbow_table (Iterable[str]): A list of entries or a `CompiledRainbowTable`.
+
+    Returns:
+        Iterator[tuple[int, Iterable[str]]]: Pairs of entry length and the entries of that length.
+    """
+    if getattr(rainbow_table, "is_ascii", False):
+        for bucket in rainbow_table.buckets():
+            yield bucket.length, bucket
+    else:
+        for entry in rainbow_table:
+            yield len(entry), (entry,)
+
+
+def _length_lower_bound(password_length, entry_length):
+    """
+    Lower bound of `edit_distance` from the lengths alone. Every character of length difference
+    needs an insertion or deletion, and those cost at least 1 at the start of either string.
+    """
+    return abs(password_length - entry_length)
+
+
+def _shared_chars_lower_bound(password_length, password_chars, entry):
+    """
+    Lower bound of `edit_distance` from the lengths and the characters shared with the entry.
+
+    At most `shared` characters can be aligned for free. Beyond the insertions or deletions the
+    length difference forces, every remaining character of the shorter string needs a
+    substitution, since replacing it with an insertion and a deletion costs more.
+    """
+    entry_length = len(entry)
+    entry_chars = Counter(entry.lower()) if entry.isascii() else Counter(c.lower() for c in entry)
+    shared = sum(min(count, password_chars[c]) for c, count in entry_chars.items())
+    return abs(password_length - entry_length) + 3 * (min(password_length, entry_length) - shared)
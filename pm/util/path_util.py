@@ -19,6 +19,40 @@ def get_rainbow_table_path() -> str:
         raise PathException("Error: [Path] - Could not get rainbow-table path.") from e
 
 
+def get_rainbow_index_path() -> str:
+    """
+    Constructs the absolute path to the compiled index of the rainbow table, which is kept next
+    to the rainbow table itself.
+
+    Returns:
+        str: The absolute path to the compiled rainbow table index.
+
+    Raises:
+        PathException: If the rainbow table path could not be constructed.
+    """
+    try:
+        return get_rainbow_table_path() + ".idx"
+    except Exception as e:
+        raise PathException("Error: [Path] - Could not get rainbow-table index path.") from e
+
+
+def get_breach_filter_path() -> str:
+    """
+    Constructs the absolute path to the Bloom filter of imported breach corpora, which is kept
+    next to the rainbow table.
+
+    Returns:
+        str: The absolute path to the breach filter.
+
+    Raises:
+        PathException: If the rainbow table path could not be constructed.
+    """
+    try:
+        return os.path.join(os.path.dirname(get_rainbow_table_path()), ".breach-bloom")
+    except Exception as e:
+        raise PathException("Error: [Path] - Could not get breach filter path.") from e
+
+
 def get_db_path() -> str:
     """
     Constructs the absolute path to the 'db' directory by locating the 'bin' directory
@@ -40,6 +74,26 @@ def get_db_path() -> str:
         raise PathException("Error: [Path] - Could not get db path.") from e
 
 
+def get_backup_path(db_name: str) -> str:
+    """
+    Constructs the absolute path to the backups of a database, kept in a 'backups' directory
+    next to the 'db' directory.
+
+    Args:
+        db_name (str): The name of the database without extension.
+
+    Returns:
+        str: The absolute path to the backup directory of the database.
+
+    Raises:
+        PathException: If the db path could not be constructed.
+    """
+    try:
+        return os.path.join(os.path.dirname(get_db_path()), "backups", db_name)
+    except Exception as e:
+        raise PathException("Error: [Path] - Could not get backup path.") from e
+
+
 def get_db_file_name(db_name: str) -> str:
     """
     Constructs the database file name by appending the '.db' extension to the given database name.
@@ -150,6 +204,22 @@ def get_config_file_path() -> str:
         raise PathException("Error: [Path] - Could not get config file path.") from e
 
 
+def get_agent_socket_path() -> str:
+    """
+    Retrieves the absolute path to the unix socket of the unlock agent located in the user's home directory.
+
+    Returns:
+        str: The absolute path to the agent socket.
+
+    Raises:
+        PathException: If an error occurs while constructing the socket path.
+    """
+    try:
+        return os.path.join(get_user_home(), ".safe-pm-agent.sock")
+    except Exception as e:
+        raise PathException("Error: [Path] - Could not get agent socket path.") from e
+
+
 def get_user_home() -> str:
     """
     Retrieves the current user's home directory.
@@ -0,0 +1,85 @@
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import sqlite3  # The CLI imports this module for the mode choices; sqlite3 is slow to import
+
+
+class ProfileException(Exception):
+    """Exception raised for invalid performance profiles."""
+    pass
+
+
+JOURNAL_MODES = ("wal", "delete", "truncate")
+SYNCHRONOUS_MODES = ("off", "normal", "full")
+
+# Performance profile of new databases: readers do not block behind a writer, a commit syncs the
+# write-ahead log instead of the whole database, and the hot pages are memory-mapped.
+DEFAULT_PERFORMANCE_PROFILE: Dict[str, Any] = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "mmap_size_mb": 64,
+    "cache_size_mb": 16,
+    "busy_timeout_ms": 5000,
+}
+
+
+def build_performance_profile(base: Optional[Dict[str, Any]] = None, **overrides: Any) -> Dict[str, Any]:
+    """
+    Builds a performance profile from a base profile and the settings to change.
+
+    Args:
+        base (Optional[Dict[str, Any]]): The profile to start from, `DEFAULT_PERFORMANCE_PROFILE`
+            if not given.
+        **overrides (Any): Settings of the profile to change. Settings that are None are ignored.
+
+    Returns:
+        Dict[str, Any]: The validated profile.
+
+    Raises:
+        ProfileException: If a setting is unknown or has an invalid value.
+    """
+    profile = dict(DEFAULT_PERFORMANCE_PROFILE)
+    profile.update(base or {})
+    for name, value in overrides.items():
+        if name not in DEFAULT_PERFORMANCE_PROFILE:
+            raise ProfileException(f"Error: [Profile] - Unknown performance setting '{name}'.")
+        if value is not None:
+            profile[name] = value
+    _validate_profile(profile)
+    return profile
+
+
+def apply_performance_profile(connection: "sqlite3.Connection", profile: Dict[str, Any]) -> None:
+    """
+    Applies a performance profile to an open connection.
+
+    The journal mode is stored in the database file itself; the other settings only last for the
+    connection, so the profile is applied every time the database is opened.
+
+    Args:
+        connection (sqlite3.Connection): The connection, outside of a transaction.
+        profile (Dict[str, Any]): The profile to apply.
+
+    Raises:
+        ProfileException: If the profile is invalid.
+    """
+    _validate_profile(profile)
+    # Pragmas take no placeholders; every value has been validated above
+    connection.execute(f"PRAGMA busy_timeout={int(profile['busy_timeout_ms'])}")
+    connection.execute(f"PRAGMA journal_mode={profile['journal_mode']}")
+    connection.execute(f"PRAGMA synchronous={profile['synchronous']}")
+    connection.execute(f"PRAGMA mmap_size={int(profile['mmap_size_mb']) * 1024 * 1024}")
+    connection.execute(f"PRAGMA cache_size={-int(profile['cache_size_mb']) * 1024}")
+
+
+# Private methods
+
+
+def _validate_profile(profile: Dict[str, Any]):
+    if profile["journal_mode"] not in JOURNAL_MODES:
+        raise ProfileException(f"Error: [Profile] - Unknown journal mode '{profile['journal_mode']}'.")
+    if profile["synchronous"] not in SYNCHRONOUS_MODES:
+        raise ProfileException(f"Error: [Profile] - Unknown synchronous mode '{profile['synchronous']}'.")
+    for name in ("mmap_size_mb", "cache_size_mb", "busy_timeout_ms"):
+        if not isinstance(profile[name], int) or profile[name] < 0:
+            raise ProfileException(f"Error: [Profile] - '{name}' must be a non-negative integer.")
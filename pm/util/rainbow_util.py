@@ -0,0 +1,223 @@
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Sequence, Set, Union
+
+
+class RainbowException(Exception):
+    """Exception raised for errors while compiling or reading the rainbow table."""
+    pass
+
+
+# Layout of a compiled rainbow table (all integers little-endian):
+#   header:  magic (8 bytes), flags (uint32), bucket count (uint32)
+#   buckets: bucket count entries of entry length (uint32), entry count (uint32), data offset (uint64)
+#   data:    per bucket, entry count fixed-width entries of entry length bytes, sorted
+_MAGIC = b"SPMRBT01"
+_HEADER = struct.Struct("<8sII")
+_BUCKET = struct.Struct("<IIQ")
+FLAG_ASCII = 1  # Every entry is plain ASCII, so byte length equals character length
+
+
+def normalize_rainbow_entry(entry: str) -> str:
+    """
+    Normalizes a rainbow table entry, or a password to look up, for the compiled index.
+
+    The similarity check compares characters case-insensitively, so entries are stored lower
+    cased; that keeps the distances identical while deduplicating entries differing in case only.
+
+    Args:
+        entry (str): The raw entry.
+
+    Returns:
+        str: The normalized entry.
+    """
+    return entry.strip().lower()
+
+
+def compile_rainbow_table(text_path: str, index_path: str) -> int:
+    """
+    Compiles the plain text rainbow table into a sorted, length-bucketed binary index.
+
+    The index is written to a temporary file first and then moved into place, so processes that
+    have the previous index mapped keep reading a consistent file.
+
+    Args:
+        text_path (str): The path to the rainbow table, one entry per line.
+        index_path (str): The path to write the compiled index to.
+
+    Returns:
+        int: The number of unique entries in the index.
+
+    Raises:
+        RainbowException: If the rainbow table could not be read or the index could not be written.
+    """
+    try:
+        # Bucket unique entries by their encoded length
+        buckets: Dict[int, Set[bytes]] = {}
+        flags = FLAG_ASCII
+        with open(text_path, "r") as file:
+            for line in file:
+                entry = normalize_rainbow_entry(line)
+                if not entry:
+                    continue
+                if not entry.isascii():
+                    flags &= ~FLAG_ASCII
+                encoded = entry.encode("utf-8")
+                buckets.setdefault(len(encoded), set()).add(encoded)
+
+        # Write header, bucket table and sorted entries
+        temp_path = index_path + ".tmp"
+        with open(temp_path, "wb") as file:
+            lengths = sorted(buckets)
+            file.write(_HEADER.pack(_MAGIC, flags, len(lengths)))
+            offset = _HEADER.size + _BUCKET.size * len(lengths)
+            for length in lengths:
+                file.write(_BUCKET.pack(length, len(buckets[length]), offset))
+                offset += length * len(buckets[length])
+            for length in lengths:
+                file.write(b"".join(sorted(buckets[length])))
+        os.replace(temp_path, index_path)
+        return sum(len(entries) for entries in buckets.values())
+    except Exception as e:
+        raise RainbowException("Error: [Rainbow] - Could not compile the rainbow table.") from e
+
+
+class RainbowBucket(Sequence[str]):
+    """
+    Read-only view of the entries of one length in a compiled rainbow table.
+
+    Attributes:
+        length (int): Encoded length in bytes of every entry in the bucket.
+        offset (int): Offset of the first entry in the compiled file.
+    """
+
+    def __init__(self, buffer: mmap.mmap, length: int, count: int, offset: int):
+        self._buffer = buffer
+        self.length = length
+        self.offset = offset
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def data(self) -> memoryview:
+        """
+        Returns the raw entries of the bucket without copying them out of the mapped file.
+
+        Returns:
+            memoryview: `len(self) * self.length` bytes of concatenated fixed-width entries.
+        """
+        return memoryview(self._buffer)[self.offset:self.offset + self.length * self._count]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start = self.offset + index * self.length
+        return self._buffer[start:start + self.length].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data = self._buffer[self.offset:self.offset + self.length * self._count]
+        for start in range(0, len(data), self.length):
+            yield data[start:start + self.length].decode("utf-8")
+
+    def __contains__(self, entry) -> bool:
+        encoded = entry.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            start = self.offset + middle * self.length
+            candidate = self._buffer[start:start + self.length]
+            if candidate < encoded:
+                low = middle + 1
+            elif candidate > encoded:
+                high = middle
+            else:
+                return True
+        return False
+
+
+class CompiledRainbowTable:
+    """
+    Memory-mapped compiled rainbow table.
+
+    Opening the table only parses the small header; entries are read from the mapped pages on
+    demand, and those pages are shared between every process using the same index. Iterating the
+    table yields the normalized entries, bucket by bucket in order of length.
+
+    Attributes:
+        is_ascii (bool): Whether every entry is plain ASCII.
+    """
+
+    def __init__(self, index_path: str):
+        try:
+            with open(index_path, "rb") as file:
+                self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, flags, bucket_count = _HEADER.unpack_from(self._buffer, 0)
+            if magic != _MAGIC:
+                raise ValueError("Unknown rainbow table index format.")
+            self.is_ascii = bool(flags & FLAG_ASCII)
+            self._buckets: Dict[int, RainbowBucket] = {}
+            for i in range(bucket_count):
+                length, count, offset = _BUCKET.unpack_from(self._buffer, _HEADER.size + i * _BUCKET.size)
+                self._buckets[length] = RainbowBucket(self._buffer, length, count, offset)
+        except Exception as e:
+            raise RainbowException("Error: [Rainbow] - Could not open the compiled rainbow table.") from e
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def __iter__(self) -> Iterator[str]:
+        for bucket in self._buckets.values():
+            yield from bucket
+
+    def __contains__(self, entry) -> bool:
+        normalized = normalize_rainbow_entry(entry)
+        bucket = self._buckets.get(len(normalized.encode("utf-8")))
+        return bucket is not None and normalized in bucket
+
+    def buckets(self) -> List[RainbowBucket]:
+        """
+        Returns the buckets of the table in order of entry length.
+
+        Returns:
+            List[RainbowBucket]: One bucket per distinct encoded entry length.
+        """
+        return list(self._buckets.values())
+
+    def close(self):
+        self._buffer.close()
+
+
+def load_rainbow_table(text_path: str, index_path: str) -> Union[CompiledRainbowTable, List[str]]:
+    """
+    Loads the rainbow table, preferring the compiled index when it is up to date.
+
+    Args:
+        text_path (str): The path to the plain text rainbow table.
+        index_path (str): The path to the compiled index.
+
+    Returns:
+        Union[CompiledRainbowTable, List[str]]: The memory-mapped compiled table, or the entries of
+        the plain text table if it has not been compiled or changed since it was compiled.
+
+    Raises:
+        RainbowException: If the rainbow table could not be read.
+    """
+    try:
+        if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(text_path):
+            return CompiledRainbowTable(index_path)
+
+        rainbow_table = []
+        with open(text_path, "r") as file:
+            for line in file:
+                rainbow_table.append(line.strip())
+        return rainbow_table
+    except RainbowException as e:
+        raise e
+    except Exception as e:
+        raise RainbowException("Error: [Rainbow] - Could not load the rainbow table.") from e
@@ -0,0 +1,151 @@
+import sqlite3
+from typing import List, Optional, Set
+
+
+class SchemaException(Exception):
+    """Exception raised for errors while migrating the schema of a database."""
+    pass
+
+
+# Migrations are applied in order and never edited once released; each one is a list of
+# statements. The schema version of a database is the number of migrations applied to it.
+MIGRATIONS: List[List[str]] = [
+    # 1: Stores, accounts and their password history
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS store (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hid TEXT NOT NULL,
+                name TEXT NOT NULL,
+                date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(name),
+                UNIQUE(hid)
+            )
+        ''',
+        '''
+            CREATE TABLE IF NOT EXISTS account (
+                id INTEGER PRIMARY KEY,
+                hid TEXT NOT NULL,
+                name TEXT NOT NULL,
+                username TEXT DEFAULT NULL,
+                email TEXT DEFAULT NULL,
+                store_id INTEGER,
+                date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (store_id) REFERENCES store(id),
+                UNIQUE(name, store_id),
+                UNIQUE(hid)
+            )
+        ''',
+        '''
+            CREATE TABLE IF NOT EXISTS password (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_id INTEGER,
+                password TEXT NOT NULL,
+                date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (account_id) REFERENCES account(id)
+            )
+        '''
+    ],
+    # 2: Unencrypted metadata needed before the database can be unlocked
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS header (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        '''
+    ],
+    # 3: Accounts of a store, and the password history of an account, without a table scan
+    [
+        "CREATE INDEX IF NOT EXISTS account_store_id_hid ON account (store_id, hid)",
+        "CREATE INDEX IF NOT EXISTS password_account_id_id ON password (account_id, id DESC)"
+    ],
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_migrated_paths: Set[str] = set()
+
+
+def migrate_db(db_file_path: str, connection: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Brings the schema of a database up to date, creating it if the database is empty.
+
+    The pending migrations are applied in a single immediate transaction, so concurrent processes
+    opening the same database apply them only once. A database is checked at most once per
+    process.
+
+    Args:
+        db_file_path (str): The absolute path to the database file.
+        connection (Optional[sqlite3.Connection]): An open connection to the database to use,
+            e.g. the connection of the vault. A short-lived connection is opened if not given.
+
+    Returns:
+        int: The number of migrations applied.
+
+    Raises:
+        SchemaException: If the database was created by a newer version or a migration failed.
+    """
+    if db_file_path in _migrated_paths:
+        return 0
+
+    try:
+        if connection is None:
+            own_connection = sqlite3.connect(db_file_path)
+            try:
+                applied = _apply_migrations(own_connection)
+            finally:
+                own_connection.close()
+        else:
+            applied = _apply_migrations(connection)
+        _migrated_paths.add(db_file_path)
+        return applied
+    except SchemaException as e:
+        raise e
+    except Exception as e:
+        raise SchemaException(f"Error: [Schema] - Could not migrate the database: {str(e)}.") from e
+
+
+# Private methods
+
+
+def _apply_migrations(connection: sqlite3.Connection) -> int:
+    """
+    Applies the migrations newer than the recorded schema version and records the new version.
+    The version is read without locking first, so up to date databases are never write-locked.
+    """
+    if connection.in_transaction:
+        connection.commit()
+    if _read_schema_version(connection) == SCHEMA_VERSION:
+        return 0
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        version = _read_schema_version(connection)
+        if version > SCHEMA_VERSION:
+            raise SchemaException(
+                f"Error: [Schema] - The database has schema version {version}, "
+                f"this version of safe-pm only supports up to {SCHEMA_VERSION}."
+            )
+
+        for migration in MIGRATIONS[version:]:
+            for sql in migration:
+                connection.execute(sql)
+        connection.execute("DELETE FROM schema_version")
+        connection.execute("INSERT INTO schema_version (version) VALUES (?)", (SCHEMA_VERSION,))
+        connection.commit()
+        return SCHEMA_VERSION - version
+    except BaseException:
+        connection.rollback()
+        raise
+
+
+def _read_schema_version(connection: sqlite3.Connection) -> int:
+    """
+    Reads the schema version of a database; 0 if the database predates schema versioning.
+    """
+    try:
+        record = connection.execute("SELECT version FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return record[0] if record is not None else 0
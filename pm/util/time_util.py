@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+
+def parse_timestamp(value: str) -> str:
+    """
+    Parses a date or date and time given on the command line into the format of the creation
+    dates stored in the database, so that they can be compared in SQL.
+
+    Stored dates are in UTC. Values without a time zone are taken to be in UTC as well; values
+    with one are converted.
+
+    Args:
+        value (str): An ISO 8601 date or date and time, e.g. `2024-05-01` or `2024-05-01T13:30+02:00`.
+
+    Returns:
+        str: The timestamp formatted as `YYYY-MM-DD HH:MM:SS`.
+
+    Raises:
+        ValueError: If the value is not a valid ISO 8601 date.
+    """
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,510 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from pm.util.header_util import PERFORMANCE
+from pm.util.path_util import get_db_path, get_db_file_name
+from pm.util.profile_util import apply_performance_profile
+from pm.util.schema_util import migrate_db
+
+
+class VaultException(Exception):
+    """Exception raised for errors while accessing the vault database."""
+    pass
+
+
+class Page(NamedTuple):
+    """
+    Selects part of a listing. Only the selected rows are read from the database and decrypted.
+
+    Attributes:
+        limit (Optional[int]): Maximum number of rows, or None for all.
+        offset (int): Number of rows to skip.
+        since (Optional[str]): Only rows created at or after this UTC timestamp, formatted as
+            `YYYY-MM-DD HH:MM:SS` like the stored creation dates.
+        until (Optional[str]): Only rows created before this UTC timestamp.
+    """
+    limit: Optional[int] = None
+    offset: int = 0
+    since: Optional[str] = None
+    until: Optional[str] = None
+
+
+class Vault:
+    """
+    Data access layer of a database.
+
+    A vault owns the single connection to its database file for the lifetime of the process. When
+    it is opened, pending schema migrations are applied, followed by the performance profile stored
+    in the header. Every query uses `?` placeholders, so sqlite compiles each statement once and
+    reuses it from the statement cache of the connection. Values are passed in and returned
+    exactly as stored; encrypting and decrypting them is left to the caller. Use `get_vault` to
+    obtain the shared instance of a database.
+
+    Writes are only committed by `transaction`; wrap every modification in it.
+
+    Attributes:
+        db_file_path (str): The absolute path to the database file.
+    """
+
+    def __init__(self, db_file_path: str):
+        self.db_file_path = db_file_path
+        self._connection = sqlite3.connect(db_file_path)
+        self._transaction_depth = 0
+        migrate_db(db_file_path, self._connection)
+        profile = self.get_header_value(PERFORMANCE)
+        if profile is not None:
+            apply_performance_profile(self._connection, json.loads(profile))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Runs the enclosed writes in a transaction that is committed when the block exits and rolled
+        back if it raises. Nested blocks join the outermost transaction.
+        """
+        if self._transaction_depth == 0 and self._connection.in_transaction:
+            self._connection.commit()
+        self._transaction_depth += 1
+        try:
+            if self._transaction_depth == 1:
+                self._connection.execute("BEGIN")
+            yield
+            if self._transaction_depth == 1:
+                self._connection.commit()
+        except BaseException:
+            if self._transaction_depth == 1:
+                self._connection.rollback()
+            raise
+        finally:
+            self._transaction_depth -= 1
+
+    def close(self):
+        self._connection.close()
+
+    def get_header_value(self, key: str) -> Optional[str]:
+        """
+        Reads a single value from the header of the database.
+
+        Args:
+            key (str): The header key to read.
+
+        Returns:
+            Optional[str]: The stored value, or None if the key is not set.
+        """
+        record = self._connection.execute("SELECT value FROM header WHERE key=?", (key,)).fetchone()
+        return record[0] if record is not None else None
+
+    # Stores
+
+    def get_store_id(self, hid: str) -> Optional[int]:
+        """
+        Looks up a store by its hashed name.
+
+        Args:
+            hid (str): The deterministic hash of the store name.
+
+        Returns:
+            Optional[int]: The id of the store, or None if it does not exist.
+        """
+        record = self._connection.execute("SELECT id FROM store WHERE hid=?", (hid,)).fetchone()
+        return record[0] if record is not None else None
+
+    def insert_store(self, hid: str, name: str) -> int:
+        """
+        Inserts a store.
+
+        Args:
+            hid (str): The deterministic hash of the store name.
+            name (str): The encrypted store name.
+
+        Returns:
+            int: The id of the new store.
+
+        Raises:
+            sqlite3.IntegrityError: If a store with the same name exists.
+        """
+        return self._connection.execute("INSERT INTO store (hid, name) VALUES (?, ?)", (hid, name)).lastrowid
+
+    def rename_store(self, hid: str, new_hid: str, new_name: str) -> int:
+        """
+        Renames a store.
+
+        Args:
+            hid (str): The deterministic hash of the current store name.
+            new_hid (str): The deterministic hash of the new store name.
+            new_name (str): The encrypted new store name.
+
+        Returns:
+            int: The number of renamed stores.
+        """
+        return self._connection.execute(
+            "UPDATE store SET hid=?, name=? WHERE hid=?", (new_hid, new_name, hid)
+        ).rowcount
+
+    def delete_store(self, hid: str) -> int:
+        """
+        Deletes a store.
+
+        Args:
+            hid (str): The deterministic hash of the store name.
+
+        Returns:
+            int: The number of deleted stores.
+        """
+        return self._connection.execute("DELETE FROM store WHERE hid=?", (hid,)).rowcount
+
+    def list_stores(self, page: Optional[Page] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Lists the stores in order of creation. Rows are read from the database as the result is
+        iterated.
+
+        Args:
+            page (Optional[Page]): Optional time range and page of the stores to list.
+
+        Returns:
+            Iterator[Tuple[str, str]]: The encrypted name and creation date of each store.
+        """
+        conditions, limit, parameters = _page_clauses(page)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._connection.execute(
+            f"SELECT name, date_created FROM store{where} ORDER BY id{limit}", parameters
+        )
+
+    # Accounts
+
+    def get_account_id(self, store_id: int, hid: str) -> Optional[int]:
+        """
+        Looks up an account of a store by its hashed name.
+
+        Args:
+            store_id (int): The id of the store.
+            hid (str): The deterministic hash of the account name.
+
+        Returns:
+            Optional[int]: The id of the account, or None if it does not exist.
+        """
+        record = self._connection.execute(
+            "SELECT id FROM account WHERE store_id=? AND hid=?", (store_id, hid)
+        ).fetchone()
+        return record[0] if record is not None else None
+
+    def insert_account(self, store_id: int, hid: str, name: str, username: str, email: str) -> int:
+        """
+        Inserts an account into a store.
+
+        Args:
+            store_id (int): The id of the store.
+            hid (str): The deterministic hash of the account name.
+            name (str): The encrypted account name.
+            username (str): The encrypted username.
+            email (str): The encrypted email.
+
+        Returns:
+            int: The id of the new account.
+
+        Raises:
+            sqlite3.IntegrityError: If an account with the same name exists.
+        """
+        return self._connection.execute(
+            "INSERT INTO account (hid, name, username, email, store_id) VALUES (?, ?, ?, ?, ?)",
+            (hid, name, username, email, store_id)
+        ).lastrowid
+
+    def insert_accounts(self, accounts: Iterable[Tuple[int, str, str, str, str]]) -> None:
+        """
+        Inserts many accounts with a single prepared statement.
+
+        Args:
+            accounts (Iterable[Tuple[int, str, str, str, str]]): The store id, the deterministic hash
+                of the account name, and the encrypted name, username and email of each account.
+
+        Raises:
+            sqlite3.IntegrityError: If an account with the same name exists.
+        """
+        self._connection.executemany(
+            "INSERT INTO account (store_id, hid, name, username, email) VALUES (?, ?, ?, ?, ?)", accounts
+        )
+
+    def list_account_hids(self) -> Iterator[str]:
+        """
+        Lists the hashed names of the accounts of every store. Account names are unique across
+        stores, so these are the names a new account cannot take.
+
+        Returns:
+            Iterator[str]: The deterministic hash of each account name.
+        """
+        return (hid for hid, in self._connection.execute("SELECT hid FROM account"))
+
+    def delete_account(self, account_id: int) -> None:
+        """
+        Deletes an account and its password history.
+
+        Args:
+            account_id (int): The id of the account.
+        """
+        self._connection.execute("DELETE FROM password WHERE account_id=?", (account_id,))
+        self._connection.execute("DELETE FROM account WHERE id=?", (account_id,))
+
+    def delete_accounts(self, account_ids: List[int]) -> None:
+        """
+        Deletes many accounts and their password history with a single prepared statement each.
+
+        Args:
+            account_ids (List[int]): The ids of the accounts.
+        """
+        parameters = [(account_id,) for account_id in account_ids]
+        self._connection.executemany("DELETE FROM password WHERE account_id=?", parameters)
+        self._connection.executemany("DELETE FROM account WHERE id=?", parameters)
+
+    def list_accounts(self, store_id: int, page: Optional[Page] = None) -> Iterator[Tuple[str, str, str, str]]:
+        """
+        Lists the accounts of a store in order of creation. Rows are read from the database as the
+        result is iterated.
+
+        Args:
+            store_id (int): The id of the store.
+            page (Optional[Page]): Optional time range and page of the accounts to list.
+
+        Returns:
+            Iterator[Tuple[str, str, str, str]]: The encrypted name, username and email, and the
+            creation date of each account.
+        """
+        conditions, limit, parameters = _page_clauses(page)
+        return self._connection.execute(
+            f"SELECT name, username, email, date_created FROM account "
+            f"WHERE {' AND '.join(['store_id=?', *conditions])} ORDER BY id{limit}",
+            (store_id, *parameters)
+        )
+
+    # Passwords
+
+    def insert_password(self, account_id: int, password: str) -> int:
+        """
+        Adds a password to the history of an account, making it the current one.
+
+        Args:
+            account_id (int): The id of the account.
+            password (str): The encrypted password.
+
+        Returns:
+            int: The id of the new password.
+        """
+        return self._connection.execute(
+            "INSERT INTO password (account_id, password) VALUES (?, ?)", (account_id, password)
+        ).lastrowid
+
+    def insert_passwords(self, passwords: Iterable[Tuple[int, str]]) -> None:
+        """
+        Adds many passwords with a single prepared statement, each becoming the current password of
+        its account.
+
+        Args:
+            passwords (Iterable[Tuple[int, str]]): The account id and the encrypted password.
+        """
+        self._connection.executemany("INSERT INTO password (account_id, password) VALUES (?, ?)", passwords)
+
+    def insert_passwords_by_hid(self, passwords: Iterable[Tuple[str, str]]) -> None:
+        """
+        Adds many passwords with a single prepared statement, looking up each account by its hashed
+        name so that accounts inserted in bulk need not be read back first.
+
+        Args:
+            passwords (Iterable[Tuple[str, str]]): The deterministic hash of the account name and
+                the encrypted password.
+        """
+        self._connection.executemany(
+            "INSERT INTO password (account_id, password) SELECT id, ? FROM account WHERE hid=?",
+            ((password, hid) for hid, password in passwords)
+        )
+
+    def latest_password(self, store_id: int, hid: str) -> Optional[Tuple[str, str, str, str, str]]:
+        """
+        Reads an account together with its current password.
+
+        Args:
+            store_id (int): The id of the store.
+            hid (str): The deterministic hash of the account name.
+
+        Returns:
+            Optional[Tuple[str, str, str, str, str]]: The encrypted name, username, email and
+            password, and the date the password was set, or None if the account does not exist.
+        """
+        return self._connection.execute(
+            "SELECT account.name, account.username, account.email, password.password, password.date_created "
+            "FROM account JOIN password ON password.id=("
+            "  SELECT id FROM password WHERE account_id=account.id ORDER BY id DESC LIMIT 1"
+            ") "
+            "WHERE account.store_id=? AND account.hid=?",
+            (store_id, hid)
+        ).fetchone()
+
+    def password_history(self, account_id: int, page: Optional[Page] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Lists the passwords of an account, newest first. Rows are read from the database as the
+        result is iterated.
+
+        Args:
+            account_id (int): The id of the account.
+            page (Optional[Page]): Optional time range and page of the passwords to list.
+
+        Returns:
+            Iterator[Tuple[str, str]]: The encrypted password and the date it was set.
+        """
+        conditions, limit, parameters = _page_clauses(page)
+        return self._connection.execute(
+            f"SELECT password, date_created FROM password "
+            f"WHERE {' AND '.join(['account_id=?', *conditions])} ORDER BY id DESC{limit}",
+            (account_id, *parameters)
+        )
+
+    # Archives
+
+    def export_accounts(self) -> Iterator[Tuple[str, str, str, str, str]]:
+        """
+        Lists the accounts of every store in order of creation, for writing an archive. Rows are
+        read from the database as the result is iterated.
+
+        Returns:
+            Iterator[Tuple[str, str, str, str, str]]: The deterministic hash of the store name, the
+            encrypted name, username and email, and the creation date of each account.
+        """
+        return self._connection.execute(
+            "SELECT store.hid, account.name, account.username, account.email, account.date_created "
+            "FROM account JOIN store ON store.id=account.store_id ORDER BY account.id"
+        )
+
+    def export_passwords(self) -> Iterator[Tuple[str, str, str]]:
+        """
+        Lists the password history of every account in order of creation, for writing an archive.
+        Rows are read from the database as the result is iterated.
+
+        Returns:
+            Iterator[Tuple[str, str, str]]: The deterministic hash of the account name, the
+            encrypted password and the date it was set.
+        """
+        return self._connection.execute(
+            "SELECT account.hid, password.password, password.date_created "
+            "FROM password JOIN account ON account.id=password.account_id ORDER BY password.id"
+        )
+
+    def restore_stores(self, stores: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Inserts stores read from an archive, keeping their creation dates.
+
+        Args:
+            stores (Iterable[Tuple[str, str, str]]): The deterministic hash of the store name, the
+                encrypted name and the creation date.
+
+        Returns:
+            int: The number of stores inserted.
+
+        Raises:
+            sqlite3.IntegrityError: If a store with the same name exists.
+        """
+        return self._connection.executemany("INSERT INTO store (hid, name, date_created) VALUES (?, ?, ?)", stores).rowcount
+
+    def restore_accounts(self, accounts: Iterable[Tuple[str, str, str, str, str, str]]) -> int:
+        """
+        Inserts accounts read from an archive, keeping their creation dates. Accounts whose store
+        does not exist are skipped.
+
+        Args:
+            accounts (Iterable[Tuple[str, str, str, str, str, str]]): The deterministic hash of the
+                store name and of the account name, the encrypted name, username and email, and the
+                creation date.
+
+        Returns:
+            int: The number of accounts inserted.
+
+        Raises:
+            sqlite3.IntegrityError: If an account with the same name exists.
+        """
+        return self._connection.executemany(
+            "INSERT INTO account (store_id, hid, name, username, email, date_created) "
+            "SELECT id, ?, ?, ?, ?, ? FROM store WHERE hid=?",
+            ((hid, name, username, email, date_created, store_hid)
+             for store_hid, hid, name, username, email, date_created in accounts)
+        ).rowcount
+
+    def restore_passwords(self, passwords: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Inserts password history read from an archive, keeping the dates the passwords were set.
+        Passwords whose account does not exist are skipped.
+
+        Args:
+            passwords (Iterable[Tuple[str, str, str]]): The deterministic hash of the account name,
+                the encrypted password and the date it was set.
+
+        Returns:
+            int: The number of passwords inserted.
+        """
+        return self._connection.executemany(
+            "INSERT INTO password (account_id, password, date_created) SELECT id, ?, ? FROM account WHERE hid=?",
+            ((password, date_created, hid) for hid, password, date_created in passwords)
+        ).rowcount
+
+
+def _page_clauses(page: Optional[Page]) -> Tuple[List[str], str, List[Any]]:
+    """
+    Translates a page into SQL. The clauses only contain placeholders, so each combination of
+    options is compiled once.
+
+    Returns:
+        Tuple[List[str], str, List[Any]]: The conditions to add to the WHERE clause, the LIMIT
+        clause to append after ORDER BY, and the parameters of both, in that order.
+    """
+    if page is None:
+        return [], "", []
+
+    conditions, parameters = [], []
+    if page.since is not None:
+        conditions.append("date_created>=?")
+        parameters.append(page.since)
+    if page.until is not None:
+        conditions.append("date_created<?")
+        parameters.append(page.until)
+
+    limit = ""
+    if page.limit is not None or page.offset:
+        limit = " LIMIT ? OFFSET ?"
+        parameters.extend([page.limit if page.limit is not None else -1, page.offset])
+    return conditions, limit, parameters
+
+
+_vaults: Dict[str, Vault] = {}
+
+
+def get_vault(db_name: str) -> Vault:
+    """
+    Returns the vault of a database, opening its connection on first use in this process.
+
+    Args:
+        db_name (str): Name of the database. The database file must exist.
+
+    Returns:
+        Vault: The vault shared by every command run against the database in this process.
+
+    Raises:
+        VaultException: If the database could not be opened.
+    """
+    if db_name not in _vaults:
+        try:
+            _vaults[db_name] = Vault(os.path.join(get_db_path(), get_db_file_name(db_name)))
+        except Exception as e:
+            raise VaultException(f"Error: [Vault] - Could not open the database {db_name}.") from e
+    return _vaults[db_name]
+
+
+def close_vault(db_name: str) -> None:
+    """
+    Closes the connection of a database opened in this process, e.g. before its file is replaced.
+    The next command run against the database in this process opens it again.
+
+    Args:
+        db_name (str): Name of the database.
+    """
+    vault = _vaults.pop(db_name, None)
+    if vault is not None:
+        vault.close()
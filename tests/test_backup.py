@@ -0,0 +1,33 @@
+import getpass
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+from pm.cli import create_parser
+from pm.util.crypto_util import get_deterministic_hash
+
+
+def _run(*tokens):
+    args = create_parser().parse_args(tokens)
+    args.func(args)
+
+
+def test_restore_then_write_in_the_same_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "argv", [str(tmp_path / "bin" / "main.py")])
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(getpass, "getpass", lambda prompt="": "master-password")
+    os.makedirs(tmp_path / "db")
+
+    _run("setup", "--db", "vault", "--kdf-target-ms", "10", "--kdf-max-memory-mb", "16")
+    _run("store", "create", "--db", "vault", "--store", "before")
+    _run("backup", "--db", "vault")
+    _run("store", "create", "--db", "vault", "--store", "dropped")
+    _run("restore", "--db", "vault", "--version", "1", "--force")
+
+    # Written through the connection of this process, as a shell would after the restore
+    _run("store", "create", "--db", "vault", "--store", "after")
+
+    with closing(sqlite3.connect(tmp_path / "db" / "vault.db")) as connection:
+        hids = {hid for hid, in connection.execute("SELECT hid FROM store")}
+    assert hids == {get_deterministic_hash("before"), get_deterministic_hash("after")}
@@ -0,0 +1,29 @@
+import io
+import re
+import subprocess
+
+from pm.util.console_util import TABLE_SAMPLE_ROWS, display_table_in_less_with_ansi
+
+
+class _FakePager:
+    """Stands in for `less`, keeping what is written to it."""
+
+    def __init__(self, *args, **kwargs):
+        self.stdin = io.StringIO()
+        self.stdin.close = lambda: None
+        _FakePager.instance = self
+
+    def wait(self):
+        return 0
+
+
+def test_display_table_keeps_every_row_past_the_sample(monkeypatch):
+    monkeypatch.setattr(subprocess, "Popen", _FakePager)
+    row_count = TABLE_SAMPLE_ROWS * 3 + 1
+    rows = ((f"account-{i}", "user") for i in range(row_count))
+
+    display_table_in_less_with_ansi(("Name", "Username"), rows)
+
+    output = _FakePager.instance.stdin.getvalue()
+    written = re.findall(r"account-\d+", output)
+    assert written == [f"account-{i}" for i in range(row_count)]
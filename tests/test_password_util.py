@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from pm.util import password_util
+from pm.util.password_util import edit_distance, find_most_similar_password
+from pm.util.rainbow_util import CompiledRainbowTable, compile_rainbow_table
+
+ASCII_ALPHABET = "abcdeABCDE0137@$!"
+UNICODE_ALPHABET = ASCII_ALPHABET + "äÄßé"
+
+
+def _reference_edit_distance(str1, str2):
+    """The full-matrix DP that the banded `edit_distance` replaced, kept as the specification."""
+    len_str1 = len(str1)
+    len_str2 = len(str2)
+    dp = [[0 for _ in range(len_str2 + 1)] for _ in range(len_str1 + 1)]
+    for i in range(len_str1 + 1):
+        dp[i][0] = i
+    for j in range(len_str2 + 1):
+        dp[0][j] = j
+
+    for i in range(1, len_str1 + 1):
+        for j in range(1, len_str2 + 1):
+            cost = 0
+            if str1[i - 1] != str2[j - 1]:
+                if str1[i - 1].lower() == str2[j - 1].lower():
+                    cost = 0
+                else:
+                    cost = 3
+            dp[i][j] = min(
+                dp[i - 1][j] + 8,
+                dp[i][j - 1] + 4,
+                dp[i - 1][j - 1] + cost,
+            )
+    return dp[len_str1][len_str2]
+
+
+def _reference_most_similar(password, rainbow_table, max_distance=float('inf')):
+    """The plain scan that the pruned and batched searches replaced."""
+    min_distance = max_distance
+    most_similar_password = None
+    for entry in rainbow_table:
+        distance = _reference_edit_distance(password, entry)
+        if distance < min_distance:
+            min_distance = distance
+            most_similar_password = entry
+    if most_similar_password is None:
+        return None, float('inf')
+    return most_similar_password, min_distance
+
+
+def _random_strings(rng, alphabet, count, max_length=12):
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length))) for _ in range(count)]
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "pure-python"])
+def numpy_enabled(request, monkeypatch):
+    if request.param:
+        if password_util._import_numpy() is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setattr(password_util, "_import_numpy", lambda: None)
+    return request.param
+
+
+@pytest.mark.parametrize("alphabet", [ASCII_ALPHABET, UNICODE_ALPHABET], ids=["ascii", "unicode"])
+def test_edit_distance_matches_full_matrix_for_every_cutoff(alphabet):
+    rng = random.Random(7)
+    strings = _random_strings(rng, alphabet, 60)
+    for str1, str2 in zip(strings, reversed(strings)):
+        expected = _reference_edit_distance(str1, str2)
+        assert edit_distance(str1, str2) == expected
+        for max_cost in range(expected + 5):
+            assert edit_distance(str1, str2, max_cost) == (expected if expected <= max_cost else max_cost + 1)
+
+
+@pytest.mark.parametrize("alphabet", [ASCII_ALPHABET, UNICODE_ALPHABET], ids=["ascii", "unicode"])
+def test_find_most_similar_password_matches_scan_of_list(alphabet, numpy_enabled):
+    rng = random.Random(11)
+    rainbow_table = _random_strings(rng, alphabet, 300)
+    for password in _random_strings(rng, alphabet, 25):
+        for max_distance in (float('inf'), 1, 4, 10):
+            assert find_most_similar_password(password, rainbow_table, max_distance) == \
+                _reference_most_similar(password, rainbow_table, max_distance)
+
+
+def test_find_most_similar_password_matches_scan_of_compiled_table(tmp_path, numpy_enabled):
+    rng = random.Random(13)
+    text_path = tmp_path / "rainbow-table"
+    text_path.write_text("\n".join(_random_strings(rng, ASCII_ALPHABET, 300, max_length=10)) + "\n")
+    index_path = tmp_path / "rainbow-table.idx"
+    compile_rainbow_table(str(text_path), str(index_path))
+    rainbow_table = CompiledRainbowTable(str(index_path))
+    try:
+        entries = list(rainbow_table)
+        for password in _random_strings(rng, ASCII_ALPHABET, 25):
+            for max_distance in (float('inf'), 1, 4, 10):
+                assert find_most_similar_password(password, rainbow_table, max_distance) == \
+                    _reference_most_similar(password, entries, max_distance)
+    finally:
+        rainbow_table.close()